@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'VTPS.activity.ActivityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,12 +82,87 @@ WSGI_APPLICATION = 'Core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Configured from the environment. DB_ENGINE is sqlite3 (the default) or a
+# server backend such as postgresql, which reads DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST and DB_PORT.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+# SQLite tuned for concurrent GPS writes: WAL lets readers run alongside the
+# writer, synchronous=NORMAL only fsyncs at checkpoints (safe under WAL),
+# mmap_size serves reads from the page cache, and IMMEDIATE transactions take
+# the write lock up front so writers queue for up to ``timeout`` seconds
+# instead of failing with "database is locked" when a read turns into a write.
+# DB_SQLITE_TUNING=0 opens the database with SQLite's defaults.
+SQLITE_TUNING = {
+    'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA mmap_size=268435456',
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
+if DB_ENGINE == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': SQLITE_TUNING if os.environ.get('DB_SQLITE_TUNING', '1') == '1' else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': f'django.db.backends.{DB_ENGINE}',
+            'NAME': os.environ.get('DB_NAME', 'vtps'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # Persistent connections, checked before reuse
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if DB_ENGINE == 'postgresql' and int(os.environ.get('DB_POOL_MAX_SIZE', 0)):
+        # psycopg's connection pool (needs psycopg[pool]) replaces persistent connections
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Version counters, metrics, cached tokens and rendered pages must be seen by
+# every worker process, so the cache is shared. CACHE_BACKEND is database
+# (the default, a table in the main database), redis or memcached, which read
+# CACHE_LOCATION. locmem keeps everything in one process and only suits a
+# single-process server; the token cache is then turned off.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'database')
+
+CACHE_BACKENDS = {
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'vtps_cache'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'vtps'),
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        # Culling would drop version counters and metrics along with expired pages
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 100000))},
     }
 }
+if CACHE_BACKEND in ('redis', 'memcached'):
+    # Both evict by memory rather than by entry count
+    CACHES['default']['OPTIONS'] = {}
 
 
 # Password validation
@@ -147,7 +224,7 @@ CORS_ALLOW_CREDENTIALS = True
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'VTPS.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -160,4 +237,55 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_RATES': {
+        'device': '120/min',  # Per device credential on the device ingest endpoint
+    },
+}
+
+# VTPS settings
+LOCATION_BATCH_MAX_SIZE = 1000  # Max fixes accepted by /api/locations/batch/ per request
+GEOFENCE_VIOLATION_DISTANCE_METERS = 500  # Distance outside every safe zone that escalates to a geofence violation
+VERSION_CHECK_INTERVAL_SECONDS = 1.0  # How often in-process caches check the shared cache for changes
+DASHBOARD_STATS_CACHE_SECONDS = 5  # How long /api/dashboard-stats/ responses are shared between consoles
+REALTIME_BACKEND = 'VTPS.realtime.LocalBackend'  # Delivers /ws/stream/ messages; replace with a shared bus for multi-process
+REALTIME_QUEUE_SIZE = 1000  # Messages buffered per WebSocket before a slow client starts losing them
+CHECKIN_GRACE_MINUTES = 30  # How long after a scheduled check-in before it is recorded as missed
+DEVICE_OFFLINE_MISSED_UPDATES = 3  # Location update intervals without a fix before a device is reported offline
+BATTERY_LOW_THRESHOLD = 20  # Battery percentage at or below which a battery_low alert is raised
+BATTERY_RECOVERY_MARGIN = 5  # Points above the threshold the battery must reach before battery_low is resolved
+NOTIFICATION_BACKENDS = {  # Sender used for each NotificationLog channel
+    'sms': 'VTPS.notifications.LoggingBackend',
+    'email': 'VTPS.notifications.EmailBackend',
+    'push': 'VTPS.notifications.LoggingBackend',
+    'in_app': 'VTPS.notifications.InAppBackend',
 }
+NOTIFICATION_RATE_LIMITS = {'sms': 100, 'email': 50, 'push': 500}  # Max sends per second per channel and worker
+NOTIFICATION_BATCH_SIZE = 500  # Notifications claimed per dispatch round
+NOTIFICATION_WORKERS = 64  # Concurrent sends per worker process
+NOTIFICATION_LEASE_SECONDS = 300  # How long a claimed notification is hidden from other workers
+NOTIFICATION_MAX_ATTEMPTS = 5  # Sends tried before a notification is marked failed
+NOTIFICATION_RETRY_BASE_SECONDS = 30  # First retry delay; doubles with every further attempt
+NOTIFICATION_CONTACT_PRIORITIES = ['high', 'critical']  # Alert priorities that notify the person's emergency contacts
+NOTIFICATION_FANOUT_WINDOW_MINUTES = 60  # How far back the worker looks for alerts whose contacts were not yet notified
+ALERT_DEDUP_WINDOW_SECONDS = 600  # Repeats of an open alert seen within this long are counted on it instead of raising a new one
+LOCATION_ARCHIVE_ROOT = BASE_DIR / 'archive'  # Where purge_locations --archive keeps expired location history
+TRACK_BUCKET_MINUTES = 60  # Time slice of a location track that is simplified and cached as a unit
+TRACK_BUCKET_MAX_POINTS = 2000  # Most points kept per simplified bucket
+TRACK_MIN_TOLERANCE_METERS = 2  # Points closer than this to the simplified line are dropped
+TRACK_CACHE_SECONDS = 7 * 24 * 3600  # How long simplified buckets are cached once they have closed
+TRACK_DEFAULT_POINTS = 1000  # Points returned by /api/people/{id}/track/ unless max_points is given
+TRACK_MAX_POINTS = 20000  # Largest max_points accepted by /api/people/{id}/track/
+TRACK_MAX_RANGE_DAYS = 31  # Longest span accepted by /api/people/{id}/track/
+AUTH_TOKEN_CACHE_SECONDS = 60  # Longest an API token's user is trusted from memory before it is read again; 0, or a process-local cache, disables it
+DEVICE_KEY_CACHE_SECONDS = 5  # Longest a device key is trusted from memory before its credential is read again
+ACTIVITY_FLUSH_SECONDS = 60  # How often buffered User.last_activity times are written
+LOCATION_MAX_SPEED_KMH = 300  # Fixes implying a faster move from the previous fix are rejected as outliers
+LOCATION_MAX_CLOCK_SKEW_SECONDS = 300  # Fixes timestamped further than this ahead of the server clock are rejected
+SPATIAL_CELL_DEGREES = 0.01  # Grid cell size of the in-memory position and safe zone indexes (about 1 km)
+SPATIAL_SYNC_SECONDS = 1.0  # How often the position index takes in fixes stored by other processes
+NEARBY_DEFAULT_RADIUS_METERS = 2000  # Radius of /api/people/nearby/ unless radius is given
+NEARBY_MAX_RADIUS_METERS = 50000  # Largest radius accepted by /api/people/nearby/
+NEARBY_MAX_RESULTS = 500  # Most people returned by /api/people/nearby/, nearest first
+MAP_CLUSTER_MAX_ZOOM = 16  # Highest map zoom served as clusters; above it /api/map/clusters/ returns single people
+MAP_CLUSTER_CELL_PIXELS = 60  # Width of a cluster cell in pixels of a 256 pixel map tile
+PAGE_CACHE_SECONDS = 300  # How long rendered list pages are kept; a change to the data they show retires them sooner
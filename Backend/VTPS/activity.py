@@ -0,0 +1,76 @@
+"""
+Buffered tracking of when users were last active.
+
+Requests record the time in process memory; the buffer is written with one
+bulk UPDATE at most every ``ACTIVITY_FLUSH_SECONDS``, so an operator's
+requests do not each rewrite (and lock) their user row. Each user's newest
+time wins, both within the buffer and against what other processes stored.
+"""
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db.models import DateTimeField, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    def __init__(self):
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def touch(self, user_id, when=None):
+        """Record that ``user_id`` was active; flushes if the buffer is due"""
+        when = when or timezone.now()
+        with self._lock:
+            if self._seen.get(user_id, when) <= when:
+                self._seen[user_id] = when
+            due = time.monotonic() - self._flushed_at >= settings.ACTIVITY_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered times; returns the number of users updated"""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+            self._flushed_at = time.monotonic()
+        if not seen:
+            return 0
+        users = [
+            User(pk=user_id, last_activity=Greatest('last_activity', Value(when, output_field=DateTimeField())))
+            for user_id, when in seen.items()
+        ]
+        try:
+            User.objects.bulk_update(users, ['last_activity'], batch_size=500)
+        except Exception:
+            logger.exception('Could not flush the activity of %d users', len(seen))
+            with self._lock:
+                for user_id, when in seen.items():
+                    if self._seen.get(user_id, when) <= when:
+                        self._seen[user_id] = when
+            return 0
+        return len(seen)
+
+
+activity = ActivityTracker()
+atexit.register(activity.flush)
+
+
+class ActivityMiddleware:
+    """Records the activity of the user a request authenticated as"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        if isinstance(user, User):
+            activity.touch(user.pk)
+        return response
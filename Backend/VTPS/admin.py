@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
-    User, VulnerablePerson, EmergencyContact, LocationLog, Alert, SafeZone,
-    CheckInSchedule, CheckInLog, SystemSettings, NotificationLog
+    User, VulnerablePerson, EmergencyContact, LocationLog, LatestLocation, Alert, SafeZone,
+    CheckInSchedule, CheckInLog, SystemSettings, NotificationLog, DeviceCredential
 )
 
 # User admin
@@ -37,12 +37,19 @@ class LocationLogAdmin(admin.ModelAdmin):
     search_fields = ('person__first_name', 'person__last_name', 'location_description')
     readonly_fields = ('timestamp',)
 
+@admin.register(LatestLocation)
+class LatestLocationAdmin(admin.ModelAdmin):
+    list_display = ('person', 'latitude', 'longitude', 'timestamp', 'is_safe_zone', 'battery_level')
+    list_filter = ('is_safe_zone',)
+    search_fields = ('person__first_name', 'person__last_name')
+    readonly_fields = ('updated_at',)
+
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
-    list_display = ('title', 'person', 'alert_type', 'priority', 'status', 'assigned_to', 'created_at')
+    list_display = ('title', 'person', 'alert_type', 'priority', 'status', 'occurrence_count', 'assigned_to', 'created_at')
     list_filter = ('alert_type', 'priority', 'status', 'created_at')
     search_fields = ('title', 'description', 'person__first_name', 'person__last_name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'occurrence_count')
 
 @admin.register(SafeZone)
 class SafeZoneAdmin(admin.ModelAdmin):
@@ -72,7 +79,14 @@ class SystemSettingsAdmin(admin.ModelAdmin):
 
 @admin.register(NotificationLog)
 class NotificationLogAdmin(admin.ModelAdmin):
-    list_display = ('person', 'recipient', 'notification_type', 'status', 'sent_at', 'delivered_at')
+    list_display = ('person', 'recipient', 'notification_type', 'status', 'attempts', 'sent_at', 'delivered_at')
     list_filter = ('notification_type', 'status')
     search_fields = ('person__first_name', 'person__last_name', 'recipient', 'message')
     readonly_fields = ('created_at',)
+
+@admin.register(DeviceCredential)
+class DeviceCredentialAdmin(admin.ModelAdmin):
+    list_display = ('name', 'person', 'key_prefix', 'is_active', 'created_at', 'revoked_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'key_prefix', 'person__first_name', 'person__last_name')
+    readonly_fields = ('key_prefix', 'key_hash', 'created_by', 'created_at', 'revoked_at')
@@ -0,0 +1,127 @@
+"""
+Helpers for alerts raised by the system rather than by an operator.
+
+Repeats of an open alert are folded into it: a flapping device near a zone
+boundary bumps ``occurrence_count`` on one alert rather than creating (and
+notifying) a new alert per fix.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .metrics import increment
+from .models import Alert
+from .system_settings import get_system_settings
+
+ALERT_TITLES = dict(Alert.ALERT_TYPES)
+OPEN_STATUSES = ['active', 'investigating']
+
+# Size at which expired entries are swept out of the open alert index
+INDEX_SWEEP_SIZE = 10000
+
+
+def location_alerts_enabled():
+    return get_system_settings().enable_location_alerts
+
+
+class OpenAlertIndex:
+    """
+    Open alert and time of last occurrence per ``(person_id, alert_type)``.
+
+    Entries are only hints: a repeat is folded in with an UPDATE that matches
+    open alerts only, so an alert closed by another process is detected there
+    and a fresh alert is raised instead.
+    """
+    def __init__(self):
+        self._entries = {}
+
+    def clear(self):
+        self._entries.clear()
+
+    def get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        alert_id, last_seen = entry
+        if now - last_seen > timedelta(seconds=settings.ALERT_DEDUP_WINDOW_SECONDS):
+            del self._entries[key]
+            return None
+        return alert_id
+
+    def set(self, key, alert_id, now):
+        if len(self._entries) >= INDEX_SWEEP_SIZE:
+            cutoff = now - timedelta(seconds=settings.ALERT_DEDUP_WINDOW_SECONDS)
+            self._entries = {k: v for k, v in self._entries.items() if v[1] >= cutoff}
+        self._entries[key] = (alert_id, now)
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+
+open_alerts = OpenAlertIndex()
+
+
+def find_open_alert(person_id, alert_type, now):
+    """ID of the person's open alert of ``alert_type`` seen within the window, or None"""
+    key = (person_id, alert_type)
+    alert_id = open_alerts.get(key, now)
+    if alert_id is None:
+        # Not seen by this process lately, e.g. raised before a restart
+        alert_id = Alert.objects.filter(
+            person_id=person_id, alert_type=alert_type, status__in=OPEN_STATUSES,
+            updated_at__gte=now - timedelta(seconds=settings.ALERT_DEDUP_WINDOW_SECONDS),
+        ).order_by('-updated_at').values_list('id', flat=True).first()
+    return alert_id
+
+
+def raise_alert(person_id, alert_type, description, priority='medium', location=None, title=None):
+    """
+    Create an active alert of ``alert_type`` for a person.
+
+    If the person already has an open alert of that type seen within
+    ``ALERT_DEDUP_WINDOW_SECONDS``, count the repeat on it instead and return
+    None.
+    """
+    now = timezone.now()
+    key = (person_id, alert_type)
+    alert_id = find_open_alert(person_id, alert_type, now)
+    if alert_id is not None:
+        repeated = Alert.objects.filter(pk=alert_id, status__in=OPEN_STATUSES).update(
+            occurrence_count=F('occurrence_count') + 1, updated_at=now
+        )
+        if repeated:
+            open_alerts.set(key, alert_id, now)
+            increment('alerts_suppressed')
+            return None
+        open_alerts.discard(key)
+
+    alert = Alert.objects.create(
+        person_id=person_id,
+        alert_type=alert_type,
+        priority=priority,
+        title=title or ALERT_TITLES[alert_type],
+        description=description,
+        location=location,
+    )
+    open_alerts.set(key, alert.id, now)
+    return alert
+
+
+def resolve_alerts(person_id, alert_type, resolution_notes):
+    """Resolve a person's open alerts of ``alert_type``; returns how many were closed"""
+    from .signals import alerts_bulk_updated
+    with transaction.atomic():
+        alerts = Alert.objects.filter(
+            person_id=person_id, alert_type=alert_type, status__in=OPEN_STATUSES
+        )
+        alert_ids = set(alerts.values_list('id', flat=True))
+        if not alert_ids:
+            return 0
+        now = timezone.now()
+        Alert.objects.filter(id__in=alert_ids).update(
+            status='resolved', resolution_notes=resolution_notes, resolved_at=now, updated_at=now
+        )
+        transaction.on_commit(lambda: alerts_bulk_updated.send(sender=Alert, alert_ids=alert_ids))
+    open_alerts.discard((person_id, alert_type))
+    return len(alert_ids)
@@ -0,0 +1,238 @@
+"""
+Columnar archive of location history that has left the LocationLog table.
+
+Each person's fixes for one local day are stored in
+``LOCATION_ARCHIVE_ROOT/<person id>/<YYYY-MM-DD>.trk``:
+
+    header   magic, version, column widths, fix count, first timestamp (ms)
+             and first latitude/longitude (1e-7 degrees)
+    columns  time deltas (ms, unsigned), latitude and longitude deltas (1e-7 degrees),
+             accuracy and speed (tenths, 0xFFFF = unknown), battery
+             (0xFF = unknown) and safe zone flag, each padded to 8 bytes
+
+Delta columns use the narrowest of 16, 32 and 64-bit integers that holds
+every delta, so a typical fix takes 12 bytes instead of the hundreds a
+LocationLog row and its indexes do. Columns are plain little-endian arrays:
+readers memory-map the file and view each column in place. Altitude and
+location descriptions are not archived.
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from django.conf import settings
+from django.utils import timezone
+from .models import LocationLog
+
+MAGIC = b'VTRK'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBIqii')
+COORDINATE_SCALE = 10 ** 7
+NO_TENTHS = 0xFFFF
+NO_BATTERY = 0xFF
+INT_TYPECODES = {2: 'h', 4: 'i', 8: 'q'}
+TIME_TYPECODES = {2: 'H', 4: 'I', 8: 'Q'}
+
+# LocationLog fields read when archiving, in record order
+ARCHIVED_FIELDS = ['timestamp', 'latitude', 'longitude', 'accuracy', 'speed', 'battery_level', 'is_safe_zone']
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def track_path(person_id, day):
+    return os.path.join(settings.LOCATION_ARCHIVE_ROOT, str(person_id), f'{day:%Y-%m-%d}.trk')
+
+
+def archived_days(person_id):
+    """Days archived for a person, oldest first"""
+    try:
+        names = os.listdir(os.path.join(settings.LOCATION_ARCHIVE_ROOT, str(person_id)))
+    except FileNotFoundError:
+        return []
+    return sorted(date.fromisoformat(name[:-4]) for name in names if name.endswith('.trk'))
+
+
+# Encoding
+def _record(timestamp, latitude, longitude, accuracy, speed, battery_level, is_safe_zone):
+    """Quantise one fix to the integers stored in the archive; negative readings are stored as unknown"""
+    def tenths(value):
+        if value is None or value < 0:
+            return NO_TENTHS
+        return min(round(value * 10), NO_TENTHS - 1)
+
+    return (
+        (timestamp - EPOCH) // timedelta(milliseconds=1),
+        round(latitude * COORDINATE_SCALE),
+        round(longitude * COORDINATE_SCALE),
+        tenths(accuracy),
+        tenths(speed),
+        NO_BATTERY if battery_level is None or battery_level < 0 else min(battery_level, NO_BATTERY - 1),
+        int(is_safe_zone),
+    )
+
+
+def _deltas(values, typecodes=INT_TYPECODES):
+    """Differences to the previous value, in the narrowest of ``typecodes`` that holds them"""
+    deltas = [0] + [value - previous for previous, value in zip(values, values[1:])]
+    for width in (2, 4):
+        try:
+            return array(typecodes[width], deltas)
+        except OverflowError:
+            pass
+    return array(typecodes[8], deltas)
+
+
+def _column_bytes(column):
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    data = column.tobytes()
+    return data + bytes(-len(data) % 8)
+
+
+def encode(records):
+    """Pack quantised records, sorted by time, into the archive format"""
+    times, lats, lngs, accuracies, speeds, batteries, safe = zip(*records)
+    time_deltas, lat_deltas, lng_deltas = _deltas(times, TIME_TYPECODES), _deltas(lats), _deltas(lngs)
+    header = HEADER.pack(
+        MAGIC, VERSION, time_deltas.itemsize, lat_deltas.itemsize, lng_deltas.itemsize,
+        len(records), times[0], lats[0], lngs[0],
+    )
+    columns = [
+        time_deltas, lat_deltas, lng_deltas,
+        array('H', accuracies), array('H', speeds), array('B', batteries), array('B', safe),
+    ]
+    return header + bytes(-len(header) % 8) + b''.join(_column_bytes(column) for column in columns)
+
+
+# Decoding
+class Track:
+    """A memory-mapped archived track; iterate it for the fixes, oldest first"""
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, time_width, lat_width, lng_width, self.count, self.base_time, self.base_lat, self.base_lng = (
+            HEADER.unpack_from(self._map)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} track archive')
+        self._view = memoryview(self._map)
+        offset = HEADER.size + -HEADER.size % 8
+        self.columns = []
+        for typecode in [TIME_TYPECODES[time_width], INT_TYPECODES[lat_width], INT_TYPECODES[lng_width], 'H', 'H', 'B', 'B']:
+            size = self.count * struct.calcsize(typecode)
+            self.columns.append(self._view[offset:offset + size].cast(typecode))
+            offset += size + -size % 8
+        if sys.byteorder != 'little':
+            self.columns = [self._swapped(column) for column in self.columns]
+
+    @staticmethod
+    def _swapped(column):
+        column = array(column.format, column)
+        column.byteswap()
+        return column
+
+    def close(self):
+        # The map can only be closed once no view of it is left
+        for column in self.columns:
+            if isinstance(column, memoryview):
+                column.release()
+        self.columns = []
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """Yield the quantised records, in the form ``encode`` takes"""
+        time, lat, lng = self.base_time, self.base_lat, self.base_lng
+        for dt, dlat, dlng, accuracy, speed, battery, safe in zip(*self.columns):
+            time += dt
+            lat += dlat
+            lng += dlng
+            yield time, lat, lng, accuracy, speed, battery, safe
+
+    def __iter__(self):
+        """Yield the fixes as dicts shaped like the LocationLog API's"""
+        for time, lat, lng, accuracy, speed, battery, safe in self.records():
+            yield {
+                'timestamp': EPOCH + timedelta(milliseconds=time),
+                'latitude': lat / COORDINATE_SCALE,
+                'longitude': lng / COORDINATE_SCALE,
+                'accuracy': None if accuracy == NO_TENTHS else accuracy / 10,
+                'speed': None if speed == NO_TENTHS else speed / 10,
+                'battery_level': None if battery == NO_BATTERY else battery,
+                'is_safe_zone': bool(safe),
+            }
+
+
+def open_track(person_id, day):
+    """The archived track of a person's day, or None"""
+    try:
+        return Track(track_path(person_id, day))
+    except FileNotFoundError:
+        return None
+
+
+# Writing
+def write_track(person_id, day, records):
+    """
+    Add quantised records to a person's archived day.
+
+    Records already in the archive are merged in and exact repeats dropped,
+    so re-archiving a day after an interrupted purge is harmless. The file is
+    replaced atomically.
+    """
+    path = track_path(person_id, day)
+    records = set(records)
+    track = open_track(person_id, day)
+    if track is not None:
+        with track:
+            records.update(track.records())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(encode(sorted(records)))
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return len(records)
+
+
+def archive_range(start, end):
+    """
+    Archive every LocationLog fix with ``start <= timestamp < end``.
+
+    ``start`` and ``end`` should lie within one local day, which names the
+    files written. Returns the number of fixes read.
+    """
+    day = timezone.localtime(start).date()
+    rows = (
+        LocationLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .order_by('person_id', 'timestamp')
+        .values_list('person_id', *ARCHIVED_FIELDS)
+    )
+    archived = 0
+    for person_id, fixes in groupby(rows.iterator(chunk_size=5000), key=lambda row: row[0]):
+        records = [
+            _record(timestamp, float(latitude), float(longitude),
+                    None if accuracy is None else float(accuracy),
+                    None if speed is None else float(speed), battery_level, is_safe_zone)
+            for _, timestamp, latitude, longitude, accuracy, speed, battery_level, is_safe_zone in fixes
+        ]
+        write_track(person_id, day, records)
+        archived += len(records)
+    return archived
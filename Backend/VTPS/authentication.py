@@ -0,0 +1,203 @@
+"""
+API authentication classes.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from .ingest import DeviceOwner
+from .models import DeviceCredential, User
+from .versions import VersionWatcher, bump_version_on_commit, cache_is_shared
+
+
+# User fields cached per token; the rest of the user loads on first access
+TOKEN_USER_FIELDS = [field.attname for field in User._meta.concrete_fields
+                     if field.attname in ('id', 'is_active', 'is_superuser', 'role')]
+
+
+def _token_user_values(key):
+    return Token.objects.filter(key=key).values_list(*(f'user__{name}' for name in TOKEN_USER_FIELDS)).first()
+
+
+class TokenCache:
+    """
+    Who each API token belongs to, held in process memory for at most
+    ``AUTH_TOKEN_CACHE_SECONDS``.
+
+    Only ``TOKEN_USER_FIELDS`` of the user are kept, never the password hash,
+    under a digest of the token. Deleting a token or saving its user bumps
+    the ``auth_tokens`` version in the shared cache, which empties this cache
+    in every process; with a process-local cache backend other processes
+    would never see that, so nothing is cached.
+    """
+    max_size = 50000
+
+    def __init__(self):
+        self._tokens = {}  # key digest -> (expires at, user values)
+        self._watcher = VersionWatcher('auth_tokens')
+
+    def get(self, key):
+        if not settings.AUTH_TOKEN_CACHE_SECONDS or not cache_is_shared():
+            return _token_user_values(key)
+        if self._watcher.changed():
+            self.clear()
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        now = time.monotonic()
+        entry = self._tokens.get(digest)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        values = _token_user_values(key)
+        if values is None:
+            self._tokens.pop(digest, None)
+            return None
+        if len(self._tokens) >= self.max_size:
+            self._tokens = {digest: entry for digest, entry in self._tokens.items() if entry[0] > now}
+            if len(self._tokens) >= self.max_size:
+                self._tokens.clear()
+        self._tokens[digest] = (now + settings.AUTH_TOKEN_CACHE_SECONDS, values)
+        return values
+
+    def clear(self):
+        self._tokens.clear()
+
+
+tokens = TokenCache()
+
+
+def get_token(key):
+    """The Token with ``key`` and its user, None if unknown"""
+    values = tokens.get(key)
+    if values is None:
+        return None
+    user = User.from_db(None, TOKEN_USER_FIELDS, values)
+    return Token(key=key, user=user)
+
+
+def forget_tokens():
+    """Drop the cached tokens of every process, now and when the transaction commits"""
+    bump_version_on_commit('auth_tokens')
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers who a token belongs to in process
+    memory (see ``TokenCache``), so most requests authenticate without a
+    query.
+    """
+    def authenticate_credentials(self, key):
+        token = get_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
+
+
+# Device keys
+class AuthenticatedDevice:
+    """``request.user`` of a request made with a device key"""
+    is_authenticated = True
+    is_anonymous = False
+    is_superuser = False
+    is_staff = False
+
+    def __init__(self, credential_id, owner):
+        self.credential_id = credential_id
+        self.owner = owner
+
+    @property
+    def person_id(self):
+        return self.owner.person_id
+
+    def __str__(self):
+        return f'device {self.credential_id}'
+
+
+class DeviceKeyCache:
+    """
+    Device keys by digest, held in process memory for at most
+    ``DEVICE_KEY_CACHE_SECONDS``.
+
+    Saving a credential or a person bumps the ``device_credentials`` version
+    in the shared cache, which empties this cache in every process; the
+    expiry bounds how long a key revoked without a bump is still accepted.
+    Unknown keys are remembered apart from the valid ones, so a misconfigured
+    tracker retrying in a loop costs no queries and a flood of made-up keys
+    cannot push the valid ones out.
+    """
+    max_size = 50000
+    max_unknown = 10000
+
+    def __init__(self):
+        self._devices = {}  # key digest -> (expires at, AuthenticatedDevice)
+        self._unknown = {}  # key digest -> expires at
+        self._watcher = VersionWatcher('device_credentials')
+
+    def get(self, key):
+        if self._watcher.changed():
+            self.clear()
+        key_hash = DeviceCredential.hash_key(key)
+        now = time.monotonic()
+        entry = self._devices.get(key_hash)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        if self._unknown.get(key_hash, 0) > now:
+            return None
+        row = (
+            DeviceCredential.objects.filter(key_hash=key_hash, is_active=True)
+            .values_list('id', 'person_id', 'person__assigned_supervisor_id', 'person__current_status')
+            .first()
+        )
+        expires = now + settings.DEVICE_KEY_CACHE_SECONDS
+        if row is None:
+            self._devices.pop(key_hash, None)
+            if len(self._unknown) >= self.max_unknown:
+                self._unknown.clear()
+            self._unknown[key_hash] = expires
+            return None
+        device = AuthenticatedDevice(row[0], DeviceOwner(*row[1:]))
+        if len(self._devices) >= self.max_size:
+            self._devices = {digest: entry for digest, entry in self._devices.items() if entry[0] > now}
+            if len(self._devices) >= self.max_size:
+                self._devices.clear()
+        self._devices[key_hash] = (expires, device)
+        return device
+
+    def clear(self):
+        self._devices.clear()
+        self._unknown.clear()
+
+
+device_keys = DeviceKeyCache()
+
+
+class DeviceKeyAuthentication(BaseAuthentication):
+    """
+    Authenticates GPS trackers sending ``Authorization: Device <key>``.
+
+    ``request.user`` becomes an ``AuthenticatedDevice`` naming the credential
+    and the person it reports for, resolved from memory after the first
+    request; there is no session, CSRF check or User lookup.
+    """
+    keyword = 'Device'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid device key header.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid device key header.'))
+        device = device_keys.get(key)
+        if device is None:
+            raise exceptions.AuthenticationFailed(_('Invalid or revoked device key.'))
+        return (device, None)
+
+    def authenticate_header(self, request):
+        return self.keyword
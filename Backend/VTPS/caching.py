@@ -0,0 +1,58 @@
+"""
+Conditional GET and rendered-page caching for list endpoints.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .versions import get_versions
+
+
+class ConditionalListMixin:
+    """
+    ETag and Last-Modified for ``list`` built from the version counters
+    named in ``cache_versions``, which must cover every model the page
+    shows. A matching If-None-Match or If-Modified-Since is answered with 304
+    before any query runs, and rendered JSON pages are cached under their
+    ETag, so a change to any of those models retires both.
+    """
+    cache_versions = ()
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            # The browsable API shows the user and a CSRF token
+            return super().list(request, *args, **kwargs)
+        versions = get_versions(self.cache_versions)
+        page = f'{request.get_full_path()}|{request.accepted_media_type}|{versions}'
+        etag = '"%s"' % hashlib.sha1(page.encode()).hexdigest()
+        # Versions are bump times in nanoseconds. HTTP dates have whole seconds,
+        # so a page that may still change within this second gets none.
+        last_modified = max(versions) // 10 ** 9
+        if last_modified >= int(time.time()):
+            last_modified = None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cached = cache.get(f'vtps:page:{etag}')
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super().list(request, *args, **kwargs)
+                self._page_cache_key = f'vtps:page:{etag}'
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_page_cache_key', None)
+        if key is not None and response.status_code == 200:
+            response.render()
+            cache.set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_SECONDS)
+        return response
@@ -0,0 +1,20 @@
+"""
+System checks for the deployment settings VTPS relies on.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from .versions import cache_is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    message = (
+        f"The default cache ({settings.CACHES['default']['BACKEND']}) is local to each process, so "
+        "invalidations, revoked device keys and metrics are not seen by other worker processes."
+    )
+    hint = 'Set CACHE_BACKEND to database, redis or memcached, or run a single process with DEBUG on.'
+    if settings.DEBUG:
+        return [Warning(message, hint=hint, id='VTPS.W001')]
+    return [Error(message, hint=hint, id='VTPS.E001')]
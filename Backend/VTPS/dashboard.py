@@ -0,0 +1,49 @@
+"""
+Dashboard statistics, computed with a handful of queries and cached briefly.
+
+Every operator console polls these numbers, so a computed payload is shared
+for ``DASHBOARD_STATS_CACHE_SECONDS`` and dropped as soon as an alert or a
+person changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .models import Alert, VulnerablePerson
+from .serializers import AlertSerializer, VulnerablePersonListSerializer
+
+DASHBOARD_STATS_CACHE_KEY = 'vtps:dashboard_stats'
+
+
+def compute_dashboard_stats():
+    counts = VulnerablePerson.objects.order_by().aggregate(
+        total_people=Count('id'),
+        safe_count=Count('id', filter=Q(current_status='safe')),
+        warning_count=Count('id', filter=Q(current_status='warning')),
+        emergency_count=Count('id', filter=Q(current_status='emergency')),
+        total_tracked=Count('id', filter=Q(is_being_monitored=True)),
+    )
+    active_alerts = Alert.objects.filter(status='active').count()
+    recent_alerts = Alert.objects.select_related('person', 'assigned_to', 'resolved_by').order_by('-created_at')[:10]
+    people_status = VulnerablePerson.objects.with_list_stats()[:10]
+    return {
+        'total_people': counts['total_people'],
+        'safe_count': counts['safe_count'],
+        'warning_count': counts['warning_count'],
+        'emergency_count': counts['emergency_count'],
+        'active_alerts': active_alerts,
+        'total_tracked': counts['total_tracked'],
+        'recent_alerts': AlertSerializer(recent_alerts, many=True).data,
+        'people_status': VulnerablePersonListSerializer(people_status, many=True).data
+    }
+
+
+def get_dashboard_stats():
+    data = cache.get(DASHBOARD_STATS_CACHE_KEY)
+    if data is None:
+        data = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_CACHE_KEY, data, settings.DASHBOARD_STATS_CACHE_SECONDS)
+    return data
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
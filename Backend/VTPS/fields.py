@@ -0,0 +1,38 @@
+"""
+Custom model fields.
+"""
+from django.db import models
+
+
+class ScaledDecimalField(models.DecimalField):
+    """
+    A DecimalField stored as an integer count of ``10 ** -stored_places``.
+
+    Coordinates at 1e-7 degrees fit a 32-bit integer, which takes less space
+    than a decimal column and reads back without building a ``Decimal`` per
+    value. Values read from the database are floats; forms and serializers
+    still see a DecimalField, so API output keeps ``decimal_places`` digits.
+    """
+    def __init__(self, *args, stored_places=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stored_places = self.decimal_places if stored_places is None else stored_places
+        self.scale = 10 ** self.stored_places
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.stored_places != self.decimal_places:
+            kwargs['stored_places'] = self.stored_places
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'IntegerField'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if hasattr(value, 'as_sql'):
+            return value
+        if not prepared:
+            value = self.get_prep_value(value)
+        return None if value is None else round(value * self.scale)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else value / self.scale
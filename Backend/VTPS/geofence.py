@@ -0,0 +1,150 @@
+"""
+Geofence evaluation of incoming fixes against each person's SafeZones.
+
+Active zones are held in a process-wide index keyed by person, with centres
+and radii pre-converted to floats, so checking a fix is a few float
+operations per zone instead of a query and DecimalField arithmetic.
+"""
+import math
+from django.conf import settings
+from django.utils import timezone
+from .models import SafeZone
+from .versions import VersionWatcher
+
+EARTH_RADIUS_METERS = 6371008.8
+
+# Geofence states tracked per person
+INSIDE = 'inside'
+OUTSIDE = 'outside'
+VIOLATION = 'violation'
+
+
+class Zone:
+    """Float copy of a SafeZone's geometry and schedule"""
+    __slots__ = ('id', 'name', 'lat', 'lng', 'cos_lat', 'radius', 'start', 'end', 'days')
+
+    def __init__(self, zone):
+        self.id = zone.id
+        self.name = zone.name
+        self.lat = math.radians(float(zone.center_latitude))
+        self.lng = math.radians(float(zone.center_longitude))
+        self.cos_lat = math.cos(self.lat)
+        self.radius = float(zone.radius_meters)
+        self.start = zone.active_start_time
+        self.end = zone.active_end_time
+        self.days = zone.active_days
+
+    def is_active_at(self, local_time):
+        """Whether the zone applies at ``local_time`` (an aware local datetime)"""
+        if str(local_time.isoweekday()) not in self.days:
+            return False
+        if self.start is None or self.end is None:
+            return True
+        now = local_time.time()
+        if self.start <= self.end:
+            return self.start <= now <= self.end
+        # Window wraps past midnight, e.g. 22:00-06:00
+        return now >= self.start or now <= self.end
+
+    def distance_from_edge(self, lat, lng):
+        """
+        Metres from the zone boundary to (lat, lng) in radians; negative inside.
+
+        Uses the equirectangular approximation, which is well within GPS error
+        at safe zone scales.
+        """
+        x = (lng - self.lng) * self.cos_lat
+        y = lat - self.lat
+        return math.sqrt(x * x + y * y) * EARTH_RADIUS_METERS - self.radius
+
+
+class GeofenceIndex:
+    """
+    Active SafeZones per person plus each person's last geofence state.
+
+    Zones are loaded lazily, one query per batch of unseen people, and the
+    whole index is dropped whenever any SafeZone is saved or deleted.
+    """
+    def __init__(self):
+        self._zones = {}
+        self._states = {}
+        self._watcher = VersionWatcher('safe_zones')
+
+    def clear(self):
+        self._zones.clear()
+
+    def load(self, person_ids):
+        """Make sure zones for ``person_ids`` are in the index"""
+        if self._watcher.changed():
+            self.clear()
+        missing = {person_id for person_id in person_ids if person_id not in self._zones}
+        if not missing:
+            return
+        zones = {person_id: [] for person_id in missing}
+        for zone in SafeZone.objects.filter(person_id__in=missing, is_active=True).order_by():
+            zones[zone.person_id].append(Zone(zone))
+        self._zones.update(zones)
+
+    def evaluate(self, person_id, latitude, longitude, when):
+        """
+        Check one fix against the person's zones active at ``when``.
+
+        Returns ``None`` when no zone applies, otherwise the distance in metres
+        from the nearest zone edge (zero or negative means inside).
+        """
+        zones = self._zones.get(person_id)
+        if zones is None:
+            self.load([person_id])
+            zones = self._zones[person_id]
+        if not zones:
+            return None
+        local_time = timezone.localtime(when)
+        lat = math.radians(float(latitude))
+        lng = math.radians(float(longitude))
+        nearest = None
+        for zone in zones:
+            if zone.is_active_at(local_time):
+                distance = zone.distance_from_edge(lat, lng)
+                if nearest is None or distance < nearest:
+                    nearest = distance
+        return nearest
+
+    def apply(self, logs, latest=None):
+        """
+        Set ``is_safe_zone`` on unsaved LocationLogs and report state changes.
+
+        Returns ``(log, alert_type)`` pairs for fixes that moved a person out of
+        their safe zones (``safe_zone_exit``) or beyond the violation distance
+        (``geofence_violation``). Fixes older than the person's last evaluated
+        fix are flagged but do not change state. ``latest`` maps person IDs to
+        their locked LatestLocation rows; a row newer than the state held here
+        means another process handled later fixes, so its state is taken over.
+        """
+        self.load({log.person_id for log in logs})
+        for person_id, row in (latest or {}).items():
+            state = self._states.get(person_id)
+            if state is None or row.timestamp > state[1]:
+                self._states[person_id] = (INSIDE if row.is_safe_zone else OUTSIDE, row.timestamp)
+        changes = []
+        for log in sorted(logs, key=lambda log: log.timestamp):
+            distance = self.evaluate(log.person_id, log.latitude, log.longitude, log.timestamp)
+            log.is_safe_zone = distance is None or distance <= 0
+            if log.is_safe_zone:
+                state = INSIDE
+            elif distance > settings.GEOFENCE_VIOLATION_DISTANCE_METERS:
+                state = VIOLATION
+            else:
+                state = OUTSIDE
+
+            previous_state, previous_time = self._states.get(log.person_id, (INSIDE, None))
+            if previous_time is not None and log.timestamp < previous_time:
+                continue
+            self._states[log.person_id] = (state, log.timestamp)
+            if state == VIOLATION and previous_state != VIOLATION:
+                changes.append((log, 'geofence_violation'))
+            elif state == OUTSIDE and previous_state == INSIDE:
+                changes.append((log, 'safe_zone_exit'))
+        return changes
+
+
+zone_index = GeofenceIndex()
@@ -0,0 +1,177 @@
+"""
+Location ingest pipeline shared by the single-fix and batch GPS endpoints.
+"""
+import math
+from collections import namedtuple
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .alerts import location_alerts_enabled, raise_alert
+from .geofence import EARTH_RADIUS_METERS, zone_index
+from .metrics import increment
+from .models import LatestLocation, LocationLog, VulnerablePerson
+from .realtime import publish_locations
+from .spatial import positions
+from .system_settings import get_system_settings
+from .tracks import forget_buckets
+from .versions import bump_version
+
+GEOFENCE_ALERTS = {
+    'safe_zone_exit': ('high', 'Left all active safe zones.'),
+    'geofence_violation': ('critical', 'More than {distance} m outside all active safe zones.'),
+}
+
+
+DeviceOwner = namedtuple('DeviceOwner', ['person_id', 'supervisor_id', 'status'])
+
+
+def resolve_devices(device_ids):
+    """Map each known GPS device ID to its owner with a single query"""
+    rows = (
+        VulnerablePerson.objects
+        .filter(gps_device_id__in=set(device_ids))
+        .order_by()
+        .values_list('gps_device_id', 'id', 'assigned_supervisor_id', 'current_status')
+    )
+    return {device_id: DeviceOwner(*owner) for device_id, *owner in rows}
+
+
+def store_fixes(fixes):
+    """
+    Persist validated GPS fixes with one device lookup and one bulk INSERT.
+
+    ``fixes`` are dicts as validated by ``LocationCreateSerializer``. Returns
+    ``(logs, rejected)``: a list aligned with ``fixes`` holding each
+    ``LocationLog``, or ``None`` where the device ID is not assigned to
+    anyone, and the reasons for the logs dropped by ``filter_fixes`` by log ID.
+    """
+    owners = resolve_devices(fix['device_id'] for fix in fixes)
+    logs = []
+    for fix in fixes:
+        data = dict(fix)
+        owner = owners.get(data.pop('device_id'))
+        logs.append(LocationLog(person_id=owner.person_id, **data) if owner else None)
+    rejected = store_logs([log for log in logs if log is not None], {owner.person_id: owner for owner in owners.values()})
+    return logs, rejected
+
+
+def store_logs(created, owners_by_person):
+    """
+    Persist unsaved LocationLogs of known people with one bulk INSERT.
+
+    ``owners_by_person`` maps each person ID to its ``DeviceOwner``. Fixes
+    failing ``filter_fixes`` are dropped; returns their reasons by log ID.
+    Updates LatestLocation, raises geofence alerts and publishes the fixes on
+    commit.
+    """
+    with transaction.atomic():
+        latest = {
+            row.person_id: row
+            for row in LatestLocation.objects.select_for_update().filter(person_id__in={log.person_id for log in created})
+        }
+        rejected = filter_fixes(created, latest)
+        if rejected:
+            created = [log for log in created if log.id not in rejected]
+            if not created:
+                return rejected
+        changes = zone_index.apply(created, latest)
+        LocationLog.objects.bulk_create(created)
+        update_latest_locations(created, latest)
+        if changes and location_alerts_enabled():
+            for log, alert_type in changes:
+                priority, description = GEOFENCE_ALERTS[alert_type]
+                raise_alert(
+                    log.person_id, alert_type,
+                    description.format(distance=settings.GEOFENCE_VIOLATION_DISTANCE_METERS),
+                    priority=priority,
+                    location=f'{log.latitude}, {log.longitude}',
+                )
+        transaction.on_commit(lambda: publish_locations(created, owners_by_person))
+        transaction.on_commit(lambda: forget_buckets(created))
+        transaction.on_commit(lambda: positions.observe(created))
+        transaction.on_commit(lambda: bump_version('locations'))
+    return rejected
+
+
+# Outlier filtering
+def _distance_meters(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(1.0, a)))
+
+
+def filter_fixes(logs, latest):
+    """
+    Find the fixes in ``logs`` that are too inaccurate or too far away to be real.
+
+    A fix is rejected when its accuracy is worse than
+    ``SystemSettings.gps_accuracy_threshold_meters``, or when getting there
+    from the person's previous fix (their row in ``latest``, or an earlier
+    accepted fix of the batch) implies more than ``LOCATION_MAX_SPEED_KMH``.
+    Fixes older than the previous fix are only checked for accuracy.
+    Returns the reasons for rejection by log ID and counts them in metrics.
+    """
+    threshold = get_system_settings().gps_accuracy_threshold_meters
+    max_speed = settings.LOCATION_MAX_SPEED_KMH / 3.6
+    previous = {}
+    rejected = {}
+    inaccurate = implausible = 0
+    for log in sorted(logs, key=lambda log: log.timestamp):
+        if log.accuracy is not None and float(log.accuracy) > threshold:
+            rejected[log.id] = f'Accuracy of {float(log.accuracy):g} m is worse than the {threshold} m threshold.'
+            inaccurate += 1
+            continue
+        last = previous.get(log.person_id) or latest.get(log.person_id)
+        if last is not None and log.timestamp > last.timestamp:
+            seconds = (log.timestamp - last.timestamp).total_seconds()
+            speed = _distance_meters(
+                float(last.latitude), float(last.longitude), float(log.latitude), float(log.longitude)
+            ) / seconds
+            if speed > max_speed:
+                rejected[log.id] = f'Implies {speed * 3.6:.0f} km/h since the previous fix.'
+                implausible += 1
+                continue
+        if last is None or log.timestamp >= last.timestamp:
+            previous[log.person_id] = log
+    if inaccurate:
+        increment('fixes_rejected_inaccurate', inaccurate)
+    if implausible:
+        increment('fixes_rejected_implausible_speed', implausible)
+    return rejected
+
+
+LATEST_LOCATION_FIELDS = ['latitude', 'longitude', 'accuracy', 'battery_level', 'is_safe_zone', 'timestamp']
+
+
+def update_latest_locations(logs, latest):
+    """
+    Upsert the LatestLocation row of every person in ``logs``.
+
+    ``latest`` maps person IDs to their current, locked rows; fixes older
+    than those (late uploads of buffered fixes) are ignored. People without
+    a row have nothing to lock, so a concurrent ingest may insert theirs
+    first: their rows are inserted if missing and then only overwritten
+    while older than the new fix.
+    """
+    newest = {}
+    for log in logs:
+        current = newest.get(log.person_id) or latest.get(log.person_id)
+        if current is None or log.timestamp >= current.timestamp:
+            newest[log.person_id] = log
+    rows = [
+        LatestLocation(person_id=log.person_id, **{field: getattr(log, field) for field in LATEST_LOCATION_FIELDS})
+        for log in newest.values()
+    ]
+    LatestLocation.objects.bulk_create(
+        [row for row in rows if row.person_id in latest],
+        update_conflicts=True,
+        unique_fields=['person'],
+        update_fields=LATEST_LOCATION_FIELDS + ['updated_at'],
+    )
+    first = [row for row in rows if row.person_id not in latest]
+    LatestLocation.objects.bulk_create(first, ignore_conflicts=True)
+    now = timezone.now()
+    for row in first:
+        LatestLocation.objects.filter(person_id=row.person_id, timestamp__lt=row.timestamp).update(
+            updated_at=now, **{field: getattr(row, field) for field in LATEST_LOCATION_FIELDS}
+        )
@@ -0,0 +1,61 @@
+"""
+Shared plumbing for the bench_* management commands.
+
+Benchmarks run against a throwaway test database, so they never touch real
+data and can be run on any checkout with ``python manage.py bench_<name>``.
+"""
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+from VTPS.models import User
+
+
+class BenchmarkCommand(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run_benchmark(**options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, **options):
+        raise NotImplementedError
+
+    def api_client(self, role='admin'):
+        user = User.objects.create_user(username=f'bench-{role}', password='bench', role=role)
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def measure(self, label, func, repeat):
+        """Time ``func`` ``repeat`` times and report its median latency and query count"""
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            func()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        self.stdout.write(
+            f'{label:<40} {median * 1000:>10.2f} ms  {queries:>6} queries'
+        )
+        return median
+
+    def step(self, message):
+        self.stdout.write(self.style.MIGRATE_HEADING(message))
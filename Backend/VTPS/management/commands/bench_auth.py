@@ -0,0 +1,27 @@
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from VTPS.models import User
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark token-authenticated requests with the token cache off and on'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--path', default='/api/dashboard-stats/', help='Endpoint requested')
+
+    def run_benchmark(self, path, repeat, **options):
+        user = User.objects.create_user(username='bench-auth', password='bench', role='admin')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        self.step(f'GET {path}')
+        for label, seconds in [('token cache off', 0), ('token cache on', 300)]:
+            with override_settings(AUTH_TOKEN_CACHE_SECONDS=seconds):
+                cache.clear()
+                client.get(path)
+                median = self.measure(label, lambda: client.get(path), repeat)
+            self.stdout.write(f'{"":<40} {1 / median:>10.0f} requests/s')
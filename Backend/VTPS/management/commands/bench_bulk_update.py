@@ -0,0 +1,40 @@
+from VTPS.models import Alert, VulnerablePerson
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark /api/bulk-alert-update/ and /api/bulk-person-update/ against per-row saves'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--ids', type=int, default=10_000)
+
+    def run_benchmark(self, ids, repeat, **options):
+        self.step(f'Seeding {ids} people and {ids} alerts')
+        people = VulnerablePerson.objects.bulk_create(
+            VulnerablePerson(first_name=f'Person{i}', last_name='Bench', age=80, address='Bench street')
+            for i in range(ids)
+        )
+        alerts = Alert.objects.bulk_create(
+            Alert(person=person, alert_type='battery_low', title='Low Battery', description='Bench alert')
+            for person in people
+        )
+        alert_ids = [str(alert.id) for alert in alerts]
+        person_ids = [str(person.id) for person in people]
+        client = self.api_client()
+
+        def per_row_alert_update():
+            for alert in Alert.objects.filter(id__in=alert_ids):
+                alert.status = 'resolved'
+                alert.save()
+
+        statuses = iter(['resolved', 'active'] * (repeat + 1))
+
+        self.step(f'Updating {ids} ids')
+        self.measure('per-row save() loop (previous behaviour)', per_row_alert_update, max(1, repeat // 5))
+        self.measure('POST /api/bulk-alert-update/', lambda: client.post(
+            '/api/bulk-alert-update/', {'alert_ids': alert_ids, 'status': next(statuses)}, format='json'
+        ), repeat)
+        self.measure('POST /api/bulk-person-update/', lambda: client.post(
+            '/api/bulk-person-update/', {'person_ids': person_ids, 'risk_level': 'high'}, format='json'
+        ), repeat)
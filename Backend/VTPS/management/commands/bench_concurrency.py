@@ -0,0 +1,151 @@
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+from VTPS.activity import activity
+from VTPS.models import DeviceCredential, User, VulnerablePerson
+from VTPS.throttling import DeviceRateThrottle
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Run writer threads posting fixes to /api/devices/locations/ and reader threads listing '
+        '/api/people/ and /api/locations/ against an on-disk database, with SQLite defaults and '
+        'with the configured database options'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Threads posting fixes')
+        parser.add_argument('--readers', type=int, default=8, help='Threads listing people and locations')
+        parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+        parser.add_argument('--people', type=int, default=50, help='Monitored people created')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.run_profile('configured', connection.settings_dict.get('OPTIONS', {}), **options)
+            return
+        for label, database_options in [('sqlite defaults', {}), ('configured', settings.SQLITE_TUNING)]:
+            self.run_profile(label, database_options, **options)
+
+    def run_profile(self, label, database_options, **options):
+        settings_dict = connection.settings_dict
+        saved = settings_dict['OPTIONS'], dict(settings_dict['TEST'])
+        directory = tempfile.TemporaryDirectory()
+        settings_dict['OPTIONS'] = database_options
+        if connection.vendor == 'sqlite':
+            # An in-memory test database would not show file locking
+            settings_dict['TEST']['NAME'] = os.path.join(directory.name, 'bench.sqlite3')
+        connection.close()
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.step(f'{label}: {options["writers"]} writers, {options["readers"]} readers')
+            self.run_benchmark(**options)
+        finally:
+            activity.flush()
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            settings_dict['OPTIONS'], settings_dict['TEST'] = saved
+            directory.cleanup()
+
+    def run_benchmark(self, writers, readers, seconds, people, **options):
+        cache.clear()
+        admin = User.objects.create_user(username='bench-admin', password='bench', role='admin')
+        persons = VulnerablePerson.objects.bulk_create(
+            VulnerablePerson(first_name='Bench', last_name=str(i), age=80, address='-', is_being_monitored=True)
+            for i in range(people)
+        )
+        keys = [DeviceCredential.issue(person, 'bench')[1] for person in persons]
+
+        results = {'write': [], 'read': []}
+        errors = {}
+        lock = threading.Lock()
+        start = threading.Barrier(writers + readers + 1)
+        stop = threading.Event()
+
+        def run(kind, client, request):
+            latencies = []
+            failures = {}
+            start.wait()
+            while not stop.is_set():
+                began = time.perf_counter()
+                try:
+                    response = request(client)
+                    error = f'HTTP {response.status_code}' if response.status_code >= 400 else None
+                except Exception as exc:
+                    error = f'{exc.__class__.__name__}: {exc}'
+                if error:
+                    failures[error] = failures.get(error, 0) + 1
+                else:
+                    latencies.append(time.perf_counter() - began)
+            connection.close()
+            with lock:
+                results[kind].extend(latencies)
+                for error, count in failures.items():
+                    errors[error] = errors.get(error, 0) + count
+
+        def writer(index):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Device {keys[index % len(keys)]}')
+            clock = [timezone.now()]
+
+            def post(client):
+                clock[0] += timedelta(seconds=1)
+                return client.post('/api/devices/locations/', {
+                    'latitude': f'{51.5 + index / 1000:.7f}', 'longitude': '-0.1200000',
+                    'battery_level': 80, 'timestamp': clock[0].isoformat(),
+                }, format='json')
+            run('write', client, post)
+
+        def reader(index):
+            client = APIClient()
+            client.force_authenticate(admin)
+            paths = ['/api/people/', f'/api/locations/?person={persons[index % len(persons)].pk}']
+            turn = [0]
+
+            def get(client):
+                turn[0] += 1
+                return client.get(paths[turn[0] % 2])
+            run('read', client, get)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        # The per-device rate limit would cap the writers long before the database does
+        request_log = logging.getLogger('django.request')
+        level = request_log.level
+        # Errors are counted below rather than logged with a traceback each
+        request_log.setLevel(logging.CRITICAL)
+        with mock.patch.object(DeviceRateThrottle, 'THROTTLE_RATES', {'device': None}):
+            for thread in threads:
+                thread.start()
+            start.wait()
+            time.sleep(seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        request_log.setLevel(level)
+
+        for kind, label in [('write', 'ingest POST'), ('read', 'list GET')]:
+            latencies = sorted(results[kind])
+            if not latencies:
+                self.stdout.write(f'{label:<40} no successful requests')
+                continue
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'{label:<40} {len(latencies) / seconds:>8.0f} req/s  '
+                f'median {statistics.median(latencies) * 1000:>7.1f} ms  p95 {p95 * 1000:>7.1f} ms'
+            )
+        for error, count in sorted(errors.items(), key=lambda item: -item[1]):
+            self.stdout.write(self.style.WARNING(f'{count:>8} x {error[:100]}'))
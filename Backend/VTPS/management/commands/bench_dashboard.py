@@ -0,0 +1,46 @@
+import random
+from django.core.cache import cache
+from django.utils import timezone
+from VTPS.models import Alert, VulnerablePerson
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark /api/dashboard-stats/ query count and latency, cold and cached'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--people', type=int, default=10_000)
+        parser.add_argument('--alerts', type=int, default=1_000_000)
+
+    def run_benchmark(self, people, alerts, repeat, **options):
+        self.step(f'Seeding {people} people and {alerts} alerts')
+        persons = VulnerablePerson.objects.bulk_create(
+            VulnerablePerson(
+                first_name=f'Person{i}', last_name='Bench', age=70 + i % 30, address='Bench street',
+                current_status=random.choice(['safe', 'safe', 'safe', 'warning', 'emergency']),
+                is_being_monitored=i % 2 == 0,
+            )
+            for i in range(people)
+        )
+        now = timezone.now()
+        for offset in range(0, alerts, 10_000):
+            Alert.objects.bulk_create(
+                Alert(
+                    person=random.choice(persons), alert_type='battery_low', title='Low Battery',
+                    description='Bench alert', status=random.choice(['active', 'resolved', 'resolved', 'dismissed']),
+                    created_at=now,
+                )
+                for _ in range(min(10_000, alerts - offset))
+            )
+
+        client = self.api_client()
+        url = '/api/dashboard-stats/'
+
+        def cold():
+            cache.clear()
+            client.get(url)
+
+        self.step('GET /api/dashboard-stats/')
+        self.measure('cold (cache miss)', cold, repeat)
+        self.measure('warm (cached)', lambda: client.get(url), repeat)
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.utils import timezone
+from VTPS.models import EmergencyContact, LatestLocation, SafeZone, VulnerablePerson
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark list endpoints rendered fresh, served from the page cache, and answered with 304'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--people', type=int, default=10_000)
+
+    def run_benchmark(self, people, repeat, **options):
+        self.step(f'Seeding {people} people with a contact, a safe zone and a latest position')
+        persons = VulnerablePerson.objects.bulk_create(
+            (VulnerablePerson(first_name=f'Person{i}', last_name='Bench', age=80, address='Bench street')
+             for i in range(people)),
+            batch_size=5000,
+        )
+        now = timezone.now()
+        EmergencyContact.objects.bulk_create(
+            (EmergencyContact(person=person, name='Contact', relationship='son', phone='+447700900123') for person in persons),
+            batch_size=5000,
+        )
+        SafeZone.objects.bulk_create(
+            (SafeZone(person=person, name='Home', center_latitude=51.5, center_longitude=-0.1) for person in persons),
+            batch_size=5000,
+        )
+        LatestLocation.objects.bulk_create(
+            (LatestLocation(person=person, latitude=51.5, longitude=-0.1, timestamp=now) for person in persons),
+            batch_size=5000,
+        )
+
+        client = self.api_client()
+        for path in ['/api/people/', '/api/safe-zones/', '/api/emergency-contacts/']:
+            self.step(f'GET {path}')
+
+            def fresh():
+                # Forgetting the versions retires every cached page
+                cache.clear()
+                client.get(path)
+            self.measure('rendered', fresh, repeat)
+            etag = client.get(path)['ETag']
+            self.measure('page cache hit', lambda: client.get(path), repeat)
+            self.measure('If-None-Match, 304', lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), repeat)
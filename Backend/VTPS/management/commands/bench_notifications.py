@@ -0,0 +1,70 @@
+import time
+from django.test import override_settings
+from VTPS.models import Alert, EmergencyContact, NotificationLog, VulnerablePerson
+from VTPS.notifications import NotificationDispatcher, queue_alert_notifications
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark fanning a burst of critical alerts out to emergency contacts'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--alerts', type=int, default=5000)
+        parser.add_argument('--contacts', type=int, default=2, help='Emergency contacts per person')
+        parser.add_argument('--latency', type=float, default=0.02, help='Simulated provider latency in seconds')
+
+    def run_benchmark(self, alerts, contacts, latency, **options):
+        self.step(f'Seeding {alerts} people with {contacts} contacts each')
+        people = VulnerablePerson.objects.bulk_create(
+            VulnerablePerson(first_name=f'Person{i}', last_name='Bench', age=80, address='Bench street')
+            for i in range(alerts)
+        )
+        EmergencyContact.objects.bulk_create(
+            EmergencyContact(person=person, name=f'Contact{j}', relationship='other',
+                             phone='+1555000%04d' % j, email=f'contact{j}@example.com')
+            for person in people for j in range(contacts)
+        )
+
+        self.step(f'Creating {alerts} critical alerts')
+        start = time.perf_counter()
+        Alert.objects.bulk_create(
+            Alert(person=person, alert_type='emergency_button', priority='critical',
+                  title='Emergency Button Pressed', description='Bench alert')
+            for person in people
+        )
+        self.stdout.write(f'{"alert insert":<40} {(time.perf_counter() - start) * 1000:>10.2f} ms')
+
+        start = time.perf_counter()
+        queued = queue_alert_notifications()
+        self.stdout.write(f'{f"fan-out ({queued} notifications)":<40} {(time.perf_counter() - start) * 1000:>10.2f} ms')
+
+        backends = {channel: 'VTPS.management.commands.bench_notifications.SlowBackend'
+                    for channel in ['sms', 'email', 'push', 'in_app']}
+        SlowBackend.latency = latency
+        with override_settings(NOTIFICATION_BACKENDS=backends, NOTIFICATION_RATE_LIMITS={}):
+            dispatcher = NotificationDispatcher()
+            start = time.perf_counter()
+            sent = 0
+            while True:
+                batch_sent, batch_failed = dispatcher.dispatch()
+                if not batch_sent and not batch_failed:
+                    break
+                sent += batch_sent
+            elapsed = time.perf_counter() - start
+            dispatcher.close()
+        self.stdout.write(
+            f'{f"dispatch ({sent} sent, {dispatcher.workers} workers)":<40} {elapsed * 1000:>10.2f} ms'
+            f'  {sent / elapsed:>8.0f} /s'
+        )
+        pending = NotificationLog.objects.filter(status='pending').count()
+        flagged = Alert.objects.filter(sms_sent=True, email_sent=True).count()
+        self.stdout.write(f'{pending} pending, {flagged} alerts flagged sms_sent and email_sent')
+
+
+class SlowBackend:
+    """Stands in for a provider API with a fixed round-trip time"""
+    latency = 0
+
+    def send(self, notification):
+        time.sleep(self.latency)
@@ -0,0 +1,60 @@
+import json
+import random
+from datetime import timedelta
+from django.db import connection
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from VTPS.models import LocationLog, VulnerablePerson
+from VTPS.serializers import LocationLogSerializer
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark reading and serialising LocationLog rows, and the space they take'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--fixes', type=int, default=100_000)
+
+    def database_bytes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA page_count')
+            pages = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            return pages * cursor.fetchone()[0]
+
+    def run_benchmark(self, fixes, repeat, **options):
+        self.step(f'Seeding {fixes} fixes')
+        people = VulnerablePerson.objects.bulk_create(
+            VulnerablePerson(first_name=f'Person{i}', last_name='Bench', age=80, address='Bench street')
+            for i in range(100)
+        )
+        random.seed(0)
+        now = timezone.now()
+        empty_bytes = self.database_bytes()
+        for offset in range(0, fixes, 10000):
+            LocationLog.objects.bulk_create(
+                LocationLog(
+                    person=people[i % len(people)],
+                    latitude=f'{random.uniform(-90, 90):.8f}',
+                    longitude=f'{random.uniform(-180, 180):.8f}',
+                    accuracy=f'{random.uniform(1, 50):.2f}',
+                    altitude=f'{random.uniform(0, 500):.2f}',
+                    speed=f'{random.uniform(0, 8):.2f}',
+                    battery_level=random.randint(0, 100),
+                    timestamp=now - timedelta(seconds=i),
+                )
+                for i in range(offset, min(offset + 10000, fixes))
+            )
+        self.stdout.write(f'{"LocationLog size":<40} {(self.database_bytes() - empty_bytes) / fixes:>10.1f} bytes/row')
+
+        rows = LocationLog.objects.select_related('person')
+        self.step(f'Reading and serialising {fixes} fixes')
+        coordinates = LocationLog.objects.values_list('latitude', 'longitude', 'accuracy', 'altitude', 'speed')
+        self.measure('read coordinate columns only', lambda: list(coordinates.all()), repeat)
+        self.measure('load model instances', lambda: list(rows.all()), repeat)
+        instances = list(rows)
+        self.measure('LocationLogSerializer(many=True).data', lambda: LocationLogSerializer(instances, many=True).data, repeat)
+        self.measure('load + serialise + JSON', lambda: json.dumps(
+            LocationLogSerializer(rows.all(), many=True).data, cls=JSONEncoder
+        ), repeat)
@@ -0,0 +1,98 @@
+import random
+import time
+from django.utils import timezone
+from VTPS.models import LatestLocation, LocationLog, SafeZone, VulnerablePerson
+from VTPS.spatial import _distance_meters, positions, safe_zones
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark nearby-people, containing-safe-zone and map cluster queries against full scans'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--people', type=int, default=100000, help='People with a latest position and a safe zone')
+        parser.add_argument('--radius', type=float, default=2000, help='Search radius in metres')
+
+    def run_benchmark(self, people, radius, repeat, **options):
+        self.step(f'Creating {people} people across a 45 x 55 km area')
+        rng = random.Random(1)
+        now = timezone.now()
+        persons = VulnerablePerson.objects.bulk_create(
+            (VulnerablePerson(first_name='Bench', last_name=str(i), age=80, address='-', is_being_monitored=True)
+             for i in range(people)),
+            batch_size=5000,
+        )
+        points = [(51.3 + rng.random() * 0.4, -0.5 + rng.random() * 0.8) for _ in persons]
+        LatestLocation.objects.bulk_create(
+            (LatestLocation(person=person, latitude=lat, longitude=lng, timestamp=now)
+             for person, (lat, lng) in zip(persons, points)),
+            batch_size=5000,
+        )
+        SafeZone.objects.bulk_create(
+            (SafeZone(person=person, name='home', center_latitude=lat, center_longitude=lng, radius_meters=rng.randint(100, 1000))
+             for person, (lat, lng) in zip(persons, points)),
+            batch_size=5000,
+        )
+        client = self.api_client()
+        lat, lng = 51.5, -0.1
+
+        self.step(f'People within {radius:.0f} m')
+
+        def full_scan():
+            rows = LatestLocation.objects.values_list('person_id', 'latitude', 'longitude')
+            return sorted(
+                (distance, person_id) for person_id, person_lat, person_lng in rows
+                if (distance := _distance_meters(lat, lng, person_lat, person_lng)) <= radius
+            )
+        self.measure('full scan of LatestLocation', full_scan, repeat=3)
+        positions.clear()
+        start = time.perf_counter()
+        positions.sync()
+        self.stdout.write(f'{"index load (first query only)":<40} {(time.perf_counter() - start) * 1000:>10.2f} ms')
+        found = positions.nearby(lat, lng, radius)
+        self.stdout.write(f'{"people found":<40} {len(found):>10}')
+        self.measure('index query', lambda: positions.nearby(lat, lng, radius), repeat)
+        self.measure(
+            'GET /api/people/nearby/',
+            lambda: client.get(f'/api/people/nearby/?lat={lat}&lng={lng}&radius={radius}'), repeat
+        )
+
+        self.step('Safe zones containing a point')
+
+        def zone_scan():
+            return [
+                zone_id for zone_id, zone_lat, zone_lng, zone_radius
+                in SafeZone.objects.filter(is_active=True).values_list('id', 'center_latitude', 'center_longitude', 'radius_meters')
+                if _distance_meters(lat, lng, zone_lat, zone_lng) <= zone_radius
+            ]
+        self.measure('full scan of SafeZone', zone_scan, repeat=3)
+        safe_zones.clear()
+        start = time.perf_counter()
+        safe_zones.containing(lat, lng)
+        self.stdout.write(f'{"index load (first query only)":<40} {(time.perf_counter() - start) * 1000:>10.2f} ms')
+        self.stdout.write(f'{"zones found":<40} {len(safe_zones.containing(lat, lng)):>10}')
+        self.measure('index query', lambda: safe_zones.containing(lat, lng), repeat)
+        self.measure(
+            'GET /api/safe-zones/containing/',
+            lambda: client.get(f'/api/safe-zones/containing/?lat={lat}&lng={lng}'), repeat
+        )
+
+        self.step('Map clusters')
+        self.measure(
+            'GET /api/people/latest-locations/', lambda: client.get('/api/people/latest-locations/'), repeat=1
+        )
+        for zoom, bbox in [(9, '-0.6,51.2,0.4,51.8'), (13, '-0.15,51.48,-0.05,51.52'), (17, '-0.105,51.498,-0.095,51.502')]:
+            response = client.get(f'/api/map/clusters/?bbox={bbox}&zoom={zoom}')
+            label = f'GET /api/map/clusters/ zoom {zoom}'
+            self.measure(label, lambda: client.get(f'/api/map/clusters/?bbox={bbox}&zoom={zoom}'), repeat)
+            self.stdout.write(f'{"":<40} {len(response.data["clusters"]):>10} clusters of {response.data["count"]} people')
+        moves = [
+            LocationLog(person=person, latitude=lat + 0.001, longitude=lng, timestamp=now)
+            for person, (lat, lng) in zip(persons[:1000], points)
+        ]
+        start = time.perf_counter()
+        positions.observe(moves)
+        self.stdout.write(f'{"index update, 1000 ingested fixes":<40} {(time.perf_counter() - start) * 1000:>10.2f} ms')
+        positions.clear()
+        safe_zones.clear()
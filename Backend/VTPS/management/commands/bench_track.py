@@ -0,0 +1,61 @@
+import json
+import math
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from VTPS.models import LocationLog, VulnerablePerson
+from VTPS.serializers import LocationLogSerializer
+from ._benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Benchmark /api/people/{id}/track/ against serialising the raw fixes of the same period'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--interval', type=int, default=5, help='Seconds between fixes')
+
+    def run_benchmark(self, days, interval, repeat, **options):
+        count = days * 86400 // interval
+        self.step(f'Seeding {count} fixes ({days} days every {interval}s)')
+        person = VulnerablePerson.objects.create(first_name='Track', last_name='Bench', age=80, address='Bench street')
+        end = timezone.now().replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(days=days)
+        fixes = []
+        for i in range(count):
+            # A walk around a few loops with GPS jitter
+            angle = i / 720
+            jitter = math.sin(i * 12.9898) * 0.00002
+            fixes.append(LocationLog(
+                person=person,
+                latitude=round(51.5 + 0.01 * math.sin(angle) + jitter, 8),
+                longitude=round(-0.12 + 0.015 * math.cos(angle * 1.3) - jitter, 8),
+                timestamp=start + timedelta(seconds=i * interval),
+            ))
+            if len(fixes) == 10000:
+                LocationLog.objects.bulk_create(fixes)
+                fixes = []
+        LocationLog.objects.bulk_create(fixes)
+        client = self.api_client()
+        url = f'/api/people/{person.pk}/track/?from={start.isoformat()}&to={end.isoformat()}'.replace('+', '%2B')
+
+        self.step('Raw fixes')
+        raw = {}
+
+        def serialise_raw():
+            rows = LocationLog.objects.filter(person=person, timestamp__gte=start, timestamp__lt=end).select_related('person')
+            raw['body'] = json.dumps(LocationLogSerializer(rows, many=True).data, cls=JSONEncoder)
+
+        self.measure('LocationLogSerializer, all fixes', serialise_raw, 1)
+        self.stdout.write(f'{"payload":<40} {len(raw["body"]) / 1024:>10.0f} KiB')
+
+        self.step('Simplified track')
+        self.measure('GET track/ cold cache', lambda: (cache.clear(), client.get(url)), 1)
+        response = client.get(url)
+        self.measure('GET track/ warm cache', lambda: client.get(url), repeat)
+        self.stdout.write(
+            f'{"payload":<40} {len(response.content) / 1024:>10.0f} KiB'
+            f'  ({response.data["count"]} of {response.data["source_count"]} points)'
+        )
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from VTPS.archive import archive_range
+from VTPS.retention import expired_days, purge_range, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Delete location history older than the data retention period, one day at a time; run daily from cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention period in days (default: SystemSettings.data_retention_days)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between batches')
+        parser.add_argument('--archive', action='store_true', help='Archive each day to LOCATION_ARCHIVE_ROOT before deleting it')
+
+    def handle(self, days, batch_size, pause, archive, **options):
+        cutoff = retention_cutoff(days=days)
+        self.stdout.write(f'Purging location history before {timezone.localtime(cutoff):%Y-%m-%d}')
+        total = 0
+        started = time.perf_counter()
+        for start, end in expired_days(cutoff):
+            day_started = time.perf_counter()
+            if archive:
+                archive_range(start, end)
+            deleted = purge_range(start, end, batch_size, pause)
+            elapsed = time.perf_counter() - day_started
+            total += deleted
+            if deleted:
+                self.stdout.write(f'{timezone.localtime(start):%Y-%m-%d}  {deleted:>10} rows  {deleted / elapsed:>10.0f} rows/s')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from VTPS.scheduler import CheckInScheduler
+
+
+class Command(BaseCommand):
+    help = 'Send check-in reminders and record missed check-ins as their schedules fall due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=15, help='Seconds between checks for changed schedules')
+        parser.add_argument('--once', action='store_true', help='Process due events once and exit')
+
+    def handle(self, interval, once, **options):
+        scheduler = CheckInScheduler()
+        scheduler.load()
+        self.stdout.write(f'Loaded {len(scheduler)} upcoming check-in events')
+        while True:
+            scheduler.sync()
+            processed = scheduler.run_due()
+            if processed:
+                self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} processed {processed} events')
+            if once:
+                break
+            next_due = scheduler.next_due
+            wait = interval if next_due is None else (next_due - timezone.now()).total_seconds()
+            time.sleep(min(max(wait, 0), interval))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from VTPS.notifications import NotificationDispatcher, queue_alert_notifications
+
+
+class Command(BaseCommand):
+    help = 'Notify emergency contacts of new alerts and send pending notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2, help='Seconds to wait when there is nothing to send')
+        parser.add_argument('--batch-size', type=int, help='Notifications sent per round')
+        parser.add_argument('--workers', type=int, help='Concurrent sends')
+        parser.add_argument('--once', action='store_true', help='Send what is due once and exit')
+
+    def handle(self, interval, batch_size, workers, once, **options):
+        dispatcher = NotificationDispatcher(batch_size, workers)
+        try:
+            while True:
+                queued = queue_alert_notifications()
+                if queued:
+                    self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} queued {queued} contact notifications')
+                sent, failed = dispatcher.dispatch()
+                if sent or failed:
+                    self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} sent {sent}, failed {failed}')
+                elif once:
+                    break
+                else:
+                    time.sleep(interval)
+        finally:
+            dispatcher.close()
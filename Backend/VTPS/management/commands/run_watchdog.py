@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from VTPS.watchdog import DeviceWatchdog
+
+
+class Command(BaseCommand):
+    help = 'Raise and resolve device_offline and battery_low alerts from the latest location fixes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=15, help='Seconds between checks for new fixes')
+        parser.add_argument('--once', action='store_true', help='Check once and exit')
+
+    def handle(self, interval, once, **options):
+        watchdog = DeviceWatchdog()
+        watchdog.load()
+        self.stdout.write(f'Watching {len(watchdog)} devices')
+        while True:
+            watchdog.sync()
+            expired = watchdog.run_due()
+            if expired:
+                self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} {expired} devices went offline')
+            if once:
+                break
+            next_due = watchdog.next_due
+            wait = interval if next_due is None else (next_due - timezone.now()).total_seconds()
+            time.sleep(min(max(wait, 0), interval))
@@ -0,0 +1,34 @@
+"""
+Operational counters kept in the shared cache (see ``CACHES``), so every
+worker process adds to the same totals. Increments are atomic on Redis and
+Memcached; the database cache can lose one to a concurrent increment of the
+same counter. Read them through /api/metrics/.
+"""
+from django.core.cache import cache
+
+# Counters reported by /api/metrics/, with what each one counts
+COUNTERS = {
+    'alerts_suppressed': 'Repeat alerts folded into an open alert instead of being created',
+    'fixes_rejected_inaccurate': 'GPS fixes dropped for accuracy worse than gps_accuracy_threshold_meters',
+    'fixes_rejected_implausible_speed': 'GPS fixes dropped for implying more than LOCATION_MAX_SPEED_KMH since the previous fix',
+}
+
+
+def _cache_key(name):
+    return f'vtps:metric:{name}'
+
+
+def increment(name, amount=1):
+    key = _cache_key(name)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Not set yet; add() loses to a concurrent first increment, so retry incr
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+def get_metrics():
+    """Current value of every counter in ``COUNTERS``"""
+    values = cache.get_many([_cache_key(name) for name in COUNTERS])
+    return {name: values.get(_cache_key(name), 0) for name in COUNTERS}
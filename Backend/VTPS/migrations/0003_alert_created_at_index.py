@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0002_locationlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at'], name='VTPS_alert_created_95f316_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0003_alert_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['person', 'status'], name='VTPS_alert_person__ffe601_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vulnerableperson',
+            index=models.Index(fields=['-created_at'], name='VTPS_vulner_created_a8fa07_idx'),
+        ),
+    ]
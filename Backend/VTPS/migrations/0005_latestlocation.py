@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_latest_locations(apps, schema_editor):
+    VulnerablePerson = apps.get_model('VTPS', 'VulnerablePerson')
+    LocationLog = apps.get_model('VTPS', 'LocationLog')
+    LatestLocation = apps.get_model('VTPS', 'LatestLocation')
+    rows = []
+    for person_id in VulnerablePerson.objects.values_list('id', flat=True).iterator():
+        log = LocationLog.objects.filter(person_id=person_id).order_by('-timestamp').first()
+        if log is not None:
+            rows.append(LatestLocation(
+                person_id=person_id, latitude=log.latitude, longitude=log.longitude, accuracy=log.accuracy,
+                battery_level=log.battery_level, is_safe_zone=log.is_safe_zone, timestamp=log.timestamp,
+            ))
+    LatestLocation.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0004_list_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestLocation',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_location', serialize=False, to='VTPS.vulnerableperson')),
+                ('latitude', models.DecimalField(decimal_places=8, max_digits=10)),
+                ('longitude', models.DecimalField(decimal_places=8, max_digits=11)),
+                ('accuracy', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('battery_level', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_safe_zone', models.BooleanField(default=True)),
+                ('timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_latest_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0005_latestlocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkinlog',
+            index=models.Index(fields=['-scheduled_time'], name='VTPS_checki_schedul_e00a03_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkinlog',
+            index=models.Index(fields=['person', '-scheduled_time'], name='VTPS_checki_person__317962_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['-created_at'], name='VTPS_notifi_created_2a6db7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['person', '-created_at'], name='VTPS_notifi_person__5b748a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['status', '-created_at'], name='VTPS_notifi_status_048578_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0008_notificationlog_delivery_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='occurrence_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
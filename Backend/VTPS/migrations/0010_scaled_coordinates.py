@@ -0,0 +1,82 @@
+# Converts coordinate and measurement DecimalFields to ScaledDecimalField.
+# Each column is copied into a new integer column with one UPDATE per table;
+# the migration reverses the same way.
+
+from django.db import migrations, models
+from django.db.models import F, IntegerField, Value
+from django.db.models.functions import Cast, Round
+import VTPS.fields
+
+# model: [(field, max_digits, decimal_places, stored_places, null)]
+SCALED_FIELDS = {
+    'locationlog': [
+        ('latitude', 10, 8, 7, False),
+        ('longitude', 11, 8, 7, False),
+        ('accuracy', 6, 2, 2, True),
+        ('altitude', 8, 2, 2, True),
+        ('speed', 6, 2, 2, True),
+    ],
+    'latestlocation': [
+        ('latitude', 10, 8, 7, False),
+        ('longitude', 11, 8, 7, False),
+        ('accuracy', 6, 2, 2, True),
+    ],
+    'safezone': [
+        ('center_latitude', 10, 8, 7, False),
+        ('center_longitude', 11, 8, 7, False),
+    ],
+}
+
+
+def scaled_field(max_digits, decimal_places, stored_places, null):
+    options = {'null': True, 'blank': True} if null else {}
+    if stored_places != decimal_places:
+        options['stored_places'] = stored_places
+    return VTPS.fields.ScaledDecimalField(max_digits=max_digits, decimal_places=decimal_places, **options)
+
+
+def scale_values(apps, schema_editor):
+    for model_name, fields in SCALED_FIELDS.items():
+        apps.get_model('VTPS', model_name).objects.update(**{
+            name: Cast(Round(F(f'{name}_decimal') * 10 ** stored_places), IntegerField())
+            for name, _, _, stored_places, _ in fields
+        })
+
+
+def unscale_values(apps, schema_editor):
+    for model_name, fields in SCALED_FIELDS.items():
+        apps.get_model('VTPS', model_name).objects.update(**{
+            f'{name}_decimal': F(name) / Value(float(10 ** stored_places))
+            for name, _, _, stored_places, _ in fields
+        })
+
+
+def convert_operations():
+    operations = []
+    for model_name, fields in SCALED_FIELDS.items():
+        for name, max_digits, decimal_places, stored_places, null in fields:
+            operations += [
+                migrations.RenameField(model_name, name, f'{name}_decimal'),
+                migrations.AlterField(model_name, f'{name}_decimal', models.DecimalField(
+                    max_digits=max_digits, decimal_places=decimal_places, null=True, blank=True
+                )),
+                migrations.AddField(model_name, name, scaled_field(max_digits, decimal_places, stored_places, True)),
+            ]
+    operations.append(migrations.RunPython(scale_values, unscale_values))
+    for model_name, fields in SCALED_FIELDS.items():
+        for name, max_digits, decimal_places, stored_places, null in fields:
+            operations.append(migrations.RemoveField(model_name, f'{name}_decimal'))
+            if not null:
+                operations.append(migrations.AlterField(
+                    model_name, name, scaled_field(max_digits, decimal_places, stored_places, null)
+                ))
+    return operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0009_alert_occurrence_count'),
+    ]
+
+    operations = convert_operations()
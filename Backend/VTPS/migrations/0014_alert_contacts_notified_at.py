@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:35
+
+from django.db import migrations, models
+
+
+def mark_notified_alerts(apps, schema_editor):
+    # Alerts the worker already fanned out must not be queued again
+    Alert = apps.get_model('VTPS', 'Alert')
+    NotificationLog = apps.get_model('VTPS', 'NotificationLog')
+    Alert.objects.filter(
+        models.Exists(NotificationLog.objects.filter(alert=models.OuterRef('pk')))
+    ).update(contacts_notified_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0013_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='contacts_notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_notified_alerts, migrations.RunPython.noop),
+    ]
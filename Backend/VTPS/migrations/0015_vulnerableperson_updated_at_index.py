@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VTPS', '0014_alert_contacts_notified_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vulnerableperson',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
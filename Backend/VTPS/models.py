@@ -1,7 +1,12 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.core.validators import RegexValidator
+from .fields import ScaledDecimalField
+import hashlib
+import secrets
 import uuid
 
 # Custom User Model
@@ -17,7 +22,7 @@ class User(AbstractUser):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='operator')
     phone = models.CharField(max_length=15, blank=True, null=True)
     is_active_session = models.BooleanField(default=False)
-    last_activity = models.DateTimeField(auto_now=True)
+    last_activity = models.DateTimeField(default=timezone.now)  # Written in bulk by activity.ActivityTracker
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -26,6 +31,19 @@ class User(AbstractUser):
 
 
 # Vulnerable Person Model
+class VulnerablePersonQuerySet(models.QuerySet):
+    def with_list_stats(self):
+        """Annotate the counts and join the last fix shown by VulnerablePersonListSerializer"""
+        def count_of(model, **filters):
+            rows = model.objects.filter(person=OuterRef('pk'), **filters).order_by()
+            return Coalesce(Subquery(rows.values('person').annotate(n=Count('pk')).values('n')), 0)
+
+        return self.select_related('latest_location').annotate(
+            emergency_contacts_count=count_of(EmergencyContact),
+            active_alerts_count=count_of(Alert, status='active'),
+        )
+
+
 class VulnerablePerson(models.Model):
     RISK_LEVELS = [
         ('low', 'Low Risk'),
@@ -70,10 +88,15 @@ class VulnerablePerson(models.Model):
     assigned_supervisor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='supervised_persons')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_persons')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = VulnerablePersonQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} (Age: {self.age})"
@@ -117,15 +140,15 @@ class EmergencyContact(models.Model):
 class LocationLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     person = models.ForeignKey(VulnerablePerson, on_delete=models.CASCADE, related_name='location_logs')
-    latitude = models.DecimalField(max_digits=10, decimal_places=8)
-    longitude = models.DecimalField(max_digits=11, decimal_places=8)
-    accuracy = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # GPS accuracy in meters
-    altitude = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
-    speed = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # Speed in km/h
+    latitude = ScaledDecimalField(max_digits=10, decimal_places=8, stored_places=7)  # Stored in 1e-7 degrees
+    longitude = ScaledDecimalField(max_digits=11, decimal_places=8, stored_places=7)
+    accuracy = ScaledDecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # GPS accuracy in meters
+    altitude = ScaledDecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    speed = ScaledDecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # Speed in km/h
     battery_level = models.PositiveIntegerField(null=True, blank=True)  # Battery percentage
     location_description = models.TextField(blank=True, null=True)
     is_safe_zone = models.BooleanField(default=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # Devices may upload buffered fixes with their own time
     
     class Meta:
         ordering = ['-timestamp']
@@ -138,6 +161,22 @@ class LocationLog(models.Model):
         return f"{self.person.full_name} at {self.latitude}, {self.longitude} - {self.timestamp}"
 
 
+# Latest Location Model
+class LatestLocation(models.Model):
+    """Most recent fix for each person, kept current by location ingest"""
+    person = models.OneToOneField(VulnerablePerson, on_delete=models.CASCADE, primary_key=True, related_name='latest_location')
+    latitude = ScaledDecimalField(max_digits=10, decimal_places=8, stored_places=7)
+    longitude = ScaledDecimalField(max_digits=11, decimal_places=8, stored_places=7)
+    accuracy = ScaledDecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    battery_level = models.PositiveIntegerField(null=True, blank=True)
+    is_safe_zone = models.BooleanField(default=True)
+    timestamp = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.person.full_name} last seen at {self.latitude}, {self.longitude} - {self.timestamp}"
+
+
 # Alert System Model
 class Alert(models.Model):
     ALERT_TYPES = [
@@ -186,17 +225,23 @@ class Alert(models.Model):
     resolved_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Repeats folded into this alert while it was open
+    occurrence_count = models.PositiveIntegerField(default=1)
+    
     # Notification tracking
     sms_sent = models.BooleanField(default=False)
     email_sent = models.BooleanField(default=False)
     push_notification_sent = models.BooleanField(default=False)
+    contacts_notified_at = models.DateTimeField(null=True, blank=True)  # Set when the worker queued the contact notifications
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
+            models.Index(fields=['-created_at']),
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['priority', '-created_at']),
             models.Index(fields=['person', '-created_at']),
+            models.Index(fields=['person', 'status']),
         ]
     
     def __str__(self):
@@ -211,8 +256,8 @@ class SafeZone(models.Model):
     description = models.TextField(blank=True, null=True)
     
     # Geographic boundaries (simple circular zone)
-    center_latitude = models.DecimalField(max_digits=10, decimal_places=8)
-    center_longitude = models.DecimalField(max_digits=11, decimal_places=8)
+    center_latitude = ScaledDecimalField(max_digits=10, decimal_places=8, stored_places=7)
+    center_longitude = ScaledDecimalField(max_digits=11, decimal_places=8, stored_places=7)
     radius_meters = models.PositiveIntegerField(default=100)  # Radius in meters
     
     # Time-based restrictions
@@ -248,6 +293,7 @@ class CheckInSchedule(models.Model):
     reminder_minutes_before = models.PositiveIntegerField(default=30)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Lets the scheduler re-read only changed rows
     
     def __str__(self):
         return f"{self.name} - {self.person.full_name}"
@@ -273,6 +319,10 @@ class CheckInLog(models.Model):
     
     class Meta:
         ordering = ['-scheduled_time']
+        indexes = [
+            models.Index(fields=['-scheduled_time']),
+            models.Index(fields=['person', '-scheduled_time']),
+        ]
     
     def __str__(self):
         return f"Check-in for {self.person.full_name} - {self.scheduled_time}"
@@ -342,8 +392,55 @@ class NotificationLog(models.Model):
     delivered_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Delivery tracking
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['person', '-created_at']),
+            models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.notification_type} to {self.recipient} - {self.status}"
+
+# Device Credential Model
+class DeviceCredential(models.Model):
+    """API key of one GPS tracker; only a digest of the key is stored"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    person = models.ForeignKey(VulnerablePerson, on_delete=models.CASCADE, related_name='device_credentials')
+    name = models.CharField(max_length=100)
+    key_prefix = models.CharField(max_length=8)  # Identifies the key in listings
+    key_hash = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='issued_device_credentials')
+    created_at = models.DateTimeField(auto_now_add=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.notification_type} to {self.recipient} - {self.status}"
\ No newline at end of file
+        return f"{self.name} ({self.key_prefix}...) for {self.person.full_name}"
+    
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    @classmethod
+    def issue(cls, person, name, created_by=None):
+        """Create a credential; returns it with the raw key, which is not stored"""
+        key = secrets.token_urlsafe(32)
+        credential = cls.objects.create(
+            person=person, name=name, key_prefix=key[:8], key_hash=cls.hash_key(key), created_by=created_by
+        )
+        return credential, key
+    
+    def revoke(self):
+        self.is_active = False
+        self.revoked_at = timezone.now()
+        self.save(update_fields=['is_active', 'revoked_at'])
@@ -0,0 +1,250 @@
+"""
+Notification delivery.
+
+Notifications are NotificationLog rows: anything that wants to notify someone
+inserts a pending row and returns. The worker (``run_notification_worker``)
+fans new high-priority alerts out to the person's EmergencyContacts, claims
+due rows in batches, sends them concurrently through the backend configured
+for each channel in ``NOTIFICATION_BACKENDS``, and writes the outcomes back in
+bulk. Failed sends are retried with exponential backoff until
+``NOTIFICATION_MAX_ATTEMPTS`` is reached.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Alert, EmergencyContact, NotificationLog
+from .system_settings import get_system_settings
+
+logger = logging.getLogger(__name__)
+
+# Alert flag set once a notification of each channel went out for the alert
+ALERT_FLAGS = {
+    'sms': 'sms_sent',
+    'email': 'email_sent',
+    'push': 'push_notification_sent',
+}
+
+
+class DeliveryError(Exception):
+    """Raised by a backend when a notification could not be sent"""
+
+
+# Channel backends
+class LoggingBackend:
+    """Writes notifications to the log; the default until a provider is configured"""
+    def send(self, notification):
+        logger.info('%s to %s: %s', notification.notification_type, notification.recipient, notification.message)
+
+
+class MemoryBackend:
+    """
+    Records sent notifications in ``outbox`` instead of sending them; for
+    tests. Setting ``error`` makes every send fail with that message.
+    """
+    outbox = []
+    error = None
+
+    def send(self, notification):
+        if self.error:
+            raise DeliveryError(self.error)
+        self.outbox.append(notification)
+
+
+class EmailBackend:
+    """Sends through Django's configured ``EMAIL_BACKEND``"""
+    def send(self, notification):
+        subject = notification.alert.title if notification.alert_id else 'VTPS notification'
+        send_mail(subject, notification.message, None, [notification.recipient])
+
+
+class InAppBackend:
+    """Pushes to the person's /ws/stream/ subscribers"""
+    def send(self, notification):
+        from .realtime import publish
+        publish({'type': 'notification', 'data': {
+            'id': notification.id,
+            'alert': notification.alert_id,
+            'message': notification.message,
+        }}, notification.person_id)
+
+
+_backends = {}
+
+
+def get_backend(channel):
+    path = settings.NOTIFICATION_BACKENDS[channel]
+    cached = _backends.get(channel)
+    if cached is None or cached[0] != path:
+        cached = _backends[channel] = (path, import_string(path)())
+    return cached[1]
+
+
+# Rate limiting
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average, in bursts of up to ``rate``"""
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Fan-out
+def queue_alert_notifications(now=None):
+    """
+    Queue notifications to the EmergencyContacts of recent high-priority alerts.
+
+    Picks up alerts created within ``NOTIFICATION_FANOUT_WINDOW_MINUTES`` that
+    have contacts and were not handled yet, so it is safe to call repeatedly
+    and alert creation itself never waits on contact lookups. Each alert is
+    claimed by setting ``contacts_notified_at`` in the transaction that
+    inserts its notifications, so concurrent workers never queue it twice and
+    an alert none of whose contacts can be reached is not picked up again.
+    Returns the number of notifications queued.
+    """
+    now = now or timezone.now()
+    settings_row = get_system_settings()
+    channels = []
+    if settings_row.enable_sms_alerts:
+        channels.append('sms')
+    if settings_row.enable_email_alerts:
+        channels.append('email')
+    if not channels:
+        return 0
+
+    with transaction.atomic():
+        due = (
+            Alert.objects.filter(
+                created_at__gte=now - timedelta(minutes=settings.NOTIFICATION_FANOUT_WINDOW_MINUTES),
+                priority__in=settings.NOTIFICATION_CONTACT_PRIORITIES,
+                status='active',
+                contacts_notified_at__isnull=True,
+            )
+            .filter(Exists(EmergencyContact.objects.filter(person=OuterRef('person'))))
+            .order_by()
+            .select_for_update(skip_locked=True)
+        )
+        alert_ids = list(due.values_list('id', flat=True))
+        if not alert_ids:
+            return 0
+        Alert.objects.filter(id__in=alert_ids).update(contacts_notified_at=now)
+        alerts = list(Alert.objects.filter(id__in=alert_ids).select_related('person').order_by())
+        contacts = {}
+        for contact in EmergencyContact.objects.filter(person_id__in={alert.person_id for alert in alerts}).order_by():
+            contacts.setdefault(contact.person_id, []).append(contact)
+
+        notifications = []
+        for alert in alerts:
+            message = f'{alert.title}: {alert.person.full_name}. {alert.description}'
+            for contact in contacts.get(alert.person_id, ()):
+                recipients = {'sms': contact.phone, 'email': contact.email}
+                for channel in channels:
+                    if recipients[channel]:
+                        notifications.append(NotificationLog(
+                            alert=alert, person_id=alert.person_id, recipient=recipients[channel],
+                            notification_type=channel, message=message, next_attempt_at=now,
+                        ))
+        NotificationLog.objects.bulk_create(notifications, batch_size=1000)
+    return len(notifications)
+
+
+# Dispatch
+class NotificationDispatcher:
+    def __init__(self, batch_size=None, workers=None):
+        self.batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+        self.workers = workers or settings.NOTIFICATION_WORKERS
+        self._limits = {
+            channel: TokenBucket(rate) for channel, rate in settings.NOTIFICATION_RATE_LIMITS.items()
+        }
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='notify')
+
+    def close(self):
+        self._executor.shutdown()
+
+    def claim(self, now):
+        """
+        Lease a batch of due pending notifications to this worker.
+
+        Leased rows are pushed ``NOTIFICATION_LEASE_SECONDS`` into the future,
+        so other workers skip them and a crashed worker's rows are retried.
+        """
+        lease = now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        with transaction.atomic():
+            due = (
+                NotificationLog.objects.filter(status='pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')
+                .select_for_update(skip_locked=True)
+            )
+            ids = list(due.values_list('id', flat=True)[:self.batch_size])
+            NotificationLog.objects.filter(id__in=ids).update(next_attempt_at=lease)
+        return list(NotificationLog.objects.filter(id__in=ids).select_related('alert').order_by())
+
+    def _send(self, notification):
+        limit = self._limits.get(notification.notification_type)
+        if limit is not None:
+            limit.acquire()
+        try:
+            get_backend(notification.notification_type).send(notification)
+        except Exception as exc:
+            return str(exc) or exc.__class__.__name__
+        return None
+
+    def dispatch(self, now=None):
+        """Send one batch; returns ``(sent, failed)`` counts"""
+        now = now or timezone.now()
+        notifications = self.claim(now)
+        if not notifications:
+            return 0, 0
+        errors = list(self._executor.map(self._send, notifications))
+
+        finished = timezone.now()
+        sent_ids = []
+        flags = {}
+        failed = []
+        for notification, error in zip(notifications, errors):
+            if error is None:
+                sent_ids.append(notification.id)
+                if notification.alert_id and notification.notification_type in ALERT_FLAGS:
+                    flags.setdefault(ALERT_FLAGS[notification.notification_type], set()).add(notification.alert_id)
+                continue
+            notification.attempts += 1
+            notification.error_message = error
+            if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                notification.status = 'failed'
+            else:
+                backoff = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (notification.attempts - 1)
+                notification.next_attempt_at = finished + timedelta(seconds=backoff)
+            failed.append(notification)
+
+        # Successes share one UPDATE; only failures carry per-row details
+        with transaction.atomic():
+            NotificationLog.objects.filter(id__in=sent_ids).update(
+                status='sent', sent_at=finished, error_message=None, attempts=F('attempts') + 1
+            )
+            NotificationLog.objects.bulk_update(
+                failed, ['status', 'error_message', 'attempts', 'next_attempt_at'], batch_size=500
+            )
+            for flag, alert_ids in flags.items():
+                Alert.objects.filter(id__in=alert_ids).update(**{flag: True})
+        return len(sent_ids), len(failed)
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination for append-only tables.
+
+    Pages are fetched with ``WHERE <ordering> < cursor LIMIT n`` on an indexed
+    column, so deep pages cost the same as the first and no COUNT(*) is run.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    ordering = '-timestamp'
+
+
+class CreatedAtKeysetPagination(KeysetPagination):
+    ordering = '-created_at'
+
+
+class ScheduledTimeKeysetPagination(KeysetPagination):
+    ordering = '-scheduled_time'
@@ -22,4 +22,11 @@ class IsSupervisorOrAdmin(BasePermission):
     """
     def has_permission(self, request, view):
         user = request.user
-        return user.is_superuser or getattr(user, 'role', None) in ['admin', 'supervisor'] 
\ No newline at end of file
+        return user.is_superuser or getattr(user, 'role', None) in ['admin', 'supervisor']
+
+class IsDevice(BasePermission):
+    """
+    Allows access only to requests authenticated with a device key.
+    """
+    def has_permission(self, request, view):
+        return getattr(request.user, 'credential_id', None) is not None
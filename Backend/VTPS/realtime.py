@@ -0,0 +1,254 @@
+"""
+Real-time push of location fixes and alert changes over WebSockets.
+
+Publishers (location ingest, alert signals) hand messages to the configured
+``REALTIME_BACKEND``, which delivers them to the in-process ``broker``. The
+broker fans each message out to the WebSocket connections of this process
+that subscribed to its topic. Topics are ``person:<id>`` and
+``supervisor:<id>``.
+
+The default ``LocalBackend`` delivers straight to this process's broker; a
+multi-process deployment swaps in a backend that relays through a shared
+message bus, and tests use ``MemoryBackend`` to capture what was published.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+from .models import VulnerablePerson
+from .versions import VersionWatcher
+
+WEBSOCKET_PATH = '/ws/stream/'
+
+
+def person_topic(person_id):
+    return f'person:{person_id}'
+
+
+def supervisor_topic(user_id):
+    return f'supervisor:{user_id}'
+
+
+class Subscriber:
+    """Outgoing message queue of one WebSocket connection"""
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.topics = set()
+        self.dropped = 0
+
+    def push(self, message):
+        """Queue a message from any thread"""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client loses messages rather than holding up publishers
+            self.dropped += 1
+
+
+class Broker:
+    """Fans messages out to the subscribers of each topic in this process"""
+    def __init__(self):
+        self._topics = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber, topic):
+        with self._lock:
+            self._topics[topic].add(subscriber)
+            subscriber.topics.add(topic)
+
+    def unsubscribe(self, subscriber, topic=None):
+        """Remove one subscription, or all of them when ``topic`` is None"""
+        with self._lock:
+            for name in [topic] if topic else list(subscriber.topics):
+                subscriber.topics.discard(name)
+                subscribers = self._topics.get(name)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._topics[name]
+
+    def deliver(self, topics, message):
+        """Push a message once to every subscriber of any of ``topics``"""
+        with self._lock:
+            subscribers = set().union(*(self._topics.get(topic, ()) for topic in topics))
+        for subscriber in subscribers:
+            subscriber.push(message)
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    """Delivers to this process's broker; for single-process deployments"""
+    def publish(self, topics, message):
+        broker.deliver(topics, message)
+
+
+class MemoryBackend:
+    """Records published messages in ``outbox`` instead of delivering them; for tests"""
+    outbox = []
+
+    def publish(self, topics, message):
+        self.outbox.append((topics, message))
+
+
+_backend = (None, None)
+
+
+def get_backend():
+    global _backend
+    path, backend = _backend
+    if path != settings.REALTIME_BACKEND:
+        backend = import_string(settings.REALTIME_BACKEND)()
+        _backend = (settings.REALTIME_BACKEND, backend)
+    return backend
+
+
+def publish(message, person_id, supervisor_id=None):
+    """Publish a message to a person's topic and, if assigned, their supervisor's"""
+    topics = [person_topic(person_id)]
+    if supervisor_id:
+        topics.append(supervisor_topic(supervisor_id))
+    get_backend().publish(topics, message)
+
+
+class SupervisorIndex:
+    """Assigned supervisor per person, so alert pushes need not load the person"""
+    def __init__(self):
+        self._supervisors = {}
+        self._lock = threading.Lock()
+        self._watcher = VersionWatcher('people')
+
+    def get(self, person_id):
+        with self._lock:
+            if self._watcher.changed():
+                self._supervisors.clear()
+            if person_id in self._supervisors:
+                return self._supervisors[person_id]
+        supervisor_id = VulnerablePerson.objects.filter(pk=person_id).values_list(
+            'assigned_supervisor_id', flat=True
+        ).first()
+        with self._lock:
+            self._supervisors[person_id] = supervisor_id
+        return supervisor_id
+
+    def clear(self):
+        with self._lock:
+            self._supervisors.clear()
+
+
+supervisors = SupervisorIndex()
+
+
+def publish_alert(alert):
+    """Publish a saved alert to its person's topic and their supervisor's"""
+    from .serializers import RealTimeAlertSerializer
+    if alert.__class__.person.is_cached(alert):
+        supervisor_id = alert.person.assigned_supervisor_id
+    else:
+        supervisor_id = supervisors.get(alert.person_id)
+    publish({'type': 'alert', 'data': RealTimeAlertSerializer(alert).data}, alert.person_id, supervisor_id)
+
+
+def publish_locations(logs, owners):
+    """
+    Publish stored fixes; ``owners`` maps person IDs to their ``DeviceOwner``.
+    """
+    from .serializers import RealTimeLocationSerializer
+    for log in logs:
+        owner = owners[log.person_id]
+        data = RealTimeLocationSerializer({
+            'person_id': log.person_id,
+            'latitude': log.latitude,
+            'longitude': log.longitude,
+            'accuracy': log.accuracy,
+            'battery_level': log.battery_level,
+            'timestamp': log.timestamp,
+            'status': owner.status,
+        }).data
+        publish({'type': 'location', 'data': data}, log.person_id, owner.supervisor_id)
+
+
+# WebSocket endpoint
+def authenticate_token(key):
+    from .authentication import get_token
+    token = get_token(key)
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def subscription_topic(request):
+    """Topic named by a client subscribe/unsubscribe request, or None"""
+    if request.get('person'):
+        return person_topic(request['person'])
+    if request.get('supervisor'):
+        return supervisor_topic(request['supervisor'])
+    return None
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI app for ``/ws/stream/?token=<auth token>``.
+
+    Clients send ``{"action": "subscribe", "person": "<id>"}`` (or
+    ``"supervisor"``, and ``"unsubscribe"``) and receive JSON messages of the
+    form ``{"type": ..., "data": ...}``. Supervisors are subscribed to their
+    own topic on connect.
+    """
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    key = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    user = await sync_to_async(authenticate_token)(key) if key else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    await send({'type': 'websocket.accept'})
+
+    subscriber = Subscriber(asyncio.get_running_loop(), settings.REALTIME_QUEUE_SIZE)
+    if user.role == 'supervisor':
+        broker.subscribe(subscriber, supervisor_topic(user.pk))
+    receiving = asyncio.ensure_future(receive())
+    sending = asyncio.ensure_future(subscriber.queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiving, sending}, return_when=asyncio.FIRST_COMPLETED)
+            if sending in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(sending.result(), cls=JSONEncoder)})
+                sending = asyncio.ensure_future(subscriber.queue.get())
+            if receiving in done:
+                event = receiving.result()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                try:
+                    request = json.loads(event.get('text') or '')
+                except ValueError:
+                    request = None
+                topic = subscription_topic(request) if isinstance(request, dict) else None
+                if topic is None:
+                    reply = {'type': 'error', 'data': 'Invalid request.'}
+                elif request.get('action') == 'unsubscribe':
+                    broker.unsubscribe(subscriber, topic)
+                    reply = {'type': 'unsubscribed', 'data': topic}
+                else:
+                    broker.subscribe(subscriber, topic)
+                    reply = {'type': 'subscribed', 'data': topic}
+                await send({'type': 'websocket.send', 'text': json.dumps(reply)})
+                receiving = asyncio.ensure_future(receive())
+    finally:
+        broker.unsubscribe(subscriber)
+        receiving.cancel()
+        sending.cancel()
@@ -0,0 +1,53 @@
+"""
+Enforcement of ``SystemSettings.data_retention_days`` for location history.
+
+Expired LocationLog rows are removed one day at a time, in batches of primary
+keys picked through the ``timestamp`` index. Every batch is its own short
+transaction, so ingest keeps writing while a purge runs, and the work per
+statement stays the same however much history has built up. Cached track
+buckets holding deleted fixes are dropped with them.
+"""
+import time
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import LocationLog
+from .system_settings import get_system_settings
+from .tracks import forget_fixes
+
+
+def retention_cutoff(now=None, days=None):
+    """Start of the oldest local day still retained"""
+    if days is None:
+        days = get_system_settings().data_retention_days
+    local_day = timezone.localtime(now or timezone.now()).date() - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(local_day, datetime.min.time()))
+
+
+def expired_days(cutoff):
+    """``(start, end)`` of every local day before ``cutoff`` that has location history"""
+    oldest = LocationLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None or oldest >= cutoff:
+        return
+    day = timezone.localtime(oldest).date()
+    while True:
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        if start >= cutoff:
+            return
+        day += timedelta(days=1)
+        yield start, min(timezone.make_aware(datetime.combine(day, datetime.min.time())), cutoff)
+
+
+def purge_range(start, end, batch_size=5000, pause=0):
+    """Delete LocationLog rows with ``start <= timestamp < end``; returns how many"""
+    deleted = 0
+    rows = LocationLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    while True:
+        with transaction.atomic():
+            batch = list(rows.order_by('timestamp').values_list('pk', 'person_id', 'timestamp')[:batch_size])
+            if not batch:
+                return deleted
+            deleted += LocationLog.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()[0]
+        forget_fixes((person_id, timestamp) for _, person_id, timestamp in batch)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,157 @@
+"""
+Check-in scheduler: reminders before each CheckInSchedule occurrence and
+missed check-in detection after it.
+
+Upcoming events live in a min-heap ordered by due time, so each tick only
+touches the events that are actually due. Schedules are read once at start
+and afterwards only the rows whose ``updated_at`` moved are re-read; their
+old heap entries are retired lazily through a per-schedule generation.
+"""
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+from .alerts import raise_alert
+from .models import CheckInLog, CheckInSchedule, NotificationLog
+from .system_settings import get_system_settings
+
+REMINDER = 'reminder'
+DEADLINE = 'deadline'
+
+# Re-read window that tolerates clock skew and slow commits between writers and the scheduler
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def occurrences(schedule, after):
+    """Yield the schedule's occurrences later than ``after``, earliest first"""
+    local_after = timezone.localtime(after)
+    day = local_after.date()
+    while True:
+        if str(day.isoweekday()) in schedule.days_of_week:
+            occurrence = timezone.make_aware(datetime.combine(day, schedule.scheduled_time))
+            if occurrence > after:
+                yield occurrence
+        day += timedelta(days=1)
+
+
+def next_occurrence(schedule, after):
+    if not any(str(day) in schedule.days_of_week for day in range(1, 8)):
+        return None
+    return next(occurrences(schedule, after))
+
+
+def nearest_occurrence(schedule, when):
+    """The occurrence closest to ``when``, i.e. the one a check-in at ``when`` is for"""
+    previous = next_occurrence(schedule, when - timedelta(days=8))
+    if previous is None:
+        return None
+    for occurrence in occurrences(schedule, previous):
+        if occurrence > when:
+            return occurrence if occurrence - when < when - previous else previous
+        previous = occurrence
+
+
+class CheckInScheduler:
+    def __init__(self):
+        self._heap = []
+        self._generations = {}
+        self._versions = {}
+        self._counter = itertools.count()
+        self._synced_at = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    def load(self, now=None):
+        """Read every active schedule once and queue its next events"""
+        now = now or timezone.now()
+        self._synced_at = now
+        for schedule in CheckInSchedule.objects.filter(is_active=True).iterator():
+            self.reschedule(schedule, now)
+
+    def sync(self, now=None):
+        """Re-read only the schedules changed since the last sync"""
+        now = now or timezone.now()
+        changed = CheckInSchedule.objects.filter(updated_at__gt=self._synced_at - SYNC_OVERLAP)
+        self._synced_at = now
+        for schedule in changed.iterator():
+            if self._versions.get(schedule.id) != schedule.updated_at:
+                self.reschedule(schedule, now)
+
+    def reschedule(self, schedule, now):
+        """Drop any queued events for ``schedule`` and queue its next ones"""
+        self._generations[schedule.id] = self._generations.get(schedule.id, 0) + 1
+        self._versions[schedule.id] = schedule.updated_at
+        if not schedule.is_active:
+            return
+        # An occurrence whose grace period is still running is still pending,
+        # unless it predates the schedule itself
+        grace = timedelta(minutes=settings.CHECKIN_GRACE_MINUTES)
+        occurrence = next_occurrence(schedule, max(now - grace, schedule.created_at))
+        if occurrence is not None:
+            self._queue(schedule, occurrence, now)
+
+    def _queue(self, schedule, occurrence, now):
+        generation = self._generations[schedule.id]
+        reminder_at = occurrence - timedelta(minutes=schedule.reminder_minutes_before)
+        if schedule.reminder_minutes_before and reminder_at > now:
+            heapq.heappush(self._heap, (reminder_at, next(self._counter), schedule.id, generation, REMINDER, occurrence))
+        deadline = occurrence + timedelta(minutes=settings.CHECKIN_GRACE_MINUTES)
+        heapq.heappush(self._heap, (deadline, next(self._counter), schedule.id, generation, DEADLINE, occurrence))
+
+    def run_due(self, now=None):
+        """Process every event due by ``now``; returns the number processed"""
+        now = now or timezone.now()
+        processed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, _, schedule_id, generation, kind, occurrence = heapq.heappop(self._heap)
+            if self._generations.get(schedule_id) != generation:
+                continue
+            schedule = (
+                CheckInSchedule.objects.filter(pk=schedule_id, is_active=True)
+                .select_related('person').first()
+            )
+            if schedule is None:
+                # Deleted or deactivated since it was queued; retire its other events
+                self._generations[schedule_id] += 1
+                continue
+            if kind == REMINDER:
+                self.send_reminder(schedule, occurrence)
+            else:
+                self.check_missed(schedule, occurrence)
+                following = next_occurrence(schedule, occurrence)
+                if following is not None:
+                    self._queue(schedule, following, now)
+            processed += 1
+        return processed
+
+    def send_reminder(self, schedule, occurrence):
+        if not get_system_settings().enable_checkin_reminders:
+            return
+        phone = schedule.person.phone
+        if not phone:
+            return
+        NotificationLog.objects.create(
+            person_id=schedule.person_id,
+            recipient=phone,
+            notification_type='sms',
+            message=f"Reminder: please check in for '{schedule.name}' at {timezone.localtime(occurrence):%H:%M}.",
+        )
+
+    def check_missed(self, schedule, occurrence):
+        """Record a missed check-in and raise an alert unless the person checked in"""
+        if CheckInLog.objects.filter(schedule=schedule, scheduled_time=occurrence).exists():
+            return
+        CheckInLog.objects.create(
+            schedule=schedule, person_id=schedule.person_id, scheduled_time=occurrence, status='missed'
+        )
+        raise_alert(
+            schedule.person_id, 'check_in_missed',
+            f"No check-in for '{schedule.name}' scheduled at {timezone.localtime(occurrence):%Y-%m-%d %H:%M}.",
+            priority='high',
+        )
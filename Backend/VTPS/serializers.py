@@ -1,7 +1,30 @@
+from datetime import timedelta
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.utils import timezone
 from .models import *
+from .fields import ScaledDecimalField
+from .ingest import store_fixes
+from .scheduler import nearest_occurrence
+
+# Scaled decimal fields
+class ScaledDecimalSerializerField(serializers.DecimalField):
+    """Formats the floats read from a ScaledDecimalField without a Decimal round trip"""
+    def to_representation(self, value):
+        plain = not (self.normalize_output or self.localize or self.decimal_places is None)
+        if isinstance(value, float) and plain and getattr(self, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+            return f'{value:.{self.decimal_places}f}'
+        return super().to_representation(value)
+
+class ScaledModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer for models with ScaledDecimalFields"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        ScaledDecimalField: ScaledDecimalSerializerField,
+    }
 
 # User Serializers
 class UserSerializer(serializers.ModelSerializer):
@@ -55,14 +78,27 @@ class EmergencyContactSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 # Safe Zone Serializer
-class SafeZoneSerializer(serializers.ModelSerializer):
+class SafeZoneSerializer(ScaledModelSerializer):
     class Meta:
         model = SafeZone
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+# Latest Location Serializer
+class LatestLocationSerializer(ScaledModelSerializer):
+    person_name = serializers.CharField(source='person.full_name', read_only=True)
+    current_status = serializers.CharField(source='person.current_status', read_only=True)
+    risk_level = serializers.CharField(source='person.risk_level', read_only=True)
+    
+    class Meta:
+        model = LatestLocation
+        fields = [
+            'person', 'person_name', 'current_status', 'risk_level', 'latitude', 'longitude',
+            'accuracy', 'battery_level', 'is_safe_zone', 'timestamp'
+        ]
+
 # Location Log Serializer
-class LocationLogSerializer(serializers.ModelSerializer):
+class LocationLogSerializer(ScaledModelSerializer):
     person_name = serializers.CharField(source='person.full_name', read_only=True)
     
     class Meta:
@@ -70,22 +106,59 @@ class LocationLogSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'timestamp']
 
-class LocationCreateSerializer(serializers.ModelSerializer):
+def validate_fix_timestamp(value):
+    # A fix from the future would hold LatestLocation and make every real fix look late
+    if value > timezone.now() + timedelta(seconds=settings.LOCATION_MAX_CLOCK_SKEW_SECONDS):
+        raise serializers.ValidationError('Timestamp is in the future.')
+    return value
+
+class LocationCreateSerializer(ScaledModelSerializer):
     """Serializer for creating location logs from GPS devices"""
     device_id = serializers.CharField(write_only=True)
     
     class Meta:
         model = LocationLog
-        fields = ['device_id', 'latitude', 'longitude', 'accuracy', 'altitude', 'speed', 'battery_level']
+        fields = ['device_id', 'latitude', 'longitude', 'accuracy', 'altitude', 'speed', 'battery_level', 'timestamp']
+    
+    def validate_timestamp(self, value):
+        return validate_fix_timestamp(value)
     
     def create(self, validated_data):
-        device_id = validated_data.pop('device_id')
-        try:
-            person = VulnerablePerson.objects.get(gps_device_id=device_id)
-            validated_data['person'] = person
-            return super().create(validated_data)
-        except VulnerablePerson.DoesNotExist:
+        device_id = validated_data['device_id']
+        (log,), rejected = store_fixes([validated_data])
+        if log is None:
             raise serializers.ValidationError(f"No person found with device ID: {device_id}")
+        if log.id in rejected:
+            raise serializers.ValidationError(rejected[log.id])
+        return log
+
+class DeviceFixSerializer(ScaledModelSerializer):
+    """A fix posted by a tracker authenticated with its device key"""
+    class Meta:
+        model = LocationLog
+        fields = ['latitude', 'longitude', 'accuracy', 'altitude', 'speed', 'battery_level', 'timestamp']
+    
+    def validate_timestamp(self, value):
+        return validate_fix_timestamp(value)
+
+# Device Credential Serializer
+class DeviceCredentialSerializer(serializers.ModelSerializer):
+    person_name = serializers.CharField(source='person.full_name', read_only=True)
+    key = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DeviceCredential
+        fields = ['id', 'person', 'person_name', 'name', 'key', 'key_prefix', 'is_active', 'created_by', 'created_at', 'revoked_at']
+        read_only_fields = ['id', 'key_prefix', 'is_active', 'created_by', 'created_at', 'revoked_at']
+    
+    def get_key(self, obj):
+        # Only known, and shown, in the response that issued the credential
+        return getattr(obj, 'key', None)
+    
+    def create(self, validated_data):
+        credential, key = DeviceCredential.issue(**validated_data)
+        credential.key = key
+        return credential
 
 # Alert Serializers
 class AlertSerializer(serializers.ModelSerializer):
@@ -96,7 +169,7 @@ class AlertSerializer(serializers.ModelSerializer):
     class Meta:
         model = Alert
         fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'occurrence_count', 'contacts_notified_at']
 
 class AlertCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -113,11 +186,20 @@ class AlertUpdateSerializer(serializers.ModelSerializer):
         fields = ['status', 'assigned_to', 'resolution_notes']
 
 # Vulnerable Person Serializers
+def last_contact_time(person):
+    # The newest fix, from LatestLocation; the model column is not kept current by ingest
+    latest = getattr(person, 'latest_location', None)
+    return latest.timestamp if latest else person.last_contact_time
+
 class VulnerablePersonListSerializer(serializers.ModelSerializer):
-    """Serializer for list view with basic information"""
-    emergency_contacts_count = serializers.IntegerField(source='emergency_contacts.count', read_only=True)
+    """
+    Serializer for list view with basic information.
+    Expects a queryset from VulnerablePerson.objects.with_list_stats().
+    """
+    emergency_contacts_count = serializers.IntegerField(read_only=True)
     last_location = serializers.SerializerMethodField()
-    active_alerts_count = serializers.IntegerField(source='alerts.filter(status=active).count', read_only=True)
+    last_contact_time = serializers.SerializerMethodField()
+    active_alerts_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = VulnerablePerson
@@ -128,15 +210,18 @@ class VulnerablePersonListSerializer(serializers.ModelSerializer):
         ]
     
     def get_last_location(self, obj):
-        last_log = obj.location_logs.first()
-        if last_log:
-            return {
-                'latitude': str(last_log.latitude),
-                'longitude': str(last_log.longitude),
-                'timestamp': last_log.timestamp,
-                'battery_level': last_log.battery_level
-            }
-        return None
+        latest = getattr(obj, 'latest_location', None)
+        if latest is None:
+            return None
+        return {
+            'latitude': f'{latest.latitude:.8f}',
+            'longitude': f'{latest.longitude:.8f}',
+            'timestamp': latest.timestamp,
+            'battery_level': latest.battery_level
+        }
+    
+    def get_last_contact_time(self, obj):
+        return last_contact_time(obj)
 
 class VulnerablePersonDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer with all related data"""
@@ -144,6 +229,8 @@ class VulnerablePersonDetailSerializer(serializers.ModelSerializer):
     safe_zones = SafeZoneSerializer(many=True, read_only=True)
     recent_locations = serializers.SerializerMethodField()
     active_alerts = serializers.SerializerMethodField()
+    latest_location = LatestLocationSerializer(read_only=True, allow_null=True)
+    last_contact_time = serializers.SerializerMethodField()
     assigned_supervisor_name = serializers.CharField(source='assigned_supervisor.get_full_name', read_only=True)
     
     class Meta:
@@ -158,6 +245,9 @@ class VulnerablePersonDetailSerializer(serializers.ModelSerializer):
     def get_active_alerts(self, obj):
         active_alerts = obj.alerts.filter(status='active')
         return AlertSerializer(active_alerts, many=True).data
+    
+    def get_last_contact_time(self, obj):
+        return last_contact_time(obj)
 
 class VulnerablePersonCreateSerializer(serializers.ModelSerializer):
     emergency_contacts = EmergencyContactSerializer(many=True, required=False)
@@ -206,9 +296,15 @@ class CheckInCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         schedule = validated_data['schedule']
+        now = timezone.now()
+        occurrence = nearest_occurrence(schedule, now) or now
         validated_data['person'] = schedule.person
-        validated_data['actual_time'] = timezone.now()
-        validated_data['status'] = 'completed'
+        validated_data['scheduled_time'] = occurrence
+        validated_data['actual_time'] = now
+        if now > occurrence + timedelta(minutes=settings.CHECKIN_GRACE_MINUTES):
+            validated_data['status'] = 'late'
+        else:
+            validated_data['status'] = 'completed'
         return super().create(validated_data)
 
 # System Settings Serializer
@@ -238,7 +334,7 @@ class NotificationLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = NotificationLog
         fields = '__all__'
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'created_at', 'attempts']
 
 # Real-time Location Update Serializer
 class RealTimeLocationSerializer(serializers.Serializer):
@@ -251,15 +347,21 @@ class RealTimeLocationSerializer(serializers.Serializer):
     timestamp = serializers.DateTimeField()
     status = serializers.ChoiceField(choices=['safe', 'warning', 'emergency'])
 
+class RealTimeAlertSerializer(serializers.ModelSerializer):
+    """Alert pushed over WebSocket; only its own columns, so no related rows are loaded"""
+    class Meta:
+        model = Alert
+        fields = '__all__'
+
 # Bulk Operations Serializers
 class BulkAlertUpdateSerializer(serializers.Serializer):
     alert_ids = serializers.ListField(child=serializers.UUIDField())
     status = serializers.ChoiceField(choices=Alert.STATUS_CHOICES)
-    assigned_to = serializers.UUIDField(required=False)
+    assigned_to = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
     resolution_notes = serializers.CharField(required=False)
 
 class BulkPersonUpdateSerializer(serializers.Serializer):
     person_ids = serializers.ListField(child=serializers.UUIDField())
-    assigned_supervisor = serializers.UUIDField(required=False)
+    assigned_supervisor = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
     risk_level = serializers.ChoiceField(choices=VulnerablePerson.RISK_LEVELS, required=False)
     is_being_monitored = serializers.BooleanField(required=False)
\ No newline at end of file
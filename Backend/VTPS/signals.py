@@ -0,0 +1,93 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+from .authentication import TOKEN_USER_FIELDS, forget_tokens
+from .dashboard import invalidate_dashboard_stats
+from .models import (
+    Alert, CheckInSchedule, DeviceCredential, EmergencyContact, SafeZone, SystemSettings, User, VulnerablePerson
+)
+from .realtime import publish, publish_alert
+from .versions import bump_version, bump_version_on_commit
+
+# Sent once per set-based update, after commit, with the IDs that changed
+alerts_bulk_updated = Signal()  # alert_ids
+people_bulk_updated = Signal()  # person_ids
+
+
+@receiver([post_save, post_delete], sender=SafeZone)
+def safe_zone_changed(sender, instance, **kwargs):
+    bump_version_on_commit('safe_zones')
+
+
+@receiver([post_save, post_delete], sender=EmergencyContact)
+def emergency_contact_changed(sender, instance, **kwargs):
+    bump_version_on_commit('emergency_contacts')
+
+
+@receiver([post_save, post_delete], sender=CheckInSchedule)
+def checkin_schedule_changed(sender, instance, **kwargs):
+    bump_version_on_commit('checkin_schedules')
+
+
+@receiver([post_save, post_delete], sender=Alert)
+@receiver(alerts_bulk_updated)
+def alerts_changed(sender, **kwargs):
+    bump_version_on_commit('alerts')
+
+
+@receiver([post_save, post_delete], sender=SystemSettings)
+def system_settings_changed(sender, instance, **kwargs):
+    bump_version('system_settings')
+
+
+@receiver([post_save, post_delete], sender=VulnerablePerson)
+@receiver(people_bulk_updated)
+def people_changed(sender, **kwargs):
+    bump_version_on_commit('people')
+
+
+@receiver([post_save, post_delete], sender=DeviceCredential)
+@receiver([post_save, post_delete], sender=VulnerablePerson)
+@receiver(people_bulk_updated)
+def device_credentials_changed(sender, **kwargs):
+    # Cached device keys carry the person's supervisor and status
+    bump_version('device_credentials')
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Cached tokens carry the user's is_active, is_superuser and role
+    if update_fields is None or not update_fields.isdisjoint(TOKEN_USER_FIELDS):
+        forget_tokens()
+
+
+@receiver([post_save, post_delete], sender=Alert)
+@receiver([post_save, post_delete], sender=VulnerablePerson)
+@receiver(alerts_bulk_updated)
+@receiver(people_bulk_updated)
+def dashboard_data_changed(sender, **kwargs):
+    invalidate_dashboard_stats()
+
+
+@receiver(post_save, sender=Alert)
+def push_alert(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_alert(instance))
+
+
+@receiver(alerts_bulk_updated)
+def push_bulk_alert_update(sender, alert_ids, **kwargs):
+    rows = Alert.objects.filter(id__in=alert_ids).values_list(
+        'person_id', 'person__assigned_supervisor_id', 'id', 'status'
+    )
+    by_person = defaultdict(list)
+    for person_id, supervisor_id, alert_id, status in rows:
+        by_person[person_id, supervisor_id].append({'id': alert_id, 'status': status})
+    for (person_id, supervisor_id), alerts in by_person.items():
+        publish({'type': 'alerts_updated', 'data': alerts}, person_id, supervisor_id)
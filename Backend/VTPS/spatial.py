@@ -0,0 +1,292 @@
+"""
+Grid indexes answering "who is near this point", "which SafeZones contain
+this point" and "what does the map show here" from memory.
+
+Positions and zones are bucketed into cells of ``SPATIAL_CELL_DEGREES``; a
+query only measures the items in the cells overlapping its search circle.
+The position index follows LatestLocation: ingest moves people in this
+process as soon as fixes commit, and rows written by other processes are
+picked up by re-reading recently updated rows at most every
+``SPATIAL_SYNC_SECONDS``. When the ``people`` version moves, recently
+updated people are re-read for status and risk level changes, and deleted
+people are dropped. Every move also updates per-zoom cluster counts for the
+map. The zone index is rebuilt when any SafeZone changes.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .geofence import EARTH_RADIUS_METERS, Zone
+from .models import LatestLocation, SafeZone, VulnerablePerson
+from .versions import VersionWatcher
+
+METERS_PER_DEGREE = EARTH_RADIUS_METERS * math.pi / 180
+
+# Re-read window that tolerates clock skew and slow commits between ingest and the index
+SYNC_OVERLAP = timedelta(minutes=1)
+
+# Severity order used to pick the worst status and risk level of a cluster
+STATUS_ORDER = [status for status, _ in VulnerablePerson.STATUS_CHOICES]
+RISK_ORDER = [risk for risk, _ in VulnerablePerson.RISK_LEVELS]
+
+
+def _distance_meters(lat1, lng1, lat2, lng2):
+    # Equirectangular approximation, well within GPS error at search radii
+    x = (lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(x, lat2 - lat1) * METERS_PER_DEGREE
+
+
+class Grid:
+    """Keys bucketed by the cell their point or circle falls in"""
+    def __init__(self, cell_degrees):
+        self.cell_degrees = cell_degrees
+        self.cells = defaultdict(set)
+
+    def cell_of(self, lat, lng):
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def cells_around(self, lat, lng, radius_meters):
+        """Cells overlapping the bounding box of a circle"""
+        dlat = radius_meters / METERS_PER_DEGREE
+        dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+        (row_from, col_from), (row_to, col_to) = self.cell_of(lat - dlat, lng - dlng), self.cell_of(lat + dlat, lng + dlng)
+        return [(row, col) for row in range(row_from, row_to + 1) for col in range(col_from, col_to + 1)]
+
+    def add(self, key, cells):
+        for cell in cells:
+            self.cells[cell].add(key)
+
+    def discard(self, key, cells):
+        for cell in cells:
+            keys = self.cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.cells[cell]
+
+    def candidates(self, cells):
+        for cell in cells:
+            yield from self.cells.get(cell, ())
+
+    def clear(self):
+        self.cells.clear()
+
+
+def cells_in_box(cells, size, south, west, north, east):
+    """Keys of ``cells`` (a dict keyed like ``Grid.cell_of`` with ``size``) overlapping a box"""
+    row_from, row_to = math.floor(south / size), math.floor(north / size)
+    col_from, col_to = math.floor(west / size), math.floor(east / size)
+    if (row_to - row_from + 1) * (col_to - col_from + 1) > len(cells):
+        # Fewer occupied cells than cells in the box: filter the occupied ones
+        return [(row, col) for row, col in cells if row_from <= row <= row_to and col_from <= col <= col_to]
+    return [(row, col) for row in range(row_from, row_to + 1) for col in range(col_from, col_to + 1) if (row, col) in cells]
+
+
+# Map clusters
+class ClusterLevels:
+    """
+    Per-zoom grids of position counts for map clustering.
+
+    At zoom ``z`` a cell spans ``MAP_CLUSTER_CELL_PIXELS`` of a 256 pixel web
+    map tile. Each cell keeps ``[count, latitude sum, longitude sum, count
+    per status..., count per risk level...]``, so adding or removing a
+    person touches one cell per zoom level.
+    """
+    def __init__(self, max_zoom, cell_pixels):
+        self.cell_degrees = [360 * cell_pixels / (256 * 2 ** zoom) for zoom in range(max_zoom + 1)]
+        self.levels = [{} for _ in self.cell_degrees]
+        self._status_slot = {status: 3 + index for index, status in enumerate(STATUS_ORDER)}
+        self._risk_slot = {risk: 3 + len(STATUS_ORDER) + index for index, risk in enumerate(RISK_ORDER)}
+
+    def _update(self, lat, lng, status, risk, sign):
+        status_slot, risk_slot = self._status_slot.get(status, 3), self._risk_slot.get(risk, 3 + len(STATUS_ORDER))
+        for size, cells in zip(self.cell_degrees, self.levels):
+            key = (math.floor(lat / size), math.floor(lng / size))
+            stats = cells.get(key)
+            if stats is None:
+                stats = cells[key] = [0, 0.0, 0.0] + [0] * (len(STATUS_ORDER) + len(RISK_ORDER))
+            stats[0] += sign
+            if not stats[0]:
+                del cells[key]
+                continue
+            stats[1] += sign * lat
+            stats[2] += sign * lng
+            stats[status_slot] += sign
+            stats[risk_slot] += sign
+
+    def add(self, lat, lng, status, risk):
+        self._update(lat, lng, status, risk, 1)
+
+    def remove(self, lat, lng, status, risk):
+        self._update(lat, lng, status, risk, -1)
+
+    def clusters(self, zoom, south, west, north, east):
+        """``(lat, lng, count, worst status, worst risk)`` of the cells overlapping the box"""
+        cells = self.levels[zoom]
+        found = []
+        for key in cells_in_box(cells, self.cell_degrees[zoom], south, west, north, east):
+            count, lat_sum, lng_sum, *severities = cells[key]
+            statuses, risks = severities[:len(STATUS_ORDER)], severities[len(STATUS_ORDER):]
+            worst_status = max((index for index, n in enumerate(statuses) if n), default=0)
+            worst_risk = max((index for index, n in enumerate(risks) if n), default=0)
+            found.append((lat_sum / count, lng_sum / count, count, STATUS_ORDER[worst_status], RISK_ORDER[worst_risk]))
+        return found
+
+    def clear(self):
+        for cells in self.levels:
+            cells.clear()
+
+
+# Latest positions
+class PositionIndex:
+    def __init__(self):
+        self._positions = {}  # person_id -> (lat, lng, timestamp, status, risk level)
+        self._grid = Grid(settings.SPATIAL_CELL_DEGREES)
+        self.clusters = ClusterLevels(settings.MAP_CLUSTER_MAX_ZOOM, settings.MAP_CLUSTER_CELL_PIXELS)
+        self._lock = threading.RLock()
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._people_watcher = VersionWatcher('people')
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _remove(self, person_id):
+        lat, lng, _, status, risk = self._positions.pop(person_id)
+        self._grid.discard(person_id, [self._grid.cell_of(lat, lng)])
+        self.clusters.remove(lat, lng, status, risk)
+
+    def _move(self, person_id, lat, lng, timestamp, status=None, risk=None):
+        current = self._positions.get(person_id)
+        if current is not None:
+            if timestamp < current[2]:
+                return
+            status, risk = status or current[3], risk or current[4]
+            self._remove(person_id)
+        self._positions[person_id] = (lat, lng, timestamp, status, risk)
+        self._grid.add(person_id, [self._grid.cell_of(lat, lng)])
+        self.clusters.add(lat, lng, status, risk)
+
+    def observe(self, logs):
+        """Move people to newly stored fixes; people not yet indexed are left to ``sync``"""
+        with self._lock:
+            for log in logs:
+                if log.person_id in self._positions:
+                    self._move(log.person_id, float(log.latitude), float(log.longitude), log.timestamp)
+
+    def sync(self, now=None):
+        """Load every position on first use, then take in rows updated since the last sync"""
+        with self._lock:
+            if self._synced_at is not None and time.monotonic() - self._checked_at < settings.SPATIAL_SYNC_SECONDS:
+                return
+            now = now or timezone.now()
+            people_changed = self._people_watcher.changed() and self._synced_at is not None
+            rows = LatestLocation.objects.order_by()
+            if self._synced_at is not None:
+                rows = rows.filter(updated_at__gt=self._synced_at - SYNC_OVERLAP)
+            rows = rows.values_list(
+                'person_id', 'latitude', 'longitude', 'timestamp', 'person__current_status', 'person__risk_level'
+            )
+            for row in rows.iterator(chunk_size=10000):
+                self._move(*row)
+            if people_changed:
+                self._sync_people(self._synced_at - SYNC_OVERLAP)
+            self._synced_at = now
+            self._checked_at = time.monotonic()
+
+    def _sync_people(self, since):
+        # Status and risk level changes don't touch LatestLocation, and deletions remove it
+        people = VulnerablePerson.objects.filter(updated_at__gt=since).order_by().values_list(
+            'id', 'current_status', 'risk_level'
+        )
+        for person_id, status, risk in people.iterator(chunk_size=10000):
+            current = self._positions.get(person_id)
+            if current is not None and current[3:] != (status, risk):
+                lat, lng, timestamp, _, _ = current
+                self._remove(person_id)
+                self._move(person_id, lat, lng, timestamp, status, risk)
+        # Deletions leave nothing to find by time; only list the rows when some are gone
+        if LatestLocation.objects.count() < len(self._positions):
+            kept = set(LatestLocation.objects.values_list('person_id', flat=True).iterator(chunk_size=10000))
+            for person_id in [person_id for person_id in self._positions if person_id not in kept]:
+                self._remove(person_id)
+
+    def nearby(self, lat, lng, radius_meters):
+        """``(distance, person_id, timestamp)`` of everyone within the radius, nearest first"""
+        self.sync()
+        with self._lock:
+            found = []
+            for person_id in self._grid.candidates(self._grid.cells_around(lat, lng, radius_meters)):
+                person_lat, person_lng, timestamp, _, _ = self._positions[person_id]
+                distance = _distance_meters(lat, lng, person_lat, person_lng)
+                if distance <= radius_meters:
+                    found.append((distance, person_id, timestamp))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def map_clusters(self, zoom, south, west, north, east):
+        """
+        Clusters overlapping a box as ``(lat, lng, count, worst status, worst
+        risk, person_id)``. Above ``MAP_CLUSTER_MAX_ZOOM`` every person is
+        their own cluster and ``person_id`` is set; otherwise it is None.
+        """
+        self.sync()
+        with self._lock:
+            if zoom <= settings.MAP_CLUSTER_MAX_ZOOM:
+                return [(*cluster, None) for cluster in self.clusters.clusters(zoom, south, west, north, east)]
+            found = []
+            cells = cells_in_box(self._grid.cells, self._grid.cell_degrees, south, west, north, east)
+            for person_id in self._grid.candidates(cells):
+                lat, lng, _, status, risk = self._positions[person_id]
+                if south <= lat <= north and west <= lng <= east:
+                    found.append((lat, lng, 1, status, risk, person_id))
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._positions.clear()
+            self._grid.clear()
+            self.clusters.clear()
+            self._synced_at = None
+
+
+positions = PositionIndex()
+
+
+# Safe zones
+class SafeZoneIndex:
+    def __init__(self):
+        self._zones = None
+        self._grid = Grid(settings.SPATIAL_CELL_DEGREES)
+        self._lock = threading.Lock()
+        self._watcher = VersionWatcher('safe_zones')
+
+    def _load(self):
+        self._grid.clear()
+        self._zones = {}
+        for zone in SafeZone.objects.filter(is_active=True).order_by().iterator(chunk_size=10000):
+            self._zones[zone.id] = Zone(zone)
+            self._grid.add(zone.id, self._grid.cells_around(
+                float(zone.center_latitude), float(zone.center_longitude), zone.radius_meters
+            ))
+
+    def containing(self, lat, lng):
+        """IDs of the active zones whose circle contains the point"""
+        with self._lock:
+            if self._watcher.changed() or self._zones is None:
+                self._load()
+            lat_radians, lng_radians = math.radians(lat), math.radians(lng)
+            return [
+                zone_id for zone_id in self._grid.candidates([self._grid.cell_of(lat, lng)])
+                if self._zones[zone_id].distance_from_edge(lat_radians, lng_radians) <= 0
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._zones = None
+
+
+safe_zones = SafeZoneIndex()
@@ -0,0 +1,33 @@
+"""
+Process-wide access to the SystemSettings row.
+
+The row is read once and served from memory until it is saved or deleted,
+which bumps the ``system_settings`` version in the shared cache and makes
+every process read it again, so settings checks on the ingest and alert
+paths cost no queries.
+"""
+from .models import SystemSettings
+from .versions import VersionWatcher
+
+
+class SystemSettingsCache:
+    def __init__(self):
+        self._row = None
+        self._watcher = VersionWatcher('system_settings')
+
+    def get(self):
+        if self._watcher.changed() or self._row is None:
+            # The oldest row is the live one; without a row the model defaults apply
+            self._row = SystemSettings.objects.order_by('created_at').first() or SystemSettings()
+        return self._row
+
+    def clear(self):
+        self._row = None
+
+
+system_settings = SystemSettingsCache()
+
+
+def get_system_settings():
+    """The current SystemSettings; shared, so treat it as read-only"""
+    return system_settings.get()
@@ -1,3 +1,1471 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIClient, APITestCase
+from . import archive, realtime
+from .activity import ActivityTracker, activity
+from .alerts import open_alerts, raise_alert, resolve_alerts
+from .authentication import DeviceKeyCache, device_keys, get_token, tokens
+from .dashboard import DASHBOARD_STATS_CACHE_KEY, compute_dashboard_stats
+from .fields import ScaledDecimalField
+from .geofence import GeofenceIndex
+from .ingest import DeviceOwner, update_latest_locations
+from .metrics import get_metrics
+from .models import *
+from .notifications import MemoryBackend, NotificationDispatcher, queue_alert_notifications
+from .retention import expired_days, purge_range, retention_cutoff
+from .scheduler import CheckInScheduler, next_occurrence
+from .serializers import SafeZoneSerializer
+from .spatial import positions, safe_zones
+from .throttling import DeviceRateThrottle
+from .system_settings import get_system_settings, system_settings
+from .tracks import bucket_start, forget_buckets, ranked_buckets
+from .watchdog import DeviceWatchdog
 
-# Create your tests here.
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+# Query counts cover the database only, not a database cache
+@override_settings(CACHES=LOCAL_CACHE)
+class VulnerablePersonListQueryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='operator', password='secret', role='operator')
+        self.client.force_authenticate(self.user)
+
+    def create_people(self, count):
+        for i in range(count):
+            person = VulnerablePerson.objects.create(
+                first_name=f'Person{i}', last_name='Test', age=80, address='1 Test Street'
+            )
+            EmergencyContact.objects.create(person=person, name='Contact', relationship='son', phone='+123456789')
+            LatestLocation.objects.create(
+                person=person, latitude='51.50000000', longitude='-0.12000000', battery_level=80, timestamp=timezone.now()
+            )
+            Alert.objects.create(person=person, alert_type='battery_low', title='Low Battery', description='Low')
+            Alert.objects.create(person=person, alert_type='battery_low', title='Low Battery', description='Old', status='resolved')
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/people/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.create_people(2)
+        _, small_page_queries = self.list_queries()
+        self.create_people(18)
+        response, full_page_queries = self.list_queries()
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(small_page_queries, full_page_queries)
+
+    def test_list_stats_are_annotated(self):
+        self.create_people(1)
+        response, _ = self.list_queries()
+        row = response.data['results'][0]
+        self.assertEqual(row['emergency_contacts_count'], 1)
+        self.assertEqual(row['active_alerts_count'], 1)
+        self.assertEqual(row['last_location']['latitude'], '51.50000000')
+        self.assertEqual(row['last_location']['battery_level'], 80)
+
+    def test_list_and_detail_agree_on_last_contact_time(self):
+        self.create_people(1)
+        person = VulnerablePerson.objects.get()
+        VulnerablePerson.objects.filter(pk=person.pk).update(last_contact_time=timezone.now() - timedelta(days=30))
+        listed = self.client.get('/api/people/').json()['results'][0]['last_contact_time']
+        detail = self.client.get(f'/api/people/{person.pk}/').json()
+        self.assertEqual(detail['last_contact_time'], listed)
+        self.assertEqual(detail['last_contact_time'], detail['latest_location']['timestamp'])
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        tokens.clear()
+        self.user = User.objects.create_user(username='operator', password='secret', role='operator')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_resolved_from_memory(self):
+        get_token(self.token.key)
+        with self.assertNumQueries(0):
+            user = get_token(self.token.key).user
+        self.assertEqual((user.pk, user.role), (self.user.pk, 'operator'))
+
+    def test_deleted_token_is_rejected(self):
+        self.assertEqual(self.client.get('/api/dashboard-stats/').status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/dashboard-stats/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/dashboard-stats/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/dashboard-stats/').status_code, 401)
+
+    def test_saving_other_user_fields_keeps_the_cache(self):
+        get_token(self.token.key)
+        self.user.is_active_session = True
+        self.user.save(update_fields=['is_active_session'])
+        with self.assertNumQueries(0):
+            get_token(self.token.key)
+
+    def test_cache_holds_no_password_hash(self):
+        get_token(self.token.key)
+        [(_, values)] = tokens._tokens.values()
+        self.assertEqual(set(values), {self.user.pk, True, False, 'operator'})
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_process_local_cache_is_not_used(self):
+        self.assertEqual(self.client.get('/api/dashboard-stats/').status_code, 200)
+        self.assertEqual(tokens._tokens, {})
+
+
+class DeviceKeyAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        device_keys.clear()
+        self.admin = User.objects.create_user(username='admin', password='secret', role='admin')
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.credential, self.key = DeviceCredential.issue(self.person, 'tracker')
+        self.device = APIClient()
+        self.device.credentials(HTTP_AUTHORIZATION=f'Device {self.key}')
+        self.minute = 0
+
+    def ingest(self):
+        self.minute += 1
+        return self.device.post('/api/devices/locations/', {
+            'latitude': '51.5000000', 'longitude': '-0.1200000',
+            'timestamp': (timezone.now() - timedelta(hours=1, minutes=-self.minute)).isoformat(),
+        }, format='json')
+
+    def test_revoked_key_is_rejected(self):
+        self.assertEqual(self.ingest().status_code, 201)
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(f'/api/device-credentials/{self.credential.pk}/revoke/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ingest().status_code, 401)
+
+    def test_key_revoked_elsewhere_expires_from_memory(self):
+        self.assertEqual(self.ingest().status_code, 201)
+        # A revocation whose version bump this process never sees, as in another worker with a lost bump
+        DeviceCredential.objects.filter(pk=self.credential.pk).update(is_active=False)
+        self.assertEqual(self.ingest().status_code, 201)
+        later = time.monotonic() + settings.DEVICE_KEY_CACHE_SECONDS + 1
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertEqual(self.ingest().status_code, 401)
+
+    @mock.patch.object(DeviceRateThrottle, 'THROTTLE_RATES', {'device': '2/min'})
+    def test_posts_are_throttled_in_process(self):
+        DeviceRateThrottle.cache.clear()
+        self.ingest()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.ingest().status_code, 201)
+        self.assertFalse([query for query in queries.captured_queries if 'throttle_device' in query['sql']])
+        self.assertEqual(self.ingest().status_code, 429)
+
+    def test_fix_from_the_future_is_rejected(self):
+        response = self.device.post('/api/devices/locations/', {
+            'latitude': '51.5000000', 'longitude': '-0.1200000', 'timestamp': '2099-01-01T00:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['errors']['timestamp'], ['Timestamp is in the future.'])
+
+    @mock.patch.object(DeviceKeyCache, 'max_unknown', 10)
+    def test_unknown_keys_do_not_evict_valid_ones(self):
+        device_keys.get(self.key)
+        for i in range(25):
+            device_keys.get(f'made-up-{i}')
+        with self.assertNumQueries(0):
+            self.assertEqual(device_keys.get(self.key).credential_id, self.credential.pk)
+
+
+class SystemSettingsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        system_settings.clear()
+
+    def test_save_changes_next_read(self):
+        self.assertEqual(get_system_settings().data_retention_days, 365)
+        row = SystemSettings.objects.create(data_retention_days=30)
+        self.assertEqual(get_system_settings().data_retention_days, 30)
+        row.data_retention_days = 90
+        row.save()
+        self.assertEqual(get_system_settings().data_retention_days, 90)
+
+    def test_save_in_another_process_changes_next_read(self):
+        row = SystemSettings.objects.create(data_retention_days=30)
+        self.assertEqual(get_system_settings().data_retention_days, 30)
+        # What another worker leaves behind: the row and the shared version, but no local bump
+        SystemSettings.objects.filter(pk=row.pk).update(data_retention_days=90)
+        cache.set('vtps:version:system_settings', time.time_ns(), None)
+        later = time.monotonic() + settings.VERSION_CHECK_INTERVAL_SECONDS + 1
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertEqual(get_system_settings().data_retention_days, 90)
+
+
+class ArchiveEncodingTests(SimpleTestCase):
+    def round_trip(self, records):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'track.trk')
+            with open(path, 'wb') as file:
+                file.write(archive.encode(records))
+            with archive.Track(path) as track:
+                return list(track.records()), list(track)
+
+    def test_round_trip_with_negative_and_edge_values(self):
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        fixes = [
+            (start, 51.5, -0.12, 5.0, 1.5, 80, True),
+            (start + timedelta(seconds=1), 51.5, -0.12, -1.0, -1.0, -1, False),
+            (start + timedelta(seconds=2), 51.5, -0.12, None, None, None, False),
+            (start + timedelta(seconds=3), 51.5, -0.12, 10000.0, 7000.0, 300, False),
+            # Jumps across the antimeridian overflow 32-bit longitude deltas
+            (start + timedelta(hours=20), -89.9999999, 179.9999999, 0.0, 0.0, 0, True),
+            (start + timedelta(hours=21), 89.9999999, -179.9999999, 0.0, 0.0, 100, False),
+        ]
+        records = [archive._record(*fix) for fix in fixes]
+        decoded_records, decoded = self.round_trip(records)
+        self.assertEqual(decoded_records, records)
+        self.assertEqual([fix['timestamp'] for fix in decoded], [fix[0] for fix in fixes])
+        self.assertEqual([fix['longitude'] for fix in decoded], [fix[2] for fix in fixes])
+        self.assertEqual([fix['accuracy'] for fix in decoded], [5.0, None, None, 6553.4, 0.0, 0.0])
+        self.assertEqual([fix['speed'] for fix in decoded], [1.5, None, None, 6553.4, 0.0, 0.0])
+        self.assertEqual([fix['battery_level'] for fix in decoded], [80, None, None, 254, 0, 100])
+        self.assertEqual([fix['is_safe_zone'] for fix in decoded], [True, False, False, False, True, False])
+
+    def test_single_fix(self):
+        record = archive._record(datetime(2026, 1, 1, tzinfo=dt_timezone.utc), 0.0, 0.0, None, None, None, False)
+        self.assertEqual(self.round_trip([record])[0], [record])
+
+
+class ArchivedHistoryTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(LOCATION_ARCHIVE_ROOT=directory.name))
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.url = f'/api/people/{self.person.pk}/history/'
+
+    def test_archived_day_is_replayed(self):
+        start = timezone.make_aware(datetime(2026, 1, 1, 9))
+        LocationLog.objects.bulk_create([
+            LocationLog(person=self.person, latitude=51.5, longitude=-0.12, accuracy=5.5, battery_level=80, timestamp=start),
+            LocationLog(person=self.person, latitude=51.5001, longitude=-0.1201, timestamp=start + timedelta(minutes=1)),
+        ])
+        day_start = timezone.make_aware(datetime(2026, 1, 1))
+        self.assertEqual(archive.archive_range(day_start, day_start + timedelta(days=1)), 2)
+        self.assertEqual(self.client.get(self.url).data, {'archived_days': [start.date()]})
+        response = self.client.get(self.url, {'date': '2026-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        first, second = response.data['fixes']
+        self.assertEqual((first['timestamp'], first['latitude'], first['accuracy'], first['battery_level']), (start, 51.5, 5.5, 80))
+        self.assertEqual((second['longitude'], second['accuracy'], second['battery_level']), (-0.1201, None, None))
+
+    def test_day_without_archive_is_empty(self):
+        self.assertEqual(self.client.get(self.url, {'date': '2026-01-02'}).data['count'], 0)
+
+    def test_invalid_dates_are_rejected(self):
+        for value in ['2024-02-30', '2024-13-01', 'yesterday', '']:
+            self.assertEqual(self.client.get(self.url, {'date': value}).status_code, 400, value)
+
+
+class GeofenceAlertTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        system_settings.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.person = VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street', gps_device_id='TRACKER-1'
+        )
+        self.zone = SafeZone.objects.create(
+            person=self.person, name='Home', center_latitude='51.5000000', center_longitude='-0.1200000', radius_meters=200
+        )
+        self.start = timezone.now() - timedelta(hours=2)
+        self.minutes = 0
+
+    def send(self, *metres_north):
+        """Post fixes this many metres north of the zone centre, a minute apart"""
+        batch = []
+        for metres in metres_north:
+            self.minutes += 1
+            batch.append({
+                'device_id': 'TRACKER-1', 'latitude': f'{51.5 + metres / 111195:.7f}', 'longitude': '-0.1200000',
+                'timestamp': (self.start + timedelta(minutes=self.minutes)).isoformat(),
+            })
+        response = self.client.post('/api/locations/batch/', batch, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def alerts(self):
+        return list(
+            Alert.objects.filter(person=self.person).order_by('created_at')
+            .values_list('alert_type', 'occurrence_count', 'status')
+        )
+
+    def test_fixes_are_flagged_inside_and_outside(self):
+        self.send(0, 300)
+        self.assertEqual(
+            list(LocationLog.objects.filter(person=self.person).order_by('timestamp').values_list('is_safe_zone', flat=True)),
+            [True, False]
+        )
+        self.assertFalse(LatestLocation.objects.get(person=self.person).is_safe_zone)
+
+    def test_one_alert_per_breach(self):
+        self.send(0, 50)
+        self.assertEqual(self.alerts(), [])
+        self.send(300, 350, 300)
+        self.assertEqual(self.alerts(), [('safe_zone_exit', 1, 'active')])
+        self.send(800, 900)
+        self.assertEqual(self.alerts(), [('safe_zone_exit', 1, 'active'), ('geofence_violation', 1, 'active')])
+
+    def test_leaving_again_after_resolution_raises_a_new_alert(self):
+        self.send(0, 300)
+        Alert.objects.filter(person=self.person).update(status='resolved')
+        self.send(0, 300)
+        self.assertEqual(self.alerts(), [('safe_zone_exit', 1, 'resolved'), ('safe_zone_exit', 1, 'active')])
+
+    def test_leaving_again_while_open_is_counted_on_the_open_alert(self):
+        self.send(0, 300, 0, 300)
+        self.assertEqual(self.alerts(), [('safe_zone_exit', 2, 'active')])
+
+    def test_late_fixes_do_not_change_state(self):
+        self.send(0, 50)
+        # Buffered fix uploaded late, from before the ones already stored
+        response = self.client.post('/api/locations/batch/', [{
+            'device_id': 'TRACKER-1', 'latitude': f'{51.5 + 300 / 111195:.7f}', 'longitude': '-0.1200000',
+            'timestamp': self.start.isoformat(),
+        }], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.alerts(), [])
+        self.send(300)
+        self.assertEqual(self.alerts(), [('safe_zone_exit', 1, 'active')])
+
+    def test_state_follows_fixes_handled_by_another_process(self):
+        first, second = GeofenceIndex(), GeofenceIndex()
+        with mock.patch('VTPS.ingest.zone_index', first):
+            self.send(0, 300)
+        Alert.objects.filter(person=self.person).update(status='resolved')
+        with mock.patch('VTPS.ingest.zone_index', second):
+            self.send(0)
+        with mock.patch('VTPS.ingest.zone_index', first):
+            self.send(300)
+        self.assertEqual(self.alerts(), [('safe_zone_exit', 1, 'resolved'), ('safe_zone_exit', 1, 'active')])
+
+    def test_zone_outside_its_schedule_does_not_apply(self):
+        self.zone.active_days = ''
+        self.zone.save()
+        self.send(0, 300)
+        self.assertEqual(self.alerts(), [])
+        self.assertFalse(LocationLog.objects.filter(person=self.person, is_safe_zone=False).exists())
+
+    def test_location_alerts_can_be_disabled(self):
+        SystemSettings.objects.create(enable_location_alerts=False)
+        self.send(0, 300, 900)
+        self.assertEqual(self.alerts(), [])
+
+
+class FixFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        system_settings.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.person = VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street', gps_device_id='TRACKER-1'
+        )
+        self.start = timezone.now() - timedelta(hours=1)
+
+    def fix(self, minutes, latitude='51.5000000', accuracy=None):
+        fix = {
+            'device_id': 'TRACKER-1', 'latitude': latitude, 'longitude': '-0.1200000',
+            'timestamp': (self.start + timedelta(minutes=minutes)).isoformat(),
+        }
+        if accuracy is not None:
+            fix['accuracy'] = accuracy
+        return fix
+
+    def test_inaccurate_fixes_are_dropped(self):
+        response = self.client.post('/api/locations/batch/', [
+            self.fix(0, accuracy='10.00'), self.fix(1, accuracy='50.00'), self.fix(2, accuracy='51.00'),
+        ], format='json')
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (2, 1))
+        self.assertEqual([result['status'] for result in response.data['results']], ['accepted', 'accepted', 'rejected'])
+        self.assertIn('worse than the 50 m threshold', response.data['results'][2]['errors']['non_field_errors'][0])
+        self.assertEqual(LocationLog.objects.filter(person=self.person).count(), 2)
+        self.assertEqual(get_metrics()['fixes_rejected_inaccurate'], 1)
+
+    def test_threshold_comes_from_system_settings(self):
+        SystemSettings.objects.create(gps_accuracy_threshold_meters=100)
+        response = self.client.post('/api/locations/batch/', [self.fix(0, accuracy='80.00')], format='json')
+        self.assertEqual(response.data['accepted'], 1)
+
+    def test_implausibly_fast_fixes_are_dropped(self):
+        # 1 km in a minute is 60 km/h; 20 km in a minute is 1200 km/h
+        response = self.client.post('/api/locations/batch/', [
+            self.fix(0), self.fix(1, latitude='51.5089932'), self.fix(2, latitude='51.6888577'), self.fix(3, latitude='51.5179864'),
+        ], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['accepted', 'accepted', 'rejected', 'accepted'])
+        self.assertIn('km/h since the previous fix', response.data['results'][2]['errors']['non_field_errors'][0])
+        self.assertEqual(LatestLocation.objects.get(person=self.person).latitude, 51.5179864)
+        self.assertEqual(get_metrics()['fixes_rejected_implausible_speed'], 1)
+
+    def test_speed_is_checked_against_the_stored_latest_fix(self):
+        self.client.post('/api/locations/batch/', [self.fix(0)], format='json')
+        response = self.client.post('/api/locations/', self.fix(1, latitude='51.6888577'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('km/h since the previous fix', str(response.data))
+
+    def test_fixes_from_the_future_are_rejected(self):
+        future = self.fix(0)
+        future['timestamp'] = '2099-01-01T00:00:00Z'
+        response = self.client.post('/api/locations/batch/', [self.fix(0), future], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['accepted', 'rejected'])
+        self.assertEqual(response.data['results'][1]['errors']['timestamp'], ['Timestamp is in the future.'])
+        self.assertEqual(LatestLocation.objects.get(person=self.person).timestamp, self.start)
+        # Within the allowed clock skew
+        ahead = self.fix(0)
+        ahead['timestamp'] = (timezone.now() + timedelta(seconds=settings.LOCATION_MAX_CLOCK_SKEW_SECONDS - 60)).isoformat()
+        response = self.client.post('/api/locations/', ahead, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_late_fixes_are_only_checked_for_accuracy(self):
+        self.client.post('/api/locations/batch/', [self.fix(10)], format='json')
+        response = self.client.post('/api/locations/batch/', [self.fix(0, latitude='52.5000000')], format='json')
+        self.assertEqual(response.data['accepted'], 1)
+
+
+# Query counts cover the database only, not a database cache
+@override_settings(CACHES=LOCAL_CACHE)
+class BatchIngestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        system_settings.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.people = [
+            VulnerablePerson.objects.create(
+                first_name=name, last_name='Test', age=80, address='1 Test Street', gps_device_id=f'TRACKER-{name}'
+            )
+            for name in ['Ada', 'Bob']
+        ]
+        self.start = timezone.now() - timedelta(hours=2)
+        self.minutes = 0
+
+    def fixes(self, count, device_ids=('TRACKER-Ada', 'TRACKER-Bob')):
+        batch = []
+        for index in range(count):
+            self.minutes += 1
+            batch.append({
+                'device_id': device_ids[index % len(device_ids)], 'latitude': '51.5000000', 'longitude': '-0.1200000',
+                'timestamp': (self.start + timedelta(minutes=self.minutes)).isoformat(),
+            })
+        return batch
+
+    def post(self, batch):
+        return self.client.post('/api/locations/batch/', batch, format='json')
+
+    def test_results_are_reported_per_index(self):
+        good, unknown, invalid = self.fixes(3)
+        unknown['device_id'] = 'TRACKER-Nobody'
+        invalid['latitude'] = 'north'
+        response = self.post([good, unknown, 'not a fix', invalid])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (1, 3))
+        results = response.data['results']
+        self.assertEqual([(result['index'], result['status']) for result in results],
+                         [(0, 'accepted'), (1, 'rejected'), (2, 'rejected'), (3, 'rejected')])
+        self.assertEqual(str(LocationLog.objects.get().id), str(results[0]['id']))
+        self.assertEqual(results[1]['errors'], {'device_id': ['No person found with device ID: TRACKER-Nobody']})
+        self.assertIn('non_field_errors', results[2]['errors'])
+        self.assertIn('latitude', results[3]['errors'])
+
+    def test_batch_with_nothing_accepted_is_a_bad_request(self):
+        response = self.post(self.fixes(2, device_ids=['TRACKER-Nobody']))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['accepted'], 0)
+
+    @override_settings(LOCATION_BATCH_MAX_SIZE=5)
+    def test_batch_size_is_limited(self):
+        self.assertEqual(self.post(self.fixes(5)).status_code, 201)
+        response = self.post(self.fixes(6))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 5 fixes', response.data['detail'])
+        for body in [[], {'device_id': 'TRACKER-Ada'}]:
+            self.assertEqual(self.post(body).status_code, 400)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.post(self.fixes(2))
+        counts = []
+        for size in [2, 40]:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(self.fixes(size)).data['accepted'], size)
+            counts.append([query['sql'] for query in queries.captured_queries])
+        self.assertEqual(len(counts[0]), len(counts[1]))
+        statements = counts[1]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "VTPS_locationlog"')]), 1)
+        self.assertEqual(len([sql for sql in statements if '"gps_device_id" IN' in sql]), 1)
+
+
+class LatestLocationUpsertTests(TestCase):
+    def setUp(self):
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.now = timezone.now()
+
+    def log(self, minutes, latitude):
+        return LocationLog(
+            person=self.person, latitude=latitude, longitude=Decimal('-0.12'), timestamp=self.now + timedelta(minutes=minutes)
+        )
+
+    def test_first_fix_inserts_the_row(self):
+        update_latest_locations([self.log(0, Decimal('51.5')), self.log(1, Decimal('51.6'))], {})
+        self.assertEqual(LatestLocation.objects.get(person=self.person).latitude, 51.6)
+
+    def test_row_inserted_concurrently_is_not_overwritten_by_an_older_fix(self):
+        # Another ingest stored a newer fix after this one found no row to lock
+        update_latest_locations([self.log(5, Decimal('51.6'))], {})
+        update_latest_locations([self.log(0, Decimal('51.5'))], {})
+        row = LatestLocation.objects.get(person=self.person)
+        self.assertEqual((row.latitude, row.timestamp), (51.6, self.now + timedelta(minutes=5)))
+
+    def test_row_inserted_concurrently_is_overwritten_by_a_newer_fix(self):
+        update_latest_locations([self.log(0, Decimal('51.5'))], {})
+        update_latest_locations([self.log(5, Decimal('51.6'))], {})
+        self.assertEqual(LatestLocation.objects.get(person=self.person).latitude, 51.6)
+
+
+class AlertDeduplicationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        open_alerts.clear()
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+
+    def test_repeat_of_open_alert_is_counted_on_it(self):
+        alert = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        self.assertIsNone(raise_alert(self.person.pk, 'battery_low', 'Battery at 14%.'))
+        self.assertEqual(Alert.objects.filter(person=self.person).count(), 1)
+        alert.refresh_from_db()
+        self.assertEqual(alert.occurrence_count, 2)
+        self.assertEqual(get_metrics()['alerts_suppressed'], 1)
+
+    def test_repeat_is_found_without_the_in_process_index(self):
+        raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        open_alerts.clear()
+        self.assertIsNone(raise_alert(self.person.pk, 'battery_low', 'Battery at 14%.'))
+        self.assertEqual(Alert.objects.get(person=self.person).occurrence_count, 2)
+
+    def test_resolved_alert_lets_a_new_one_be_raised(self):
+        first = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        self.assertEqual(resolve_alerts(self.person.pk, 'battery_low', 'Charged.'), 1)
+        second = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        self.assertIsNotNone(second)
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(Alert.objects.filter(person=self.person).count(), 2)
+
+    def test_alert_closed_elsewhere_is_not_reused(self):
+        # Closed through the API, by this or another process, while still in the index
+        first = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        Alert.objects.filter(pk=first.pk).update(status='resolved')
+        second = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        self.assertIsNotNone(second)
+        self.assertEqual(Alert.objects.get(pk=first.pk).occurrence_count, 1)
+
+    def test_repeat_after_the_window_raises_a_new_alert(self):
+        first = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        Alert.objects.filter(pk=first.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        open_alerts.clear()
+        self.assertIsNotNone(raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.'))
+        self.assertEqual(Alert.objects.filter(person=self.person, status='active').count(), 2)
+
+    def test_other_alert_types_are_not_folded(self):
+        raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        self.assertIsNotNone(raise_alert(self.person.pk, 'device_offline', 'No fix for 15 minutes.'))
+
+
+# Query counts cover the database only, not a database cache
+@override_settings(CACHES=LOCAL_CACHE, REALTIME_BACKEND='VTPS.realtime.MemoryBackend')
+class AlertPushTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        open_alerts.clear()
+        realtime.supervisors.clear()
+        realtime.MemoryBackend.outbox.clear()
+        self.supervisor = User.objects.create_user(username='supervisor', password='secret', role='supervisor')
+        self.person = VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street', assigned_supervisor=self.supervisor
+        )
+
+    def test_alert_save_is_pushed_without_loading_the_person(self):
+        realtime.supervisors.get(self.person.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        alert.status = 'acknowledged'
+        with self.captureOnCommitCallbacks() as callbacks:
+            alert.save()
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(realtime.MemoryBackend.outbox), 2)
+        topics, message = realtime.MemoryBackend.outbox[-1]
+        self.assertEqual(topics, [f'person:{self.person.pk}', f'supervisor:{self.supervisor.pk}'])
+        self.assertEqual(message['type'], 'alert')
+        self.assertEqual(message['data']['status'], 'acknowledged')
+
+    def test_reassigned_supervisor_is_picked_up(self):
+        realtime.supervisors.get(self.person.pk)
+        other = User.objects.create_user(username='other', password='secret', role='supervisor')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.person.assigned_supervisor = other
+            self.person.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            raise_alert(self.person.pk, 'battery_low', 'Battery at 15%.')
+        topics, _ = realtime.MemoryBackend.outbox[-1]
+        self.assertEqual(topics, [f'person:{self.person.pk}', f'supervisor:{other.pk}'])
+
+
+class CheckInSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        open_alerts.clear()
+        system_settings.clear()
+        self.person = VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street', phone='+447700900123'
+        )
+        self.now = timezone.now()
+        self.schedule = CheckInSchedule.objects.create(
+            person=self.person, name='Morning', reminder_minutes_before=5,
+            scheduled_time=timezone.localtime(self.now + timedelta(minutes=10)).time().replace(microsecond=0),
+        )
+        self.occurrence = next_occurrence(self.schedule, self.now)
+        self.deadline = self.occurrence + timedelta(minutes=settings.CHECKIN_GRACE_MINUTES)
+        self.scheduler = CheckInScheduler()
+        self.scheduler.load(self.now)
+
+    def test_reminder_is_sent_before_the_occurrence(self):
+        self.assertEqual(self.scheduler.run_due(self.occurrence - timedelta(minutes=6)), 0)
+        self.assertEqual(self.scheduler.run_due(self.occurrence - timedelta(minutes=5)), 1)
+        reminder = NotificationLog.objects.get(person=self.person)
+        self.assertEqual((reminder.notification_type, reminder.recipient), ('sms', '+447700900123'))
+
+    def test_missed_check_in_is_logged_and_alerted(self):
+        self.scheduler.run_due(self.deadline - timedelta(seconds=1))
+        self.assertFalse(CheckInLog.objects.exists())
+        self.scheduler.run_due(self.deadline)
+        log = CheckInLog.objects.get(schedule=self.schedule)
+        self.assertEqual((log.status, log.scheduled_time), ('missed', self.occurrence))
+        alert = Alert.objects.get(person=self.person)
+        self.assertEqual((alert.alert_type, alert.priority), ('check_in_missed', 'high'))
+        # The next day's occurrence is queued
+        self.assertEqual(self.scheduler.next_due, self.occurrence + timedelta(days=1) - timedelta(minutes=5))
+
+    def test_check_in_in_time_raises_nothing(self):
+        CheckInLog.objects.create(
+            schedule=self.schedule, person=self.person, scheduled_time=self.occurrence, actual_time=self.occurrence
+        )
+        self.scheduler.run_due(self.deadline)
+        self.assertEqual(CheckInLog.objects.count(), 1)
+        self.assertFalse(Alert.objects.exists())
+
+    def test_deactivated_schedule_is_dropped_on_sync(self):
+        self.schedule.is_active = False
+        self.schedule.save()
+        self.scheduler.sync(self.now)
+        self.assertEqual(self.scheduler.run_due(self.deadline), 0)
+        self.assertFalse(CheckInLog.objects.exists())
+        self.assertFalse(NotificationLog.objects.exists())
+
+
+class DeviceWatchdogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        open_alerts.clear()
+        system_settings.clear()
+        self.person = VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street', is_being_monitored=True
+        )
+        self.now = timezone.now()
+        self.latest = LatestLocation.objects.create(
+            person=self.person, latitude='51.5000000', longitude='-0.1200000', battery_level=80, timestamp=self.now
+        )
+        # Three missed updates at the default five minute interval
+        self.offline_at = self.now + timedelta(minutes=15)
+        self.watchdog = DeviceWatchdog()
+        self.watchdog.load(self.now)
+
+    def alerts(self):
+        return list(Alert.objects.filter(person=self.person).order_by('created_at').values_list('alert_type', 'status'))
+
+    def report(self, battery_level, minutes=1):
+        self.latest.timestamp += timedelta(minutes=minutes)
+        self.latest.battery_level = battery_level
+        self.latest.save()
+        self.watchdog.sync()
+
+    def test_silent_device_is_reported_offline_once(self):
+        self.assertEqual(self.watchdog.next_due, self.offline_at)
+        self.assertEqual(self.watchdog.run_due(self.offline_at - timedelta(seconds=1)), 0)
+        self.assertEqual(self.watchdog.run_due(self.offline_at), 1)
+        self.assertEqual(self.watchdog.run_due(self.offline_at + timedelta(hours=1)), 0)
+        self.assertEqual(self.alerts(), [('device_offline', 'active')])
+
+    def test_new_fix_resolves_offline(self):
+        self.watchdog.run_due(self.offline_at)
+        self.report(80, minutes=20)
+        self.assertEqual(self.alerts(), [('device_offline', 'resolved')])
+
+    def test_new_fix_postpones_offline(self):
+        self.report(80, minutes=10)
+        self.assertEqual(self.watchdog.run_due(self.offline_at), 0)
+        self.assertEqual(self.watchdog.run_due(self.offline_at + timedelta(minutes=10)), 1)
+
+    def test_changed_update_interval_applies_to_watched_devices(self):
+        SystemSettings.objects.create(location_update_interval_minutes=10)
+        self.assertEqual(self.watchdog.run_due(self.offline_at), 0)
+        self.assertEqual(self.watchdog.run_due(self.now + timedelta(minutes=30)), 1)
+
+    def test_unmonitored_person_is_not_reported(self):
+        VulnerablePerson.objects.filter(pk=self.person.pk).update(is_being_monitored=False)
+        self.assertEqual(self.watchdog.run_due(self.offline_at), 0)
+        self.assertEqual(self.alerts(), [])
+
+    def test_low_battery_is_raised_and_resolved_with_a_margin(self):
+        self.report(15)
+        self.assertEqual(self.alerts(), [('battery_low', 'active')])
+        self.report(12)
+        self.report(22)
+        self.assertEqual(self.alerts(), [('battery_low', 'active')])
+        self.report(25)
+        self.assertEqual(self.alerts(), [('battery_low', 'resolved')])
+
+
+@override_settings(NOTIFICATION_BACKENDS={channel: 'VTPS.notifications.MemoryBackend' for channel in ['sms', 'email', 'push', 'in_app']})
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        system_settings.clear()
+        MemoryBackend.outbox.clear()
+        self.addCleanup(setattr, MemoryBackend, 'error', None)
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.contact = EmergencyContact.objects.create(
+            person=self.person, name='Bob', relationship='son', phone='+447700900123', email='bob@example.com'
+        )
+        self.alert = Alert.objects.create(
+            person=self.person, alert_type='safe_zone_exit', priority='high', title='Exited Safe Zone', description='Left.'
+        )
+        self.dispatcher = NotificationDispatcher(workers=2)
+        self.addCleanup(self.dispatcher.close)
+
+    def test_alert_is_queued_once(self):
+        self.assertEqual(queue_alert_notifications(), 2)
+        self.assertEqual(queue_alert_notifications(), 0)
+        self.assertEqual(
+            sorted(NotificationLog.objects.values_list('notification_type', 'recipient')),
+            [('email', 'bob@example.com'), ('sms', '+447700900123')]
+        )
+        self.alert.refresh_from_db()
+        self.assertIsNotNone(self.alert.contacts_notified_at)
+
+    def test_alert_without_reachable_contacts_is_marked_handled(self):
+        SystemSettings.objects.create(enable_email_alerts=False)
+        EmergencyContact.objects.filter(pk=self.contact.pk).update(phone='')
+        self.assertEqual(queue_alert_notifications(), 0)
+        self.alert.refresh_from_db()
+        self.assertIsNotNone(self.alert.contacts_notified_at)
+
+    def test_low_priority_alerts_are_not_queued(self):
+        Alert.objects.filter(pk=self.alert.pk).update(priority='medium')
+        self.assertEqual(queue_alert_notifications(), 0)
+
+    def test_sent_notifications_are_recorded(self):
+        queue_alert_notifications()
+        self.assertEqual(self.dispatcher.dispatch(), (2, 0))
+        self.assertEqual(len(MemoryBackend.outbox), 2)
+        self.assertEqual(set(NotificationLog.objects.values_list('status', 'attempts')), {('sent', 1)})
+        self.alert.refresh_from_db()
+        self.assertTrue(self.alert.sms_sent and self.alert.email_sent)
+        self.assertEqual(self.dispatcher.dispatch(), (0, 0))
+
+    def test_failed_sends_back_off_and_give_up(self):
+        SystemSettings.objects.create(enable_email_alerts=False)
+        queue_alert_notifications()
+        MemoryBackend.error = 'Gateway unavailable'
+        now = timezone.now()
+        backoff = settings.NOTIFICATION_RETRY_BASE_SECONDS
+        for attempt in range(1, settings.NOTIFICATION_MAX_ATTEMPTS):
+            sent_at = timezone.now()
+            self.assertEqual(self.dispatcher.dispatch(now), (0, 1))
+            notification = NotificationLog.objects.get()
+            self.assertEqual((notification.status, notification.attempts), ('pending', attempt))
+            self.assertEqual(notification.error_message, 'Gateway unavailable')
+            # Backoff counts from when the send failed
+            self.assertAlmostEqual((notification.next_attempt_at - sent_at).total_seconds(), backoff, delta=5)
+            # Not retried before the backoff has passed
+            self.assertEqual(self.dispatcher.dispatch(notification.next_attempt_at - timedelta(seconds=1)), (0, 0))
+            now = notification.next_attempt_at
+            backoff *= 2
+        self.assertEqual(self.dispatcher.dispatch(now), (0, 1))
+        notification = NotificationLog.objects.get()
+        self.assertEqual((notification.status, notification.attempts), ('failed', settings.NOTIFICATION_MAX_ATTEMPTS))
+        self.assertEqual(self.dispatcher.dispatch(now + timedelta(days=1)), (0, 0))
+
+    def test_retry_after_failure_is_sent(self):
+        SystemSettings.objects.create(enable_email_alerts=False)
+        queue_alert_notifications()
+        MemoryBackend.error = 'Gateway unavailable'
+        self.dispatcher.dispatch()
+        MemoryBackend.error = None
+        later = timezone.now() + timedelta(seconds=settings.NOTIFICATION_RETRY_BASE_SECONDS + 1)
+        self.assertEqual(self.dispatcher.dispatch(later), (1, 0))
+        notification = NotificationLog.objects.get()
+        self.assertEqual((notification.status, notification.attempts, notification.error_message), ('sent', 2, None))
+
+
+class ScaledDecimalFieldTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+
+    def create_log(self, **values):
+        return LocationLog.objects.create(person=self.person, timestamp=timezone.now(), **values)
+
+    def test_values_round_trip_through_the_model(self):
+        log = self.create_log(
+            latitude=Decimal('-89.9999999'), longitude=Decimal('179.9999999'),
+            accuracy=Decimal('4.56'), altitude=Decimal('-12.30'), speed=None,
+        )
+        log = LocationLog.objects.get(pk=log.pk)
+        self.assertEqual(
+            (log.latitude, log.longitude, log.accuracy, log.altitude, log.speed),
+            (-89.9999999, 179.9999999, 4.56, -12.3, None)
+        )
+        self.assertTrue(LocationLog.objects.filter(latitude=Decimal('-89.9999999'), altitude__lt=0).exists())
+
+    def test_api_keeps_the_decimal_string_format(self):
+        log = self.create_log(latitude=Decimal('51.5000001'), longitude=Decimal('-0.12'), accuracy=Decimal('10'), speed=Decimal('0.5'))
+        data = self.client.get(f'/api/locations/{log.pk}/').data
+        self.assertEqual(
+            (data['latitude'], data['longitude'], data['accuracy'], data['speed'], data['altitude']),
+            ('51.50000010', '-0.12000000', '10.00', '0.50', None)
+        )
+
+    def test_api_input_round_trips(self):
+        self.person.gps_device_id = 'TRACKER-1'
+        self.person.save()
+        response = self.client.post('/api/locations/', {
+            'device_id': 'TRACKER-1', 'latitude': '-33.8688197', 'longitude': '151.2092955', 'accuracy': '7.25',
+            'timestamp': timezone.now().isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        data = self.client.get(f'/api/locations/?person={self.person.pk}').data['results'][0]
+        self.assertEqual((data['latitude'], data['longitude'], data['accuracy']), ('-33.86881970', '151.20929550', '7.25'))
+
+    def test_mapping_is_local_to_the_serializers_using_it(self):
+        self.assertNotIn(ScaledDecimalField, ModelSerializer.serializer_field_mapping)
+        zone = SafeZone.objects.create(
+            person=self.person, name='Home', center_latitude=Decimal('51.5'), center_longitude=Decimal('-0.12'), radius_meters=200
+        )
+        data = SafeZoneSerializer(SafeZone.objects.get(pk=zone.pk)).data
+        self.assertEqual((data['center_latitude'], data['center_longitude']), ('51.50000000', '-0.12000000'))
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.start = timezone.now() - timedelta(days=1)
+
+    def create_logs(self, minutes):
+        return LocationLog.objects.bulk_create(
+            LocationLog(person=self.person, latitude='51.5', longitude='-0.12', timestamp=self.start + timedelta(minutes=minute))
+            for minute in minutes
+        )
+
+    def ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_pages_are_stable_across_inserts(self):
+        logs = self.create_logs(range(12))
+        newest_first = [str(log.id) for log in reversed(logs)]
+        first = self.client.get('/api/locations/?page_size=5')
+        self.assertEqual(self.ids(first), newest_first[:5])
+        self.assertNotIn('count', first.data)
+        # Fixes arriving while the client pages through do not shift later pages
+        self.create_logs(range(100, 103))
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.ids(second), newest_first[5:10])
+        third = self.client.get(second.data['next'])
+        self.assertEqual(self.ids(third), newest_first[10:])
+        self.assertIsNone(third.data['next'])
+
+    def test_previous_page_returns_the_same_rows(self):
+        self.create_logs(range(8))
+        first = self.client.get('/api/locations/?page_size=4')
+        second = self.client.get(first.data['next'])
+        self.create_logs([100])
+        self.assertEqual(self.ids(self.client.get(second.data['previous'])), self.ids(first))
+
+
+class BulkUpdateTests(APITestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create_user(username='supervisor', password='secret', role='supervisor')
+        self.client.force_authenticate(self.supervisor)
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.alerts = [
+            Alert.objects.create(person=self.person, alert_type='battery_low', title='Low Battery', description='Low')
+            for _ in range(2)
+        ]
+
+    def test_alerts_are_resolved_and_unknown_ids_reported(self):
+        missing = uuid.uuid4()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/bulk-alert-update/', {
+                'alert_ids': [str(alert.pk) for alert in self.alerts] + [str(missing)], 'status': 'resolved',
+                'resolution_notes': 'Batteries replaced.',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            [(str(result['id']), result['status']) for result in response.data['results']],
+            [(str(self.alerts[0].pk), 'updated'), (str(self.alerts[1].pk), 'updated'), (str(missing), 'not_found')]
+        )
+        for alert in Alert.objects.all():
+            self.assertEqual((alert.status, alert.resolved_by, alert.resolution_notes), ('resolved', self.supervisor, 'Batteries replaced.'))
+            self.assertIsNotNone(alert.resolved_at)
+
+    def test_closure_details_of_closed_alerts_are_kept(self):
+        earlier = timezone.now() - timedelta(days=1)
+        admin = User.objects.create_user(username='admin', password='secret', role='admin')
+        Alert.objects.filter(pk=self.alerts[0].pk).update(status='resolved', resolved_by=admin, resolved_at=earlier)
+        self.client.post('/api/bulk-alert-update/', {
+            'alert_ids': [str(alert.pk) for alert in self.alerts], 'status': 'dismissed',
+        }, format='json')
+        closed, fresh = (Alert.objects.get(pk=alert.pk) for alert in self.alerts)
+        self.assertEqual((closed.status, closed.resolved_by, closed.resolved_at), ('dismissed', admin, earlier))
+        self.assertEqual(fresh.resolved_by, self.supervisor)
+
+    def test_reopening_clears_resolution(self):
+        self.client.post('/api/bulk-alert-update/', {'alert_ids': [str(self.alerts[0].pk)], 'status': 'resolved'}, format='json')
+        self.client.post('/api/bulk-alert-update/', {'alert_ids': [str(self.alerts[0].pk)], 'status': 'investigating'}, format='json')
+        alert = Alert.objects.get(pk=self.alerts[0].pk)
+        self.assertEqual((alert.status, alert.resolved_by, alert.resolved_at), ('investigating', None, None))
+
+    def test_people_update_reports_not_found(self):
+        missing = uuid.uuid4()
+        response = self.client.post('/api/bulk-person-update/', {
+            'person_ids': [str(self.person.pk), str(missing)], 'risk_level': 'high',
+        }, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']], ['updated', 'not_found'])
+        self.assertEqual(VulnerablePerson.objects.get(pk=self.person.pk).risk_level, 'high')
+
+    def test_operators_cannot_bulk_update(self):
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        response = self.client.post('/api/bulk-alert-update/', {
+            'alert_ids': [str(self.alerts[0].pk)], 'status': 'resolved',
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ConditionalListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.person = VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street', gps_device_id='TRACKER-1'
+        )
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/people/')
+        self.assertEqual(response.status_code, 200)
+        again = self.client.get('/api/people/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_cached_page_matches_the_rendered_one(self):
+        first = self.client.get('/api/people/')
+        second = self.client.get('/api/people/')
+        self.assertEqual((second['ETag'], second.content), (first['ETag'], first.content))
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get('/api/people/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            EmergencyContact.objects.create(person=self.person, name='Bob', relationship='son', phone='+447700900123')
+        response = self.client.get('/api/people/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['emergency_contacts_count'], 1)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/locations/', {
+                'device_id': 'TRACKER-1', 'latitude': '51.5000000', 'longitude': '-0.1200000',
+                'timestamp': timezone.now().isoformat(),
+            }, format='json')
+        response = self.client.get('/api/people/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data['results'][0]['last_location'])
+
+    def test_query_string_has_its_own_etag(self):
+        self.assertNotEqual(self.client.get('/api/people/')['ETag'], self.client.get('/api/people/?risk_level=high')['ETag'])
+
+    def test_browsable_api_is_not_cached(self):
+        self.assertNotIn('ETag', self.client.get('/api/safe-zones/', HTTP_ACCEPT='text/html'))
+
+
+class TrackBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        size = timedelta(minutes=settings.TRACK_BUCKET_MINUTES)
+        self.starts = [bucket_start(timezone.now()) - size * hours for hours in range(6, 1, -1)]
+        self.logs = LocationLog.objects.bulk_create(
+            LocationLog(
+                person=self.person, latitude=51.5 + minute / 10000, longitude=-0.12 + (minute % 7) / 10000,
+                timestamp=start + timedelta(minutes=minute),
+            )
+            for start in self.starts for minute in range(0, settings.TRACK_BUCKET_MINUTES, 5)
+        )
+
+    def location_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries if 'VTPS_locationlog' in query['sql']]
+
+    def test_only_missing_buckets_are_read(self):
+        expected = ranked_buckets(self.person.pk, self.starts, timezone.now())
+        # Late uploads into the first and last bucket drop just those two from the cache
+        forget_buckets([log for log in self.logs if log.timestamp < self.starts[1] or log.timestamp >= self.starts[-1]])
+        with CaptureQueriesContext(connection) as queries:
+            buckets = ranked_buckets(self.person.pk, self.starts, timezone.now())
+        self.assertEqual(buckets, expected)
+        self.assertEqual(len(self.location_queries(queries)), 2)
+
+    def test_cached_buckets_are_not_read(self):
+        ranked_buckets(self.person.pk, self.starts, timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            ranked_buckets(self.person.pk, self.starts, timezone.now())
+        self.assertEqual(self.location_queries(queries), [])
+
+    def test_track_endpoint_rejects_bad_datetimes(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        url = f'/api/people/{self.person.pk}/track/'
+        for params in [{'to': '2024-13-01T00:00:00'}, {'from': 'yesterday'}, {'from': '2024-02-30T00:00:00'}]:
+            self.assertEqual(client.get(url, params).status_code, 400, params)
+        response = client.get(url, {'from': self.starts[0].isoformat(), 'to': timezone.now().isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['source_count'], len(self.logs))
+
+
+METERS_PER_DEGREE_LATITUDE = 111195
+
+
+@override_settings(SPATIAL_SYNC_SECONDS=0)
+class SpatialIndexTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        positions.clear()
+        safe_zones.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.now = timezone.now()
+        self.near, self.middle, self.far = [self.place(name, metres) for name, metres in [('Near', 100), ('Middle', 500), ('Far', 3000)]]
+
+    def place(self, name, metres_north, **fields):
+        person = VulnerablePerson.objects.create(first_name=name, last_name='Test', age=80, address='1 Test Street', **fields)
+        LatestLocation.objects.create(
+            person=person, latitude=51.5 + metres_north / METERS_PER_DEGREE_LATITUDE, longitude=-0.12,
+            timestamp=self.now - timedelta(hours=1),
+        )
+        return person
+
+    def nearby(self, lat=51.5, **params):
+        response = self.client.get('/api/people/nearby/', {'lat': lat, 'lng': -0.12, **params})
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.data['results']], response.data
+
+    def test_nearby_filters_by_radius_nearest_first(self):
+        ids, data = self.nearby(radius=1000)
+        self.assertEqual(ids, [str(self.near.pk), str(self.middle.pk)])
+        self.assertEqual(data['count'], 2)
+        self.assertAlmostEqual(data['results'][0]['distance_meters'], 100, delta=1)
+        self.assertAlmostEqual(data['results'][1]['distance_meters'], 500, delta=1)
+        ids, _ = self.nearby(radius=5000)
+        self.assertEqual(ids, [str(self.near.pk), str(self.middle.pk), str(self.far.pk)])
+
+    def test_fix_moves_a_person_between_cells(self):
+        self.nearby()
+        self.far.gps_device_id = 'TRACKER-1'
+        self.far.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/locations/batch/', [{
+                'device_id': 'TRACKER-1', 'latitude': '51.6000000', 'longitude': '-0.1200000',
+                'timestamp': self.now.isoformat(),
+            }], format='json')
+        self.assertEqual(response.data['accepted'], 1)
+        self.assertNotIn(str(self.far.pk), self.nearby(radius=5000)[0])
+        self.assertEqual(self.nearby(lat=51.6, radius=100)[0], [str(self.far.pk)])
+
+    def test_status_changes_and_deletions_are_picked_up(self):
+        self.nearby()
+        self.middle.current_status = 'emergency'
+        self.middle.save()
+        self.near.delete()
+        people = {person_id: status for *_, status, _, person_id in positions.map_clusters(22, 51, -1, 52, 1)}
+        self.assertEqual(people, {self.middle.pk: 'emergency', self.far.pk: 'safe'})
+
+    def test_only_recently_updated_people_are_reread(self):
+        LatestLocation.objects.update(updated_at=self.now - timedelta(days=1))
+        self.nearby()
+        VulnerablePerson.objects.filter(pk=self.far.pk).update(updated_at=self.now - timedelta(days=1), current_status='warning')
+        self.middle.current_status = 'emergency'
+        self.middle.save()
+        people = {person_id: status for *_, status, _, person_id in positions.map_clusters(22, 51, -1, 52, 1)}
+        # The far person's change carries an old updated_at, so it is not looked for
+        self.assertEqual(people[self.middle.pk], 'emergency')
+        self.assertEqual(people[self.far.pk], 'safe')
+
+    def test_nearby_rejects_bad_parameters(self):
+        for params in [{}, {'lat': 51.5}, {'lat': 91, 'lng': 0}, {'lat': 'north', 'lng': 0},
+                       {'lat': 51.5, 'lng': 0, 'radius': 0}, {'lat': 51.5, 'lng': 0, 'radius': 'wide'},
+                       {'lat': 51.5, 'lng': 0, 'radius': settings.NEARBY_MAX_RADIUS_METERS + 1}]:
+            self.assertEqual(self.client.get('/api/people/nearby/', params).status_code, 400, params)
+
+    def test_containing_follows_zone_changes(self):
+        home = SafeZone.objects.create(
+            person=self.near, name='Home', center_latitude='51.5000000', center_longitude='-0.1200000', radius_meters=200
+        )
+        point = {'lat': 51.5 + 150 / METERS_PER_DEGREE_LATITUDE, 'lng': -0.12}
+        response = self.client.get('/api/safe-zones/containing/', point)
+        self.assertEqual([zone['id'] for zone in response.data], [str(home.pk)])
+        park = SafeZone.objects.create(
+            person=self.middle, name='Park', center_latitude='51.5020000', center_longitude='-0.1200000', radius_meters=100
+        )
+        response = self.client.get('/api/safe-zones/containing/', point)
+        self.assertEqual({zone['id'] for zone in response.data}, {str(home.pk), str(park.pk)})
+        response = self.client.get('/api/safe-zones/containing/', {**point, 'person': self.middle.pk})
+        self.assertEqual([zone['id'] for zone in response.data], [str(park.pk)])
+        home.is_active = False
+        home.save()
+        response = self.client.get('/api/safe-zones/containing/', point)
+        self.assertEqual([zone['id'] for zone in response.data], [str(park.pk)])
+
+    def test_containing_rejects_bad_points(self):
+        for params in [{}, {'lat': 51.5}, {'lat': 51.5, 'lng': 181}, {'lat': 'x', 'lng': 0}]:
+            self.assertEqual(self.client.get('/api/safe-zones/containing/', params).status_code, 400, params)
+
+
+@override_settings(SPATIAL_SYNC_SECONDS=0)
+class MapClusterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        positions.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        self.now = timezone.now()
+        self.people = [
+            self.place('Ada', 51.50, -0.12),
+            self.place('Bob', 51.52, -0.10, current_status='emergency'),
+            self.place('Cy', 51.54, -0.14, risk_level='high', gps_device_id='TRACKER-1'),
+        ]
+
+    def place(self, name, lat, lng, **fields):
+        person = VulnerablePerson.objects.create(first_name=name, last_name='Test', age=80, address='1 Test Street', **fields)
+        LatestLocation.objects.create(person=person, latitude=lat, longitude=lng, timestamp=self.now - timedelta(hours=3))
+        return person
+
+    def clusters(self, zoom, bbox='-10,40,10,60'):
+        response = self.client.get('/api/map/clusters/', {'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_low_zoom_counts_centroid_and_worst_levels(self):
+        data = self.clusters(4)
+        self.assertEqual(data['count'], 3)
+        [cluster] = data['clusters']
+        self.assertEqual(cluster['count'], 3)
+        self.assertAlmostEqual(cluster['latitude'], 51.52, places=6)
+        self.assertAlmostEqual(cluster['longitude'], -0.12, places=6)
+        self.assertEqual((cluster['status'], cluster['risk_level'], cluster['person']), ('emergency', 'high', None))
+
+    def test_moving_out_of_a_cell_updates_the_counts(self):
+        self.clusters(4)
+        finest = positions.clusters.levels[settings.MAP_CLUSTER_MAX_ZOOM]
+        cells_before = set(finest)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/locations/batch/', [{
+                'device_id': 'TRACKER-1', 'latitude': '48.8500000', 'longitude': '2.3500000', 'timestamp': self.now.isoformat(),
+            }], format='json')
+        self.assertEqual(response.data['accepted'], 1)
+        [home, paris] = sorted(self.clusters(4)['clusters'], key=lambda cluster: -cluster['latitude'])
+        self.assertEqual((home['count'], home['status'], home['risk_level']), (2, 'emergency', 'low'))
+        self.assertEqual((paris['count'], paris['risk_level']), (1, 'high'))
+        self.assertEqual((paris['latitude'], paris['longitude']), (48.85, 2.35))
+        # Cy was alone in their finest cell, which is dropped rather than left at zero
+        self.assertEqual(len(cells_before - set(finest)), 1)
+        self.assertEqual(len(finest), 3)
+
+    def test_high_zoom_returns_each_person(self):
+        data = self.clusters(settings.MAP_CLUSTER_MAX_ZOOM + 1, bbox='-0.13,51.49,-0.09,51.53')
+        self.assertEqual(
+            {(cluster['person'], cluster['count'], cluster['status']) for cluster in data['clusters']},
+            {(self.people[0].pk, 1, 'safe'), (self.people[1].pk, 1, 'emergency')}
+        )
+
+    def test_bbox_and_zoom_are_validated(self):
+        for params in [{}, {'zoom': 4}, {'bbox': '-10,40,10,60'}, {'bbox': '-10,40,10', 'zoom': 4},
+                       {'bbox': '-10,60,10,40', 'zoom': 4}, {'bbox': '10,40,-10,60', 'zoom': 4},
+                       {'bbox': '-10,40,10,95', 'zoom': 4}, {'bbox': '-10,40,10,60', 'zoom': 23},
+                       {'bbox': '-10,40,10,60', 'zoom': 'far'}]:
+            self.assertEqual(self.client.get('/api/map/clusters/', params).status_code, 400, params)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.today = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+
+    def add_fixes(self, day_offset, count):
+        start = self.today + timedelta(days=day_offset)
+        return LocationLog.objects.bulk_create(
+            LocationLog(person=self.person, latitude=51.5, longitude=-0.12, timestamp=start + timedelta(minutes=10 * i))
+            for i in range(count)
+        )
+
+    def test_cutoff_is_the_start_of_the_oldest_retained_day(self):
+        now = timezone.make_aware(datetime(2026, 3, 10, 15, 30))
+        self.assertEqual(retention_cutoff(now, days=7), timezone.make_aware(datetime(2026, 3, 3)))
+        SystemSettings.objects.create(data_retention_days=30)
+        self.assertEqual(retention_cutoff(now), timezone.make_aware(datetime(2026, 2, 8)))
+
+    def test_expired_days_run_from_the_oldest_fix_to_the_cutoff(self):
+        self.assertEqual(list(expired_days(self.today)), [])
+        self.add_fixes(-3, 1)
+        cutoff = self.today - timedelta(hours=12)
+        self.assertEqual(list(expired_days(cutoff)), [
+            (self.today - timedelta(days=3), self.today - timedelta(days=2)),
+            (self.today - timedelta(days=2), self.today - timedelta(days=1)),
+            (self.today - timedelta(days=1), cutoff),
+        ])
+
+    def test_batches_stop_at_the_end_of_the_range(self):
+        self.add_fixes(-2, 5)
+        kept = self.add_fixes(-1, 5)
+        start = self.today - timedelta(days=2)
+        self.assertEqual(purge_range(start, start + timedelta(days=1), batch_size=2), 5)
+        self.assertEqual(set(LocationLog.objects.values_list('pk', flat=True)), {log.pk for log in kept})
+
+    def test_command_keeps_the_retained_days(self):
+        self.add_fixes(-10, 3)
+        self.add_fixes(-9, 3)
+        kept = self.add_fixes(-2, 3) + self.add_fixes(0, 1)
+        out = StringIO()
+        call_command('purge_locations', days=5, batch_size=2, stdout=out)
+        self.assertIn('Purged 6 rows', out.getvalue())
+        self.assertEqual(set(LocationLog.objects.values_list('pk', flat=True)), {log.pk for log in kept})
+
+    def test_purged_fixes_leave_the_track_cache(self):
+        self.add_fixes(-3, 6)
+        start = self.today - timedelta(days=3)
+        bucket = bucket_start(start)
+        self.assertEqual(ranked_buckets(self.person.pk, [bucket], timezone.now())[bucket][0], 6)
+        purge_range(start, start + timedelta(days=1))
+        self.assertEqual(ranked_buckets(self.person.pk, [bucket], timezone.now())[bucket], (0, []))
+
+
+class ActivityTrackingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='operator', password='secret', role='operator')
+        self.other = User.objects.create_user(username='supervisor', password='secret', role='supervisor')
+        self.tracker = ActivityTracker()
+        self.now = timezone.now()
+
+    def last_activity(self, user):
+        return User.objects.values_list('last_activity', flat=True).get(pk=user.pk)
+
+    def test_buffer_keeps_the_newest_time_per_user(self):
+        for minutes in [1, 3, 2]:
+            self.tracker.touch(self.user.pk, self.now + timedelta(minutes=minutes))
+        self.tracker.touch(self.other.pk, self.now)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(), 2)
+        self.assertEqual(self.last_activity(self.user), self.now + timedelta(minutes=3))
+        self.assertEqual(self.last_activity(self.other), self.now)
+        self.assertEqual(self.tracker.flush(), 0)
+
+    def test_older_time_does_not_overwrite_a_newer_one(self):
+        # As stored by another process since this one buffered its time
+        User.objects.filter(pk=self.user.pk).update(last_activity=self.now + timedelta(minutes=5))
+        self.tracker.touch(self.user.pk, self.now)
+        self.tracker.flush()
+        self.assertEqual(self.last_activity(self.user), self.now + timedelta(minutes=5))
+
+    def test_failed_flush_keeps_the_times_for_the_next_one(self):
+        self.tracker.touch(self.user.pk, self.now)
+        with mock.patch.object(User.objects, 'bulk_update', side_effect=DatabaseError('locked')):
+            with self.assertLogs('VTPS.activity', 'ERROR'):
+                self.assertEqual(self.tracker.flush(), 0)
+        self.tracker.touch(self.user.pk, self.now - timedelta(minutes=1))
+        self.assertEqual(self.tracker.flush(), 1)
+        self.assertEqual(self.last_activity(self.user), self.now)
+
+    @override_settings(ACTIVITY_FLUSH_SECONDS=3600)
+    def test_requests_are_buffered_until_flushed(self):
+        activity.flush()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/dashboard-stats/').status_code, 200)
+        before = self.last_activity(self.user)
+        self.assertEqual(activity.flush(), 1)
+        self.assertNotEqual(self.last_activity(self.user), before)
+
+    def test_login_and_logout_write_only_their_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/login/', {'username': 'operator', 'password': 'secret'}, format='json')
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {response.data["token"]}')
+            self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "VTPS_user"')]
+        written = [re.findall(r'"(\w+)" =', sql.split(' WHERE ')[0]) for sql in updates]
+        self.assertEqual(written, [['last_login'], ['is_active_session', 'last_activity'], ['is_active_session']])
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active_session)
+
+
+class WebSocketStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tokens.clear()
+        self.operator = User.objects.create_user(username='operator', password='secret', role='operator')
+        self.supervisor = User.objects.create_user(username='supervisor', password='secret', role='supervisor')
+        self.person = VulnerablePerson.objects.create(first_name='Ada', last_name='Test', age=80, address='1 Test Street')
+        self.tokens = {user: Token.objects.create(user=user).key for user in [self.operator, self.supervisor]}
+
+    async def connect(self, user=None, path=realtime.WEBSOCKET_PATH):
+        query = f'token={self.tokens[user]}' if user else ''
+        communicator = ApplicationCommunicator(
+            realtime.websocket_application, {'type': 'websocket', 'path': path, 'query_string': query.encode()}
+        )
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(1)
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(1)
+
+    async def request(self, communicator, **request):
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(request)})
+        return await self.receive(communicator)
+
+    async def receive(self, communicator):
+        return json.loads((await communicator.receive_output(1))['text'])
+
+    def publish_fix(self, supervisor_id=None):
+        log = LocationLog(
+            person_id=self.person.pk, latitude=51.5, longitude=-0.12, battery_level=80, timestamp=timezone.now()
+        )
+        realtime.publish_locations([log], {self.person.pk: DeviceOwner(self.person.pk, supervisor_id, 'safe')})
+
+    async def test_connection_without_a_valid_token_is_closed(self):
+        _, event = await self.connect()
+        self.assertEqual(event, {'type': 'websocket.close', 'code': 4401})
+        communicator = ApplicationCommunicator(realtime.websocket_application, {
+            'type': 'websocket', 'path': realtime.WEBSOCKET_PATH, 'query_string': b'token=made-up',
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(1), {'type': 'websocket.close', 'code': 4401})
+
+    async def test_other_paths_are_closed(self):
+        _, event = await self.connect(self.operator, path='/ws/other/')
+        self.assertEqual(event, {'type': 'websocket.close', 'code': 4404})
+
+    async def test_subscribed_client_receives_fixes_until_it_unsubscribes(self):
+        communicator, event = await self.connect(self.operator)
+        self.assertEqual(event, {'type': 'websocket.accept'})
+        topic = f'person:{self.person.pk}'
+        self.assertEqual(await self.request(communicator, action='subscribe', person=str(self.person.pk)),
+                         {'type': 'subscribed', 'data': topic})
+        self.publish_fix()
+        message = await self.receive(communicator)
+        self.assertEqual(message['type'], 'location')
+        self.assertEqual((message['data']['person_id'], message['data']['battery_level']), (str(self.person.pk), 80))
+        self.assertEqual(await self.request(communicator, action='unsubscribe', person=str(self.person.pk)),
+                         {'type': 'unsubscribed', 'data': topic})
+        self.publish_fix()
+        self.assertTrue(await communicator.receive_nothing(0.1))
+        self.assertEqual(await self.request(communicator, action='subscribe'), {'type': 'error', 'data': 'Invalid request.'})
+        await self.disconnect(communicator)
+        self.assertNotIn(topic, realtime.broker._topics)
+
+    async def test_supervisor_is_subscribed_to_their_people(self):
+        communicator, event = await self.connect(self.supervisor)
+        self.assertEqual(event, {'type': 'websocket.accept'})
+        self.publish_fix(supervisor_id=self.supervisor.pk)
+        self.assertEqual((await self.receive(communicator))['type'], 'location')
+        operator, _ = await self.connect(self.operator)
+        self.publish_fix(supervisor_id=self.supervisor.pk)
+        self.assertTrue(await operator.receive_nothing(0.1))
+        await self.disconnect(operator)
+        await self.disconnect(communicator)
+        self.assertNotIn(f'supervisor:{self.supervisor.pk}', realtime.broker._topics)
+
+
+# Query counts cover the database only, not a database cache
+@override_settings(CACHES=LOCAL_CACHE)
+class DashboardStatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='secret', role='operator'))
+        for status_value, monitored in [('safe', True), ('safe', False), ('warning', True), ('emergency', True)]:
+            self.add_person(status_value, monitored)
+        person = VulnerablePerson.objects.first()
+        for alert_status in ['active', 'active', 'resolved']:
+            Alert.objects.create(person=person, alert_type='emergency_button', title='Emergency', description='-', status=alert_status)
+
+    def add_person(self, status_value='safe', monitored=True):
+        return VulnerablePerson.objects.create(
+            first_name='Ada', last_name='Test', age=80, address='1 Test Street',
+            current_status=status_value, is_being_monitored=monitored,
+        )
+
+    def test_counts(self):
+        data = self.client.get('/api/dashboard-stats/').data
+        self.assertEqual(
+            {key: data[key] for key in ['total_people', 'safe_count', 'warning_count', 'emergency_count', 'active_alerts', 'total_tracked']},
+            {'total_people': 4, 'safe_count': 2, 'warning_count': 1, 'emergency_count': 1, 'active_alerts': 2, 'total_tracked': 3}
+        )
+        self.assertEqual(len(data['recent_alerts']), 3)
+        self.assertEqual(len(data['people_status']), 4)
+
+    def test_query_count_does_not_grow_with_the_data(self):
+        with CaptureQueriesContext(connection) as small:
+            compute_dashboard_stats()
+        for _ in range(12):
+            person = self.add_person()
+            Alert.objects.create(person=person, alert_type='emergency_button', title='Emergency', description='-')
+            EmergencyContact.objects.create(person=person, name='Bo', relationship='son', phone='1')
+        with CaptureQueriesContext(connection) as large:
+            compute_dashboard_stats()
+        self.assertEqual(len(large), len(small))
+
+    def test_saves_drop_the_cached_payload(self):
+        self.assertEqual(self.client.get('/api/dashboard-stats/').data['total_people'], 4)
+        self.assertIsNotNone(cache.get(DASHBOARD_STATS_CACHE_KEY))
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard-stats/')
+        self.add_person('emergency')
+        self.assertIsNone(cache.get(DASHBOARD_STATS_CACHE_KEY))
+        self.assertEqual(self.client.get('/api/dashboard-stats/').data['emergency_count'], 2)
+        alert = Alert.objects.filter(status='active').first()
+        alert.status = 'resolved'
+        alert.save()
+        self.assertEqual(self.client.get('/api/dashboard-stats/').data['active_alerts'], 1)
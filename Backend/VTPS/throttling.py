@@ -0,0 +1,23 @@
+"""
+Request throttles.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class DeviceRateThrottle(SimpleRateThrottle):
+    """
+    Limits each device credential to the ``device`` rate.
+
+    The request history is kept in process memory rather than the default
+    cache, so a device post costs no cache round trip (a table read and write
+    with the database cache). The limit therefore applies per worker process.
+    """
+    scope = 'device'
+    cache = LocMemCache('vtps-device-throttle', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+
+    def get_cache_key(self, request, view):
+        credential_id = getattr(request.user, 'credential_id', None)
+        if credential_id is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': credential_id}
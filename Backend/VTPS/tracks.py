@@ -0,0 +1,173 @@
+"""
+Simplified location tracks for map rendering.
+
+A track is cut into fixed time buckets (``TRACK_BUCKET_MINUTES``). For each
+bucket the fixes are ranked with Douglas-Peucker: a point's importance is its
+distance in metres from the simplified line at the moment it was added, and
+points closer than ``TRACK_MIN_TOLERANCE_METERS`` are dropped. Ranked buckets
+are cached, so a week-long track recomputes only the current bucket, and any
+``max_points`` is served from the same cache by keeping the most important
+points across the requested range.
+"""
+import heapq
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import LocationLog
+
+METERS_PER_DEGREE = 111319.49
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    if length:
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+        ax, ay = ax + t * dx, ay + t * dy
+    return math.hypot(px - ax, py - ay)
+
+
+def rank_points(points, tolerance, limit):
+    """
+    Douglas-Peucker ranking of ``points`` (``(timestamp, lat, lng)`` tuples in
+    time order).
+
+    Segments are split in order of decreasing deviation until ``limit``
+    points are kept or no point deviates more than ``tolerance`` metres.
+    Returns ``(timestamp, lat, lng, importance)`` in time order; the end
+    points rank as infinitely important.
+    """
+    if len(points) <= 2:
+        return [(*point, math.inf) for point in points]
+    # Equirectangular projection to metres, fine at the scale of one track
+    scale_x = METERS_PER_DEGREE * math.cos(math.radians(points[0][1]))
+    xs = [lng * scale_x for _, _, lng in points]
+    ys = [lat * METERS_PER_DEGREE for _, lat, _ in points]
+
+    def farthest(first, last):
+        ax, ay, bx, by = xs[first], ys[first], xs[last], ys[last]
+        best, best_index = -1.0, None
+        for index in range(first + 1, last):
+            distance = _segment_distance(xs[index], ys[index], ax, ay, bx, by)
+            if distance > best:
+                best, best_index = distance, index
+        return best, best_index
+
+    ranks = {0: math.inf, len(points) - 1: math.inf}
+    segments = []
+
+    def split(first, last):
+        if last - first > 1:
+            distance, index = farthest(first, last)
+            if distance > tolerance:
+                heapq.heappush(segments, (-distance, index, first, last))
+
+    split(0, len(points) - 1)
+    while segments and len(ranks) < limit:
+        distance, index, first, last = heapq.heappop(segments)
+        ranks[index] = -distance
+        split(first, index)
+        split(index, last)
+    return [(*points[index], ranks[index]) for index in sorted(ranks)]
+
+
+# Buckets
+def bucket_start(when):
+    size = timedelta(minutes=settings.TRACK_BUCKET_MINUTES)
+    return EPOCH + (when - EPOCH) // size * size
+
+
+def _bucket_key(person_id, start):
+    return f'vtps:track:{person_id}:{int(start.timestamp())}'
+
+
+def ranked_buckets(person_id, starts, now):
+    """
+    Map each bucket start to ``(source_count, ranked points)``.
+
+    Closed buckets come from the cache where possible; the rest are read with
+    one query per run of adjacent buckets and ranked, and the closed ones
+    cached.
+    """
+    size = timedelta(minutes=settings.TRACK_BUCKET_MINUTES)
+    keys = {start: _bucket_key(person_id, start) for start in starts}
+    cached = cache.get_many([keys[start] for start in starts if start + size <= now])
+    buckets = {start: cached[keys[start]] for start in starts if keys[start] in cached}
+    missing = [start for start in starts if start not in buckets]
+    if not missing:
+        return buckets
+
+    points = {start: [] for start in missing}
+    # One query per run of adjacent missing buckets, so cached buckets between runs are not read again
+    runs = []
+    for start in missing:
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = start + size
+        else:
+            runs.append([start, start + size])
+    for run_start, run_end in runs:
+        fixes = (
+            LocationLog.objects.filter(person_id=person_id, timestamp__gte=run_start, timestamp__lt=run_end)
+            .order_by('timestamp')
+            .values_list('timestamp', 'latitude', 'longitude')
+        )
+        for timestamp, lat, lng in fixes.iterator(chunk_size=10000):
+            points[bucket_start(timestamp)].append((timestamp, float(lat), float(lng)))
+    closed = {}
+    for start, bucket in points.items():
+        buckets[start] = (len(bucket), rank_points(
+            bucket, settings.TRACK_MIN_TOLERANCE_METERS, settings.TRACK_BUCKET_MAX_POINTS
+        ))
+        if start + size <= now:
+            closed[keys[start]] = buckets[start]
+    cache.set_many(closed, settings.TRACK_CACHE_SECONDS)
+    return buckets
+
+
+def forget_buckets(logs, now=None):
+    """Drop cached buckets that late-uploaded ``logs`` fall into"""
+    forget_fixes(((log.person_id, log.timestamp) for log in logs), now)
+
+
+def forget_fixes(fixes, now=None):
+    """Drop cached buckets holding any of ``fixes``, ``(person_id, timestamp)`` pairs added or deleted"""
+    current = bucket_start(now or timezone.now())
+    keys = {_bucket_key(person_id, bucket_start(timestamp)) for person_id, timestamp in fixes if timestamp < current}
+    if keys:
+        cache.delete_many(keys)
+
+
+def simplified_track(person_id, start, end, max_points):
+    """
+    The person's track between ``start`` and ``end`` in at most
+    ``max_points`` points.
+
+    Returns ``(source_count, points)`` where points are
+    ``(timestamp, lat, lng)`` in time order and ``source_count`` counts the
+    stored fixes of the buckets read.
+    """
+    size = timedelta(minutes=settings.TRACK_BUCKET_MINUTES)
+    starts = []
+    bucket = bucket_start(start)
+    while bucket < end:
+        starts.append(bucket)
+        bucket += size
+    buckets = ranked_buckets(person_id, starts, timezone.now())
+    candidates = []
+    source_count = 0
+    for bucket in starts:
+        count, ranked = buckets[bucket]
+        source_count += count
+        candidates.extend(point for point in ranked if start <= point[0] < end)
+    if not candidates:
+        return source_count, []
+    # The ends of the range are always drawn
+    candidates[0] = (*candidates[0][:3], math.inf)
+    candidates[-1] = (*candidates[-1][:3], math.inf)
+    if len(candidates) > max_points:
+        candidates = heapq.nlargest(max_points, candidates, key=lambda point: point[3])
+        candidates.sort(key=lambda point: point[0])
+    return source_count, [point[:3] for point in candidates]
@@ -2,8 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, VulnerablePersonViewSet, EmergencyContactViewSet, LocationLogViewSet, AlertViewSet,
-    SafeZoneViewSet, CheckInScheduleViewSet, CheckInLogViewSet, NotificationLogViewSet, SystemSettingsViewSet,
-    LoginView, LogoutView, dashboard_stats, bulk_alert_update, bulk_person_update
+    SafeZoneViewSet, CheckInScheduleViewSet, CheckInLogViewSet, NotificationLogViewSet, DeviceCredentialViewSet,
+    SystemSettingsViewSet, LoginView, LogoutView, dashboard_stats, metrics, map_clusters, device_locations,
+    bulk_alert_update, bulk_person_update
 )
 
 router = DefaultRouter()
@@ -16,12 +17,16 @@ router.register(r'safe-zones', SafeZoneViewSet)
 router.register(r'checkin-schedules', CheckInScheduleViewSet)
 router.register(r'checkin-logs', CheckInLogViewSet)
 router.register(r'notifications', NotificationLogViewSet)
+router.register(r'device-credentials', DeviceCredentialViewSet)
 router.register(r'system-settings', SystemSettingsViewSet)
 
 urlpatterns = [
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('dashboard-stats/', dashboard_stats, name='dashboard-stats'),
+    path('metrics/', metrics, name='metrics'),
+    path('map/clusters/', map_clusters, name='map-clusters'),
+    path('devices/locations/', device_locations, name='device-locations'),
     path('bulk-alert-update/', bulk_alert_update, name='bulk-alert-update'),
     path('bulk-person-update/', bulk_person_update, name='bulk-person-update'),
     path('', include(router.urls)),
@@ -0,0 +1,97 @@
+"""
+Version counters kept in the shared cache.
+
+In-process caches (zone indexes, settings, rendered pages, ...) stamp what
+they hold with a named version and drop it when the version moves, which
+lets a save in one worker invalidate the copies held by every other worker.
+That needs a cache backend every worker reaches (see ``CACHES``); with a
+process-local one they stay in the process that made them, which the
+system checks report (``VTPS.W001``, or ``VTPS.E001`` without DEBUG).
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Versions bumped by this process, so local changes are seen immediately
+_local_versions = {}
+
+
+def cache_is_shared():
+    """True when the default cache is shared by every worker process"""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def _cache_key(name):
+    return f'vtps:version:{name}'
+
+
+def get_version(name):
+    """Return the current version of ``name``, initialising it if unset"""
+    version = cache.get(_cache_key(name))
+    if version is None:
+        cache.add(_cache_key(name), time.time_ns(), None)
+        version = cache.get(_cache_key(name))
+    return version
+
+
+def get_versions(names):
+    """Current versions of ``names``, in order, with one cache round trip when all are set"""
+    versions = cache.get_many([_cache_key(name) for name in names])
+    return [versions.get(_cache_key(name)) or get_version(name) for name in names]
+
+
+def bump_version(name):
+    """Mark everything cached under ``name`` as stale in every process"""
+    version = time.time_ns()
+    cache.set(_cache_key(name), version, None)
+    _local_versions[name] = version
+    return version
+
+
+def bump_version_on_commit(name):
+    """
+    Bump ``name`` now and again when the current transaction commits.
+
+    Another process may read the first bump and then the data from before
+    the commit; the second bump retires whatever it cached from that.
+    """
+    bump_version(name)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+class VersionWatcher:
+    """
+    Tracks one named version for an in-process cache.
+
+    The shared cache is consulted at most once per
+    ``VERSION_CHECK_INTERVAL_SECONDS``; bumps made in this process are
+    noticed straight away.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.version = None
+        self.local_version = None
+        self.checked_at = 0.0
+
+    def changed(self):
+        """Return True (once) if the version moved since the last call"""
+        now = time.monotonic()
+        local_version = _local_versions.get(self.name)
+        if (local_version == self.local_version
+                and now - self.checked_at < settings.VERSION_CHECK_INTERVAL_SECONDS):
+            return False
+        self.local_version = local_version
+        self.checked_at = now
+        version = get_version(self.name)
+        if version == self.version:
+            return False
+        first_check = self.version is None
+        self.version = version
+        return not first_check
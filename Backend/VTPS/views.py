@@ -1,17 +1,34 @@
 from rest_framework import generics, status, permissions, filters
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes, action
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.contrib.auth import login, logout
-from django.db.models import Q, Count, Case, When, IntegerField
+from django.db import transaction
+from django.db.models import Q, F, Value, Count, Case, When, IntegerField, DateTimeField, UUIDField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import timedelta
+import math
 from .models import *
 from .serializers import *
-from .permissions import IsOwnerOrSupervisor, IsSupervisorOrAdmin
+from .permissions import IsOwnerOrSupervisor, IsSupervisorOrAdmin, IsDevice
+from .caching import ConditionalListMixin
+from .pagination import TimestampKeysetPagination, CreatedAtKeysetPagination, ScheduledTimeKeysetPagination
+from .ingest import store_fixes, store_logs
+from .authentication import DeviceKeyAuthentication
+from .throttling import DeviceRateThrottle
+from .archive import archived_days, open_track
+from .tracks import simplified_track
+from .spatial import positions, safe_zones
+from .dashboard import get_dashboard_stats
+from .metrics import get_metrics
+from .signals import alerts_bulk_updated, people_bulk_updated
 
 # Authentication Views
 class LoginView(generics.GenericAPIView):
@@ -27,7 +44,8 @@ class LoginView(generics.GenericAPIView):
         token, created = Token.objects.get_or_create(user=user)
         login(request, user)
         user.is_active_session = True
-        user.save()
+        user.last_activity = timezone.now()
+        user.save(update_fields=['is_active_session', 'last_activity'])
         return Response({
             'token': token.key,
             'user': UserSerializer(user).data
@@ -38,7 +56,7 @@ class LogoutView(generics.GenericAPIView):
 
     def post(self, request):
         request.user.is_active_session = False
-        request.user.save()
+        request.user.save(update_fields=['is_active_session'])
         Token.objects.filter(user=request.user).delete()
         logout(request)
         return Response({'detail': 'Logged out successfully.'}, status=status.HTTP_200_OK)
@@ -51,13 +69,31 @@ class UserViewSet(ModelViewSet):
     search_fields = ['username', 'email', 'first_name', 'last_name', 'role']
     filterset_fields = ['role', 'is_active_session']
 
-class VulnerablePersonViewSet(ModelViewSet):
+def parse_point(params):
+    """The ?lat=&lng= query parameters as floats"""
+    try:
+        lat, lng = float(params['lat']), float(params['lng'])
+    except (KeyError, ValueError):
+        lat = lng = math.nan
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValidationError({'detail': 'lat and lng must be given in decimal degrees.'})
+    return lat, lng
+
+class VulnerablePersonViewSet(ConditionalListMixin, ModelViewSet):
     queryset = VulnerablePerson.objects.all()
+    # The list shows contact and active alert counts and the last fix
+    cache_versions = ['people', 'emergency_contacts', 'alerts', 'locations']
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['first_name', 'last_name', 'phone', 'email']
     filterset_fields = ['risk_level', 'current_status', 'is_being_monitored', 'assigned_supervisor']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.with_list_stats()
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'list':
             return VulnerablePersonListSerializer
@@ -67,8 +103,97 @@ class VulnerablePersonViewSet(ModelViewSet):
             return VulnerablePersonCreateSerializer
         return VulnerablePersonDetailSerializer
 
-class EmergencyContactViewSet(ModelViewSet):
+    @action(detail=False, url_path='latest-locations')
+    def latest_locations(self, request):
+        """Current position of everyone, read from the one-row-per-person LatestLocation table"""
+        locations = LatestLocation.objects.select_related('person')
+        return Response(LatestLocationSerializer(locations, many=True).data)
+
+    @action(detail=False)
+    def nearby(self, request):
+        """
+        People whose latest fix is within ?radius= metres (default
+        NEARBY_DEFAULT_RADIUS_METERS) of ?lat=&lng=, nearest first, answered
+        from the in-memory position index.
+        """
+        lat, lng = parse_point(request.query_params)
+        try:
+            radius = float(request.query_params.get('radius', settings.NEARBY_DEFAULT_RADIUS_METERS))
+        except ValueError:
+            radius = 0
+        if not 0 < radius <= settings.NEARBY_MAX_RADIUS_METERS:
+            raise ValidationError({'radius': f'Enter a radius in metres up to {settings.NEARBY_MAX_RADIUS_METERS}.'})
+
+        found = positions.nearby(lat, lng, radius)
+        nearest = found[:settings.NEARBY_MAX_RESULTS]
+        people = VulnerablePerson.objects.with_list_stats().in_bulk([person_id for _, person_id, _ in nearest])
+        nearest = [(distance, people[person_id]) for distance, person_id, _ in nearest if person_id in people]
+        results = VulnerablePersonListSerializer([person for _, person in nearest], many=True).data
+        for result, (distance, _) in zip(results, nearest):
+            result['distance_meters'] = round(distance, 1)
+        return Response({'count': len(found), 'results': results})
+
+    @action(detail=True)
+    def history(self, request, pk=None):
+        """Archived location history: the archived days, or with ?date=YYYY-MM-DD that day's fixes"""
+        person = self.get_object()
+        if 'date' not in request.query_params:
+            return Response({'archived_days': archived_days(person.pk)})
+        try:
+            day = parse_date(request.query_params['date'] or '')
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({'date': 'Enter a date as YYYY-MM-DD.'})
+        track = open_track(person.pk, day)
+        if track is None:
+            return Response({'date': day, 'count': 0, 'fixes': []})
+        with track:
+            fixes = list(track)
+        return Response({'date': day, 'count': len(fixes), 'fixes': fixes})
+
+    @action(detail=True)
+    def track(self, request, pk=None):
+        """
+        Simplified path for the map: ?from=&to= (ISO datetimes, default the last
+        24 hours) and ?max_points= (default TRACK_DEFAULT_POINTS). Points are
+        [timestamp, latitude, longitude].
+        """
+        person = self.get_object()
+        params = request.query_params
+        try:
+            end = parse_datetime(params['to']) if params.get('to') else timezone.now()
+            start = parse_datetime(params['from']) if params.get('from') else None
+        except ValueError:
+            end = None
+        if end is None or (params.get('from') and start is None):
+            raise ValidationError({'detail': 'from and to must be ISO 8601 datetimes.'})
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        start = start or end - timedelta(days=1)
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        if not start < end <= start + timedelta(days=settings.TRACK_MAX_RANGE_DAYS):
+            raise ValidationError({'detail': f'from must be before to, at most {settings.TRACK_MAX_RANGE_DAYS} days apart.'})
+        try:
+            max_points = int(params.get('max_points', settings.TRACK_DEFAULT_POINTS))
+        except ValueError:
+            max_points = 0
+        if not 2 <= max_points <= settings.TRACK_MAX_POINTS:
+            raise ValidationError({'max_points': f'Enter a number from 2 to {settings.TRACK_MAX_POINTS}.'})
+
+        source_count, points = simplified_track(person.pk, start, end, max_points)
+        return Response({
+            'from': start,
+            'to': end,
+            'source_count': source_count,
+            'count': len(points),
+            'points': [[timestamp, round(lat, 7), round(lng, 7)] for timestamp, lat, lng in points],
+        })
+
+class EmergencyContactViewSet(ConditionalListMixin, ModelViewSet):
     queryset = EmergencyContact.objects.all()
+    cache_versions = ['emergency_contacts']
     serializer_class = EmergencyContactSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
@@ -78,18 +203,61 @@ class EmergencyContactViewSet(ModelViewSet):
 class LocationLogViewSet(ModelViewSet):
     queryset = LocationLog.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = TimestampKeysetPagination
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['person__first_name', 'person__last_name']
     filterset_fields = ['person', 'is_safe_zone']
 
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.action in ['create', 'batch']:
             return LocationCreateSerializer
         return LocationLogSerializer
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Ingest a list of buffered fixes from any number of devices in one request"""
+        fixes = request.data
+        if not isinstance(fixes, list) or not fixes:
+            return Response({'detail': 'Expected a non-empty list of fixes.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(fixes) > settings.LOCATION_BATCH_MAX_SIZE:
+            return Response(
+                {'detail': f'A batch may contain at most {settings.LOCATION_BATCH_MAX_SIZE} fixes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        validator = self.get_serializer()
+        results = [None] * len(fixes)
+        valid = []
+        for index, fix in enumerate(fixes):
+            try:
+                valid.append((index, validator.run_validation(fix)))
+            except ValidationError as exc:
+                results[index] = {'index': index, 'status': 'rejected', 'errors': exc.detail}
+
+        logs, rejected = store_fixes([data for _, data in valid]) if valid else ([], {})
+        accepted = 0
+        for (index, data), log in zip(valid, logs):
+            if log is None:
+                results[index] = {
+                    'index': index, 'status': 'rejected',
+                    'errors': {'device_id': [f"No person found with device ID: {data['device_id']}"]}
+                }
+            elif log.id in rejected:
+                results[index] = {'index': index, 'status': 'rejected', 'errors': {'non_field_errors': [rejected[log.id]]}}
+            else:
+                results[index] = {'index': index, 'status': 'accepted', 'id': log.id}
+                accepted += 1
+
+        return Response({
+            'accepted': accepted,
+            'rejected': len(fixes) - accepted,
+            'results': results
+        }, status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST)
+
 class AlertViewSet(ModelViewSet):
     queryset = Alert.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['title', 'description', 'alert_type', 'priority', 'status']
     filterset_fields = ['person', 'status', 'priority', 'alert_type', 'assigned_to']
@@ -101,16 +269,25 @@ class AlertViewSet(ModelViewSet):
             return AlertUpdateSerializer
         return AlertSerializer
 
-class SafeZoneViewSet(ModelViewSet):
+class SafeZoneViewSet(ConditionalListMixin, ModelViewSet):
     queryset = SafeZone.objects.all()
+    cache_versions = ['safe_zones']
     serializer_class = SafeZoneSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['name', 'description']
     filterset_fields = ['person', 'is_active']
 
-class CheckInScheduleViewSet(ModelViewSet):
+    @action(detail=False)
+    def containing(self, request):
+        """Active safe zones whose circle contains ?lat=&lng=, e.g. with ?person= for one person's zones"""
+        lat, lng = parse_point(request.query_params)
+        zones = self.filter_queryset(self.get_queryset()).filter(pk__in=safe_zones.containing(lat, lng))
+        return Response(self.get_serializer(zones, many=True).data)
+
+class CheckInScheduleViewSet(ConditionalListMixin, ModelViewSet):
     queryset = CheckInSchedule.objects.all()
+    cache_versions = ['checkin_schedules', 'people']
     serializer_class = CheckInScheduleSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
@@ -120,6 +297,7 @@ class CheckInScheduleViewSet(ModelViewSet):
 class CheckInLogViewSet(ModelViewSet):
     queryset = CheckInLog.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = ScheduledTimeKeysetPagination
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['person__first_name', 'person__last_name', 'status']
     filterset_fields = ['person', 'status', 'schedule']
@@ -133,10 +311,31 @@ class NotificationLogViewSet(ModelViewSet):
     queryset = NotificationLog.objects.all()
     serializer_class = NotificationLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtKeysetPagination
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['recipient', 'notification_type', 'status']
     filterset_fields = ['person', 'alert', 'notification_type', 'status']
 
+class DeviceCredentialViewSet(ModelViewSet):
+    """Issue and revoke GPS tracker keys; a key is only shown when it is issued"""
+    queryset = DeviceCredential.objects.select_related('person')
+    serializer_class = DeviceCredentialSerializer
+    permission_classes = [IsAuthenticated, IsSupervisorOrAdmin]
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    search_fields = ['name', 'key_prefix', 'person__first_name', 'person__last_name']
+    filterset_fields = ['person', 'is_active']
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def revoke(self, request, pk=None):
+        credential = self.get_object()
+        if credential.is_active:
+            credential.revoke()
+        return Response(self.get_serializer(credential).data)
+
 class SystemSettingsViewSet(ModelViewSet):
     queryset = SystemSettings.objects.all()
     serializer_class = SystemSettingsSerializer
@@ -146,27 +345,93 @@ class SystemSettingsViewSet(ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    total_people = VulnerablePerson.objects.count()
-    safe_count = VulnerablePerson.objects.filter(current_status='safe').count()
-    warning_count = VulnerablePerson.objects.filter(current_status='warning').count()
-    emergency_count = VulnerablePerson.objects.filter(current_status='emergency').count()
-    active_alerts = Alert.objects.filter(status='active').count()
-    total_tracked = VulnerablePerson.objects.filter(is_being_monitored=True).count()
-    recent_alerts = Alert.objects.order_by('-created_at')[:10]
-    people_status = VulnerablePerson.objects.all()[:10]
-    data = {
-        'total_people': total_people,
-        'safe_count': safe_count,
-        'warning_count': warning_count,
-        'emergency_count': emergency_count,
-        'active_alerts': active_alerts,
-        'total_tracked': total_tracked,
-        'recent_alerts': AlertSerializer(recent_alerts, many=True).data,
-        'people_status': VulnerablePersonListSerializer(people_status, many=True).data
-    }
-    return Response(data)
+    return Response(get_dashboard_stats())
+
+# Operational metrics endpoint
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsSupervisorOrAdmin])
+def metrics(request):
+    return Response(get_metrics())
+
+# Device ingest endpoint
+@api_view(['POST'])
+@authentication_classes([DeviceKeyAuthentication])
+@permission_classes([IsDevice])
+@throttle_classes([DeviceRateThrottle])
+def device_locations(request):
+    """
+    Ingest one fix, or a list of buffered fixes, from the tracker whose key
+    authenticated the request.
+    """
+    fixes = request.data if isinstance(request.data, list) else [request.data]
+    if not fixes:
+        return Response({'detail': 'Expected a fix or a non-empty list of fixes.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(fixes) > settings.LOCATION_BATCH_MAX_SIZE:
+        return Response(
+            {'detail': f'A batch may contain at most {settings.LOCATION_BATCH_MAX_SIZE} fixes.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    device = request.user
+    validator = DeviceFixSerializer()
+    results = [None] * len(fixes)
+    logs = []
+    for index, fix in enumerate(fixes):
+        try:
+            logs.append((index, LocationLog(person_id=device.person_id, **validator.run_validation(fix))))
+        except ValidationError as exc:
+            results[index] = {'index': index, 'status': 'rejected', 'errors': exc.detail}
+
+    rejected = store_logs([log for _, log in logs], {device.person_id: device.owner}) if logs else {}
+    accepted = 0
+    for index, log in logs:
+        if log.id in rejected:
+            results[index] = {'index': index, 'status': 'rejected', 'errors': {'non_field_errors': [rejected[log.id]]}}
+        else:
+            results[index] = {'index': index, 'status': 'accepted', 'id': log.id}
+            accepted += 1
+
+    return Response({
+        'accepted': accepted,
+        'rejected': len(fixes) - accepted,
+        'results': results
+    }, status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST)
+
+# Map clustering endpoint
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def map_clusters(request):
+    """
+    Clusters of latest positions inside ?bbox=west,south,east,north for the
+    map at ?zoom=, each with its count and worst status and risk level. Above
+    MAP_CLUSTER_MAX_ZOOM each person is returned on their own with their ID.
+    """
+    try:
+        west, south, east, north = (float(value) for value in request.query_params['bbox'].split(','))
+        zoom = int(request.query_params['zoom'])
+    except (KeyError, ValueError):
+        raise ValidationError({'detail': 'bbox=west,south,east,north in decimal degrees and an integer zoom are required.'})
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValidationError({'bbox': 'Expected west,south,east,north with west <= east and south <= north.'})
+    if not 0 <= zoom <= 22:
+        raise ValidationError({'zoom': 'Enter a zoom from 0 to 22.'})
+
+    clusters = [
+        {
+            'latitude': round(lat, 7), 'longitude': round(lng, 7), 'count': count,
+            'status': status_value, 'risk_level': risk_level, 'person': person_id,
+        }
+        for lat, lng, count, status_value, risk_level, person_id in positions.map_clusters(zoom, south, west, north, east)
+    ]
+    return Response({'zoom': zoom, 'count': sum(cluster['count'] for cluster in clusters), 'clusters': clusters})
 
 # Bulk update endpoints
+def bulk_outcomes(requested_ids, updated_ids):
+    return [
+        {'id': pk, 'status': 'updated' if pk in updated_ids else 'not_found'}
+        for pk in dict.fromkeys(requested_ids)
+    ]
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsSupervisorOrAdmin])
 def bulk_alert_update(request):
@@ -176,15 +441,31 @@ def bulk_alert_update(request):
     status_value = serializer.validated_data['status']
     assigned_to = serializer.validated_data.get('assigned_to')
     resolution_notes = serializer.validated_data.get('resolution_notes')
-    alerts = Alert.objects.filter(id__in=alert_ids)
-    for alert in alerts:
-        alert.status = status_value
-        if assigned_to:
-            alert.assigned_to_id = assigned_to
-        if resolution_notes:
-            alert.resolution_notes = resolution_notes
-        alert.save()
-    return Response({'detail': 'Bulk alert update successful.'})
+
+    now = timezone.now()
+    changes = {'status': status_value, 'updated_at': now}
+    if assigned_to:
+        changes['assigned_to'] = assigned_to
+    if resolution_notes:
+        changes['resolution_notes'] = resolution_notes
+    if status_value in ['resolved', 'dismissed']:
+        # Keep the original closure details of alerts that were already closed
+        changes['resolved_by'] = Coalesce(F('resolved_by'), Value(request.user.pk), output_field=UUIDField())
+        changes['resolved_at'] = Coalesce(F('resolved_at'), Value(now), output_field=DateTimeField())
+    else:
+        changes['resolved_by'] = None
+        changes['resolved_at'] = None
+
+    with transaction.atomic():
+        alerts = Alert.objects.filter(id__in=alert_ids)
+        updated_ids = set(alerts.values_list('id', flat=True))
+        alerts.update(**changes)
+        transaction.on_commit(lambda: alerts_bulk_updated.send(sender=Alert, alert_ids=updated_ids))
+    return Response({
+        'detail': 'Bulk alert update successful.',
+        'updated': len(updated_ids),
+        'results': bulk_outcomes(alert_ids, updated_ids)
+    })
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsSupervisorOrAdmin])
@@ -195,13 +476,22 @@ def bulk_person_update(request):
     assigned_supervisor = serializer.validated_data.get('assigned_supervisor')
     risk_level = serializer.validated_data.get('risk_level')
     is_being_monitored = serializer.validated_data.get('is_being_monitored')
-    people = VulnerablePerson.objects.filter(id__in=person_ids)
-    for person in people:
-        if assigned_supervisor:
-            person.assigned_supervisor_id = assigned_supervisor
-        if risk_level:
-            person.risk_level = risk_level
-        if is_being_monitored is not None:
-            person.is_being_monitored = is_being_monitored
-        person.save()
-    return Response({'detail': 'Bulk person update successful.'})
\ No newline at end of file
+
+    changes = {'updated_at': timezone.now()}
+    if assigned_supervisor:
+        changes['assigned_supervisor'] = assigned_supervisor
+    if risk_level:
+        changes['risk_level'] = risk_level
+    if is_being_monitored is not None:
+        changes['is_being_monitored'] = is_being_monitored
+
+    with transaction.atomic():
+        people = VulnerablePerson.objects.filter(id__in=person_ids)
+        updated_ids = set(people.values_list('id', flat=True))
+        people.update(**changes)
+        transaction.on_commit(lambda: people_bulk_updated.send(sender=VulnerablePerson, person_ids=updated_ids))
+    return Response({
+        'detail': 'Bulk person update successful.',
+        'updated': len(updated_ids),
+        'results': bulk_outcomes(person_ids, updated_ids)
+    })
@@ -0,0 +1,118 @@
+"""
+Device watchdog: raises device_offline when a monitored person's tracker goes
+silent and battery_low when its battery runs down, and resolves both when
+the device recovers.
+
+The watchdog follows the latest-fix stream (LatestLocation rows whose
+``updated_at`` moved since the last sync) and keeps each person's last fix
+time in a min-heap, so each tick touches only new fixes and expired
+deadlines rather than the whole table. The offline delay is read from the
+current settings on every pass, so a changed update interval applies to
+devices already being watched.
+"""
+import heapq
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .alerts import OPEN_STATUSES, raise_alert, resolve_alerts
+from .models import Alert, LatestLocation, VulnerablePerson
+from .system_settings import get_system_settings
+
+# Re-read window that tolerates clock skew and slow commits between ingest and the watchdog
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class DeviceWatchdog:
+    def __init__(self):
+        self._heap = []
+        self._last_fix = {}
+        self._offline = set()
+        self._battery_low = set()
+        self._synced_at = None
+
+    def __len__(self):
+        return len(self._last_fix)
+
+    @property
+    def offline_after(self):
+        """How long a device may stay silent before it is reported offline"""
+        interval = get_system_settings().location_update_interval_minutes
+        return timedelta(minutes=interval * settings.DEVICE_OFFLINE_MISSED_UPDATES)
+
+    @property
+    def next_due(self):
+        return self._heap[0][0] + self.offline_after if self._heap else None
+
+    def load(self, now=None):
+        """Read the latest fix of every monitored person and the open device alerts"""
+        now = now or timezone.now()
+        open_alerts = Alert.objects.filter(
+            alert_type__in=['device_offline', 'battery_low'], status__in=OPEN_STATUSES
+        ).values_list('person_id', 'alert_type')
+        for person_id, alert_type in open_alerts:
+            (self._offline if alert_type == 'device_offline' else self._battery_low).add(person_id)
+        self._synced_at = now
+        self._observe(LatestLocation.objects.filter(person__is_being_monitored=True), now)
+
+    def sync(self, now=None):
+        """Take in the fixes stored since the last sync"""
+        now = now or timezone.now()
+        changed = LatestLocation.objects.filter(
+            updated_at__gt=self._synced_at - SYNC_OVERLAP, person__is_being_monitored=True
+        )
+        self._synced_at = now
+        self._observe(changed, now)
+
+    def _observe(self, latest_locations, now):
+        for person_id, timestamp, battery_level in latest_locations.values_list('person_id', 'timestamp', 'battery_level'):
+            self.observe(person_id, timestamp, battery_level, now)
+
+    def observe(self, person_id, timestamp, battery_level, now=None):
+        """Record a person's newest fix"""
+        last_fix = self._last_fix.get(person_id)
+        if last_fix is not None and timestamp <= last_fix:
+            return
+        self._last_fix[person_id] = timestamp
+        heapq.heappush(self._heap, (timestamp, person_id))
+
+        if person_id in self._offline and timestamp + self.offline_after > (now or timezone.now()):
+            self._offline.discard(person_id)
+            resolve_alerts(person_id, 'device_offline', 'Device reported a new location.')
+
+        if battery_level is None:
+            return
+        if battery_level <= settings.BATTERY_LOW_THRESHOLD and person_id not in self._battery_low:
+            self._battery_low.add(person_id)
+            raise_alert(person_id, 'battery_low', f'Tracker battery is at {battery_level}%.', priority='medium')
+        elif battery_level >= settings.BATTERY_LOW_THRESHOLD + settings.BATTERY_RECOVERY_MARGIN and person_id in self._battery_low:
+            self._battery_low.discard(person_id)
+            resolve_alerts(person_id, 'battery_low', f'Tracker battery recovered to {battery_level}%.')
+
+    def run_due(self, now=None):
+        """Raise device_offline for every person whose deadline has passed; returns how many"""
+        now = now or timezone.now()
+        cutoff = now - self.offline_after
+        expired = {}
+        while self._heap and self._heap[0][0] <= cutoff:
+            timestamp, person_id = heapq.heappop(self._heap)
+            # Superseded by a newer fix, or already reported
+            if self._last_fix.get(person_id) == timestamp and person_id not in self._offline:
+                expired[person_id] = timestamp
+        if not expired:
+            return 0
+        raised = 0
+        monitored = set(
+            VulnerablePerson.objects.filter(pk__in=expired, is_being_monitored=True).values_list('pk', flat=True)
+        )
+        for person_id, timestamp in expired.items():
+            if person_id not in monitored:
+                self._last_fix.pop(person_id, None)
+                continue
+            self._offline.add(person_id)
+            raise_alert(
+                person_id, 'device_offline',
+                f'No location received since {timezone.localtime(timestamp):%Y-%m-%d %H:%M}.',
+                priority='high',
+            )
+            raised += 1
+        return raised